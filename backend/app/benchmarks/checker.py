@@ -0,0 +1,247 @@
+"""
+Checker throughput benchmark against the offline proxy farm: checks/sec,
+p50/p99 per-proxy check time, peak memory and peak open file descriptors for
+the API's sweep (check_all_proxies) and the standalone tester
+(test_proxy.check_batch) at increasing pool sizes.
+
+Usage:
+    cd backend && python -m app.benchmarks.checker
+    cd backend && python -m app.benchmarks.checker --sizes 1000 10000 50000 --protocols http socks5 socks4
+    cd backend && python -m app.benchmarks.checker --latency-ms 80 --jitter-ms 40 --drop 0.3 --hang 0.05 --auth-fail 0.05
+    cd backend && python -m app.benchmarks.checker --only sweep --sizes 50000
+
+Proxy behaviour shares (--drop / --auth-fail / --hang) are fixed per address,
+so every run and every checker sees the same farm. Hanging proxies cost a
+full --timeout each, which dominates p99 and the total time; that is the
+point of measuring with them. Nothing touches MongoDB or the network.
+
+test_proxy.py runs on httpx, which has no SOCKS4: socks4 proxies are left out
+of its runs. Memory and FDs are sampled from /proc (Linux only); the farm runs
+in its own processes and is not counted.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import resource
+import statistics
+import sys
+import time
+from pathlib import Path
+from app.benchmarks.proxy_farm import DiscardWriter, FarmProfile, ProxyFarm, discard_history
+from app.config import settings
+from app.services import proxy_checker
+from app.services.proxy_checker import CheckMode, SweepStats, check_all_proxies, checker_engine
+
+REAL_IP = "198.51.100.1"  # not a farm address; skips the real-IP lookup
+REPO_ROOT = Path(__file__).resolve().parents[3]
+
+
+# ── Measurement ────────────────────────────────────────────────────────────────
+
+class _Sampler:
+    """Polls RSS and open FD count of this process, keeping the peaks."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak_rss = 0
+        self.peak_fds = 0
+        self._page = os.sysconf("SC_PAGE_SIZE")
+        self._task: asyncio.Task | None = None
+
+    def sample(self) -> None:
+        with open("/proc/self/statm") as f:
+            rss = int(f.read().split()[1]) * self._page
+        self.peak_rss = max(self.peak_rss, rss)
+        self.peak_fds = max(self.peak_fds, len(os.listdir("/proc/self/fd")))
+
+    async def _run(self) -> None:
+        while True:
+            self.sample()
+            await asyncio.sleep(self.interval)
+
+    async def __aenter__(self) -> "_Sampler":
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self.sample()
+
+
+@contextlib.contextmanager
+def _timed(module, name: str, key, durations: dict):
+    """Patch module.name so each call adds its wall time under key(*args)."""
+    original = getattr(module, name)
+
+    async def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await original(*args, **kwargs)
+        finally:
+            k = key(*args)
+            durations[k] = durations.get(k, 0.0) + time.perf_counter() - start
+
+    setattr(module, name, timed)
+    try:
+        yield
+    finally:
+        setattr(module, name, original)
+
+
+def _report(durations: dict, elapsed: float, sampler: _Sampler, live: int) -> dict:
+    ms = sorted(d * 1000 for d in durations.values())
+    q = statistics.quantiles(ms, n=100) if len(ms) > 1 else ms * 99
+    return {
+        "checks_per_sec": len(ms) / elapsed,
+        "p50_ms": q[49],
+        "p99_ms": q[98],
+        "peak_rss_mb": sampler.peak_rss / 2**20,
+        "peak_fds": sampler.peak_fds,
+        "live": live,
+        "dead": len(ms) - live,
+    }
+
+
+# ── Runners ────────────────────────────────────────────────────────────────────
+
+async def _run_sweep(farm: ProxyFarm, count: int, protocols: tuple[str, ...], mode: CheckMode) -> dict:
+    """check_all_proxies, in chunks as a check job feeds it; time = probe + check per proxy."""
+    proxies = farm.proxies(count, protocols)
+    stats = SweepStats()
+    durations: dict = {}
+    key = lambda proxy, *_: proxy.id  # noqa: E731
+    size = settings.CHECK_JOB_CHUNK_SIZE
+    try:
+        with _timed(proxy_checker, "_tcp_probe", key, durations), \
+                _timed(proxy_checker, "check_single_proxy", key, durations):
+            async with _Sampler() as sampler, DiscardWriter() as writer:
+                start = time.perf_counter()
+                for i in range(0, count, size):
+                    await check_all_proxies(proxies[i:i + size], mode, stats, writer, REAL_IP)
+                elapsed = time.perf_counter() - start
+    finally:
+        await checker_engine.close()
+    return _report(durations, elapsed, sampler, stats.live)
+
+
+def _load_tester():
+    sys.path.insert(0, str(REPO_ROOT))
+    try:
+        import test_proxy
+    except (ImportError, SystemExit):  # it exits when httpx is missing
+        return None
+    finally:
+        sys.path.remove(str(REPO_ROOT))
+    return test_proxy
+
+
+async def _run_tester(tester, farm: ProxyFarm, count: int, protocols: tuple[str, ...], timeout: float) -> dict | None:
+    """test_proxy.check_batch over the same farm; time = check_proxy per proxy (geo lookup included)."""
+    protocols = tuple(p for p in protocols if p != "socks4")
+    if not protocols:
+        return None
+    proxies = [tester.parse_proxy(f"{p}://{ip}:{port}") for ip, port, p in farm.addresses(count, protocols)]
+    tester.CHECK_TARGETS = [{"url": f"{farm.target_url}/ip", "field": "ip"}]
+    tester.GEO_URL = farm.target_url + "/geo/{ip}"
+    tester.RICH = False
+    durations: dict = {}
+    with _timed(tester, "check_proxy", lambda proxy, *_: proxy["raw"], durations), \
+            contextlib.redirect_stdout(io.StringIO()):  # progress lines
+        async with _Sampler() as sampler:
+            start = time.perf_counter()
+            results = await tester.check_batch(proxies, timeout=timeout)
+            elapsed = time.perf_counter() - start
+    return _report(durations, elapsed, sampler, sum(r["status"] == "live" for r in results))
+
+
+# ── Main ───────────────────────────────────────────────────────────────────────
+
+def _raise_fd_limit() -> None:
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def _print_row(label: str, count: int, r: dict | None) -> None:
+    if r is None:
+        print(f"{label:<10} {count:>7}   (skipped)")
+        return
+    print(
+        f"{label:<10} {count:>7} {r['checks_per_sec']:10.1f} {r['p50_ms']:9.1f} {r['p99_ms']:9.1f} "
+        f"{r['peak_rss_mb']:9.1f} {r['peak_fds']:7} {r['live']:7} {r['dead']:7}"
+    )
+
+
+async def run(args, profile: FarmProfile) -> list[dict]:
+    proxy_checker.TIMEOUT = args.timeout
+    settings.CHECKER_PROBE_TIMEOUT = min(settings.CHECKER_PROBE_TIMEOUT, args.timeout)
+    tester = _load_tester() if args.only in (None, "tester") else None
+    if args.only == "tester" and tester is None:
+        print("❌ test_proxy.py needs httpx: pip install httpx socksio")
+    protocols = tuple(args.protocols)
+    rows = []
+    with discard_history(), ProxyFarm(args.port, profile, args.farm_processes) as farm:  # no database here
+        settings.CHECKER_TARGETS = farm.targets
+        expected = farm.expected(max(args.sizes))
+        print(
+            f"farm: {', '.join(protocols)} | behaviour of the largest pool: "
+            + ", ".join(f"{n} {name}" for name, n in expected.items())
+        )
+        print(f"{'checker':<10} {'proxies':>7} {'checks/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'peak MB':>9} {'FDs':>7} {'live':>7} {'dead':>7}")
+        for count in args.sizes:
+            if args.only in (None, "sweep"):
+                r = await _run_sweep(farm, count, protocols, CheckMode(args.mode))
+                _print_row("sweep", count, r)
+                rows.append({"checker": "sweep", "proxies": count, **r})
+            if tester is not None:
+                r = await _run_tester(tester, farm, count, protocols, args.timeout)
+                _print_row("test_proxy", count, r)
+                if r:
+                    rows.append({"checker": "test_proxy", "proxies": count, **r})
+    return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000], help="pool sizes to run")
+    parser.add_argument("--protocols", nargs="+", choices=["http", "socks5", "socks4"], default=["http"], help="assigned round-robin")
+    parser.add_argument("--only", choices=["sweep", "tester"], help="run one checker only")
+    parser.add_argument("--mode", choices=[m.value for m in CheckMode], default=CheckMode.SEQUENTIAL.value)
+    parser.add_argument("--timeout", type=float, default=3.0, help="per-check timeout in seconds (what hanging proxies cost)")
+    parser.add_argument("--latency-ms", type=float, default=0, help="latency each live proxy adds")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="uniform ± around --latency-ms")
+    parser.add_argument("--target-latency-ms", type=float, default=0, help="latency of the echo target")
+    parser.add_argument("--drop", type=float, default=0, help="share of proxies that close connections at once")
+    parser.add_argument("--auth-fail", type=float, default=0, help="share that reject the handshake")
+    parser.add_argument("--hang", type=float, default=0, help="share that accept and never answer")
+    parser.add_argument("--port", type=int, default=18900, help="farm port (the echo target takes port + 1)")
+    parser.add_argument("--farm-processes", type=int, default=2, help="processes serving the farm")
+    parser.add_argument("--json", action="store_true", help="also print the results as JSON")
+    args = parser.parse_args()
+
+    profile = FarmProfile(
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        target_latency=args.target_latency_ms / 1000,
+        drop=args.drop,
+        auth_fail=args.auth_fail,
+        hang=args.hang,
+    )
+    if profile.drop + profile.auth_fail + profile.hang > 1:
+        print("❌ --drop + --auth-fail + --hang must not exceed 1")
+        return 1
+
+    _raise_fd_limit()
+    rows = asyncio.run(run(args, profile))
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
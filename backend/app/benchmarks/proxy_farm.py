@@ -0,0 +1,308 @@
+"""
+Offline stand-ins for checker benchmarks: a farm of fake proxies, an echo
+target behind them, and a result writer that needs no database.
+
+One listener on 0.0.0.0:<port> (shared by several processes via SO_REUSEPORT)
+plays every proxy. On Linux the whole 127.0.0.0/8 block reaches it, so each
+proxy gets its own loopback address and the checker sees N distinct proxies.
+The first byte of a connection picks the protocol (SOCKS4, SOCKS5 or HTTP
+CONNECT / absolute-form GET), and the address the client dialled picks the
+proxy's behaviour from the FarmProfile: live, drop, auth_fail or hang.
+
+Live proxies forward to the echo target on <port + 1>, dialling out from
+their own loopback address, so the target reports that address as the exit
+IP, as ipify/httpbin would. /geo/<ip> answers like ip-api.com.
+"""
+
+import asyncio
+import contextlib
+import json
+import multiprocessing
+import random
+import socket
+import struct
+import time
+import zlib
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+from bson import ObjectId
+from app.models.proxy import Proxy, ProxyProtocol
+from app.services.check_history import history_recorder
+from app.services.result_writer import ResultWriter
+
+BEHAVIOURS = ("drop", "auth_fail", "hang")
+
+
+@dataclass
+class FarmProfile:
+    latency: float = 0.0          # s each live proxy adds before forwarding
+    jitter: float = 0.0           # s, uniform ± around latency
+    target_latency: float = 0.0   # s the echo target waits before answering
+    drop: float = 0.0             # share of proxies that close every connection at once
+    auth_fail: float = 0.0        # share that reject the handshake (407 / SOCKS refusal)
+    hang: float = 0.0             # share that accept and never answer
+
+    def behaviour(self, ip: str) -> str:
+        """Fixed per address, so repeated runs see the same farm."""
+        x = zlib.crc32(ip.encode()) % 10_000 / 10_000
+        for name in BEHAVIOURS:
+            share = getattr(self, name)
+            if x < share:
+                return name
+            x -= share
+        return "live"
+
+    def delay(self) -> float:
+        return max(self.latency + random.uniform(-self.jitter, self.jitter), 0.0)
+
+
+# ── Echo target ────────────────────────────────────────────────────────────────
+
+def _json_response(body: dict) -> bytes:
+    payload = json.dumps(body).encode()
+    return (
+        b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nConnection: close\r\n"
+        b"Content-Length: " + str(len(payload)).encode() + b"\r\n\r\n" + payload
+    )
+
+
+async def _handle_target(reader, writer, profile: FarmProfile) -> None:
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+        path = head.split(b" ", 2)[1].decode()
+        if profile.target_latency:
+            await asyncio.sleep(profile.target_latency)
+        ip = path[len("/geo/"):] if path.startswith("/geo/") else writer.get_extra_info("peername")[0]
+        writer.write(_json_response({
+            "ip": ip, "origin": ip, "query": ip,
+            "country": "Testland", "countryCode": "TL", "regionName": "Loopback",
+            "city": "Farm", "isp": "Proxy farm",
+        }))
+        await writer.drain()
+    except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, IndexError):
+        pass
+    finally:
+        writer.close()
+
+
+# ── Fake proxies ───────────────────────────────────────────────────────────────
+
+async def _socks5_handshake(reader, writer, reject: bool) -> tuple[str, int] | None:
+    methods = await reader.readexactly((await reader.readexactly(1))[0])
+    if reject:
+        writer.write(b"\x05\xff")
+        return None
+    if 2 in methods:
+        writer.write(b"\x05\x02")
+        await reader.readexactly(1)
+        await reader.readexactly((await reader.readexactly(1))[0])  # username
+        await reader.readexactly((await reader.readexactly(1))[0])  # password
+        writer.write(b"\x01\x00")
+    else:
+        writer.write(b"\x05\x00")
+    _, _, _, atyp = await reader.readexactly(4)
+    if atyp == 1:
+        host = socket.inet_ntoa(await reader.readexactly(4))
+    elif atyp == 3:
+        host = (await reader.readexactly((await reader.readexactly(1))[0])).decode()
+    else:
+        host = socket.inet_ntop(socket.AF_INET6, await reader.readexactly(16))
+    port = struct.unpack(">H", await reader.readexactly(2))[0]
+    writer.write(b"\x05\x00\x00\x01\x00\x00\x00\x00\x00\x00")
+    return host, port
+
+
+async def _socks4_handshake(reader, writer, reject: bool) -> tuple[str, int] | None:
+    _, port = struct.unpack(">BH", await reader.readexactly(3))
+    address = await reader.readexactly(4)
+    await reader.readuntil(b"\x00")  # user id
+    host = socket.inet_ntoa(address)
+    if address[:3] == b"\x00\x00\x00" and address[3]:
+        host = (await reader.readuntil(b"\x00"))[:-1].decode()  # SOCKS4a
+    writer.write(b"\x00" + (b"\x5b" if reject else b"\x5a") + b"\x00" * 6)
+    return None if reject else (host, port)
+
+
+async def _http_handshake(first: bytes, reader, writer, reject: bool) -> tuple[str, int, bytes] | None:
+    """Returns (host, port, bytes to send upstream); empty bytes for a CONNECT tunnel."""
+    head = first + await reader.readuntil(b"\r\n\r\n")
+    request_line, rest = head.split(b"\r\n", 1)
+    method, target, version = request_line.decode().split(" ", 2)
+    if reject:
+        writer.write(b"HTTP/1.1 407 Proxy Authentication Required\r\nContent-Length: 0\r\n\r\n")
+        return None
+    if method == "CONNECT":
+        host, port = target.rsplit(":", 1)
+        writer.write(b"HTTP/1.1 200 Connection established\r\n\r\n")
+        return host, int(port), b""
+    url = urlsplit(target)
+    path = (url.path or "/") + (f"?{url.query}" if url.query else "")
+    return url.hostname, url.port or 80, f"{method} {path} {version}\r\n".encode() + rest
+
+
+async def _pipe(reader, writer) -> None:
+    try:
+        while data := await reader.read(65536):
+            writer.write(data)
+            await writer.drain()
+    except OSError:
+        pass
+    finally:
+        writer.close()
+
+
+async def _handle_proxy(reader, writer, profile: FarmProfile) -> None:
+    ip = writer.get_extra_info("sockname")[0]  # the address the client dialled = which proxy
+    behaviour = profile.behaviour(ip)
+    try:
+        if behaviour == "drop":
+            return
+        if behaviour == "hang":
+            await reader.read()  # until the client gives up
+            return
+        first = await reader.readexactly(1)
+        reject = behaviour == "auth_fail"
+        preamble = b""
+        if first == b"\x05":
+            dest = await _socks5_handshake(reader, writer, reject)
+        elif first == b"\x04":
+            dest = await _socks4_handshake(reader, writer, reject)
+        else:
+            dest = await _http_handshake(first, reader, writer, reject)
+            if dest:
+                *dest, preamble = dest
+        await writer.drain()
+        if dest is None:
+            return
+        await asyncio.sleep(profile.delay())
+        up_reader, up_writer = await asyncio.open_connection(dest[0], dest[1], local_addr=(ip, 0))
+        up_writer.write(preamble)
+        await asyncio.gather(_pipe(reader, up_writer), _pipe(up_reader, writer))
+    except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+        pass
+    finally:
+        writer.close()
+
+
+async def _serve(port: int, profile: FarmProfile) -> None:
+    proxies = await asyncio.start_server(
+        lambda r, w: _handle_proxy(r, w, profile), "0.0.0.0", port, reuse_port=True, backlog=4096,
+    )
+    target = await asyncio.start_server(
+        lambda r, w: _handle_target(r, w, profile), "127.0.0.1", port + 1, reuse_port=True, backlog=4096,
+    )
+    async with proxies, target:
+        await asyncio.gather(proxies.serve_forever(), target.serve_forever())
+
+
+def _farm_main(port: int, profile: FarmProfile) -> None:
+    asyncio.run(_serve(port, profile))
+
+
+def farm_address(i: int) -> str:
+    """The i-th loopback address, skipping .0 and .255 host bytes."""
+    i, d = divmod(i, 254)
+    b, c = divmod(i, 256)
+    return f"127.{b + 1}.{c}.{d + 1}"
+
+
+class ProxyFarm:
+    """
+    Runs the farm in `processes` child processes (the checker under test keeps
+    its own cores). Use as a context manager or call start() / stop().
+
+        with ProxyFarm(profile=FarmProfile(drop=0.2)) as farm:
+            proxies = farm.proxies(10_000)
+            settings.CHECKER_TARGETS = farm.targets
+    """
+
+    def __init__(self, port: int = 18900, profile: FarmProfile | None = None, processes: int = 2):
+        self.port = port
+        self.profile = profile or FarmProfile()
+        self.processes = processes
+        self._children: list[multiprocessing.Process] = []
+
+    @property
+    def target_url(self) -> str:
+        return f"http://127.0.0.1:{self.port + 1}"
+
+    @property
+    def targets(self) -> list[dict]:
+        """Check targets (CHECKER_TARGETS format) that resolve inside the farm."""
+        return [{"url": f"{self.target_url}/ip", "parse": "ip"}]
+
+    def start(self) -> "ProxyFarm":
+        context = multiprocessing.get_context("spawn")
+        self._children = [
+            context.Process(target=_farm_main, args=(self.port, self.profile), name=f"farm-{i}", daemon=True)
+            for i in range(self.processes)
+        ]
+        for process in self._children:
+            process.start()
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", self.port + 1), timeout=1).close()
+                return self
+            except OSError:
+                if time.monotonic() > deadline:
+                    self.stop()
+                    raise RuntimeError(f"Proxy farm did not come up on port {self.port}")
+                time.sleep(0.1)
+
+    def stop(self) -> None:
+        for process in self._children:
+            process.terminate()
+        for process in self._children:
+            process.join()
+        self._children = []
+
+    def __enter__(self) -> "ProxyFarm":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def addresses(self, count: int, protocols: tuple[str, ...] = ("http",)):
+        """(ip, port, protocol) for `count` proxies, protocols assigned round-robin."""
+        for i in range(count):
+            yield farm_address(i), self.port, protocols[i % len(protocols)]
+
+    def proxies(self, count: int, protocols: tuple[str, ...] = ("http",)) -> list[Proxy]:
+        """Unsaved Proxy objects (with ids, so results are recorded) pointing at the farm."""
+        return [
+            Proxy.model_construct(id=ObjectId(), ip=ip, port=port, protocol=ProxyProtocol(protocol))
+            for ip, port, protocol in self.addresses(count, protocols)
+        ]
+
+    def expected(self, count: int) -> dict[str, int]:
+        """How many of the first `count` proxies get each behaviour."""
+        counts = dict.fromkeys(("live",) + BEHAVIOURS, 0)
+        for ip, _, _ in self.addresses(count):
+            counts[self.profile.behaviour(ip)] += 1
+        return counts
+
+
+# ── No-database sweep plumbing ─────────────────────────────────────────────────
+
+class DiscardWriter(ResultWriter):
+    """Builds the same update batches as a sweep, then drops them."""
+
+    async def _write(self, ops) -> None:
+        pass
+
+
+async def _discard_history() -> None:
+    history_recorder._samples.clear()
+    history_recorder._rollups.clear()
+
+
+@contextlib.contextmanager
+def discard_history():
+    """Keep check history samples from piling up (or reaching for MongoDB) inside the block."""
+    original = history_recorder.flush
+    history_recorder.flush = _discard_history
+    try:
+        yield
+    finally:
+        history_recorder.flush = original
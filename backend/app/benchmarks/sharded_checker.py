@@ -0,0 +1,80 @@
+"""
+Sweep throughput benchmark: in-process check_all_proxies vs. the sharded
+multi-process checker at increasing worker counts.
+
+Usage:
+    cd backend && python -m app.benchmarks.sharded_checker --proxies 20000 --workers 1 2 4 8
+
+Runs offline against the stand-in proxy farm (app.benchmarks.proxy_farm)
+with every proxy live; results go through the normal save path into a
+writer that drops them, so no MongoDB is needed. Throughput should grow
+close to linearly with workers until the cores are used up; the farm
+processes need CPU too, so leave them a core or two.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from app.benchmarks.proxy_farm import DiscardWriter, ProxyFarm, discard_history
+from app.config import settings
+from app.services.proxy_checker import CheckMode, SweepStats, check_all_proxies, checker_engine
+from app.services.sharded_checker import ShardedChecker
+
+REAL_IP = "198.51.100.1"  # not a farm address; skips the real-IP lookup
+
+
+async def _chunks(proxies: list, size: int = 1000):
+    for i in range(0, len(proxies), size):
+        yield proxies[i:i + size]
+
+
+async def _run(proxies: list, workers: int) -> dict:
+    stats = SweepStats()
+    async with DiscardWriter() as writer:
+        if workers == 0:
+            start = time.perf_counter()
+            async for chunk in _chunks(proxies):
+                await check_all_proxies(chunk, CheckMode.SEQUENTIAL, stats, writer, REAL_IP)
+            elapsed = time.perf_counter() - start
+        else:
+            checker = ShardedChecker(workers)
+            try:
+                # Warm-up sweep: process spawn and imports are not part of the rate
+                await checker.check(_chunks(proxies[:workers * 20]), writer=writer, real_ip=REAL_IP)
+                start = time.perf_counter()
+                await checker.check(_chunks(proxies), stats=stats, writer=writer, real_ip=REAL_IP)
+                elapsed = time.perf_counter() - start
+            finally:
+                await checker.close()
+    await checker_engine.close()
+    assert stats.live == len(proxies), f"only {stats.live}/{len(proxies)} checks succeeded"
+    return {"checks_per_sec": len(proxies) / elapsed, "seconds": elapsed}
+
+
+async def main(count: int, worker_counts: list[int], port: int, farm_processes: int) -> None:
+    with discard_history(), ProxyFarm(port, processes=farm_processes) as farm:  # no database here
+        # Workers are spawned and read their settings from the environment
+        os.environ["CHECKER_TARGETS"] = json.dumps(farm.targets)
+        settings.CHECKER_TARGETS = farm.targets
+        proxies = farm.proxies(count)
+        print(f"{count} proxies, {os.cpu_count()} cores")
+        base = None
+        for workers in worker_counts:
+            r = await _run(proxies, workers)
+            label = "in-process" if workers == 0 else f"{workers} worker{'s' if workers > 1 else ''}"
+            if workers == 1:
+                base = r["checks_per_sec"]
+            speedup = f"x{r['checks_per_sec'] / base:.2f}" if base and workers else ""
+            print(f"{label:<12} {r['checks_per_sec']:9.1f} checks/s   {r['seconds']:7.2f} s   {speedup}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="sharded checker scaling benchmark")
+    parser.add_argument("--proxies", type=int, default=20000, help="stand-in proxies to check")
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2, 4], help="worker counts to run (0 = in-process)")
+    parser.add_argument("--port", type=int, default=18900, help="port the proxy farm listens on")
+    parser.add_argument("--farm-processes", type=int, default=2, help="processes serving the farm")
+    args = parser.parse_args()
+    asyncio.run(main(args.proxies, args.workers, args.port, args.farm_processes))
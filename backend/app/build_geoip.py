@@ -0,0 +1,42 @@
+"""
+Build the memory-mapped geo-IP database used by the checker.
+
+Usage:
+    cd backend && python -m app.build_geoip ranges.csv geoip.bin
+    cd backend && python -m app.build_geoip app/data/geoip-sample.csv app/data/geoip-sample.bin
+
+The CSV has one range per row:
+    start_ip,end_ip,country_code,country,region,city
+
+IPv4 and IPv6 ranges may be mixed; rows may come in any order but must not
+overlap. Point GEOIP_DB_PATH at the output file to enable local lookups.
+"""
+
+import argparse
+import csv
+import sys
+from app.services.geoip import GeoIPDatabase, write_database
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="CSV of IP ranges")
+    parser.add_argument("output", help="database file to write")
+    args = parser.parse_args()
+
+    with open(args.source, newline="", encoding="utf-8") as f:
+        rows = [row for row in csv.reader(f) if row and not row[0].startswith("#")]
+    try:
+        count = write_database(rows, args.output)
+    except ValueError as exc:
+        print(f"❌ {exc}")
+        return 1
+
+    db = GeoIPDatabase(args.output)
+    print(f"✅ {count} ranges, {db.location_count} locations -> {args.output}")
+    db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
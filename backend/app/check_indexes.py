@@ -0,0 +1,78 @@
+"""
+Explain the hot API queries and verify each one is served by an index.
+
+Usage:
+    docker compose exec backend python -m app.check_indexes
+
+Exits with status 1 if any query falls back to a collection scan (COLLSCAN)
+or, for paginated queries, to an in-memory SORT. tests/test_indexes.py runs
+the same check against a scratch database.
+"""
+
+import asyncio
+import sys
+from datetime import datetime, timedelta, timezone
+from app.database import init_db
+from app.models.account import Account
+from app.models.check_job import CheckJob
+from app.models.proxy import Proxy
+from app.models.user import User
+
+
+def _hot_queries() -> list[tuple[str, type, dict, list | None]]:
+    now = datetime.now(timezone.utc)
+    page = [("_id", 1)]
+    return [
+        ("proxies by owner", Proxy, {"owner": "admin"}, page),
+        ("proxies by owner+status", Proxy, {"owner": "admin", "status": "live"}, page),
+        ("proxies by owner+provider", Proxy, {"owner": "admin", "provider_name": "x"}, page),
+        ("proxies expiring soon", Proxy, {"expire_at": {"$gte": now, "$lte": now + timedelta(days=3)}}, None),
+        ("proxies due for re-check", Proxy, {"next_check_at": {"$lte": now}}, None),
+        ("proxies held by a claim worker", Proxy, {"claimed_by": "node:1"}, None),
+        ("proxy dedup lookup", Proxy, {"ip": "1.2.3.4", "port": 80, "protocol": "http", "owner": "admin"}, None),
+        ("accounts by owner", Account, {"owner": "admin"}, page),
+        ("accounts by owner+status", Account, {"owner": "admin", "status": "active"}, page),
+        ("accounts by owner+platform", Account, {"owner": "admin", "platform": "x"}, page),
+        ("user by username", User, {"username": "admin"}, None),
+        ("active check jobs", CheckJob, {"scope_owner": None, "status": {"$in": ["queued", "running"]}}, None),
+    ]
+
+
+def _stages(plan: dict) -> list[str]:
+    """Flatten the stage names of an explain() winning plan."""
+    stages = [plan.get("stage", "")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages += _stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += _stages(child)
+    return stages
+
+
+def is_covered(stages: list[str]) -> bool:
+    return "COLLSCAN" not in stages and "SORT" not in stages
+
+
+async def explain_hot_queries() -> dict[str, list[str]]:
+    results = {}
+    for label, model, query, sort in _hot_queries():
+        cursor = model.get_motor_collection().find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        results[label] = _stages(explain["queryPlanner"]["winningPlan"])
+    return results
+
+
+async def main() -> int:
+    await init_db()
+    failures = 0
+    for label, stages in (await explain_hot_queries()).items():
+        covered = is_covered(stages)
+        failures += not covered
+        print(f"{'✅' if covered else '❌'} {label:<30} {' <- '.join(stages)}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
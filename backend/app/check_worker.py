@@ -0,0 +1,61 @@
+"""
+Run a check worker node: claims due proxies from MongoDB and checks them
+until stopped (Ctrl+C / SIGTERM releases whatever it still holds).
+
+Usage:
+    cd backend && python -m app.check_worker
+    cd backend && python -m app.check_worker --batch 200 --batches 4 --mode sequential
+
+Start one on every host that should add check capacity; they coordinate
+through per-proxy leases only. Set CLAIM_WORKER_ENABLED on the API (or turn
+SCHEDULER_ENABLED off) so the scheduler stops queuing re-check jobs for the
+same proxies.
+"""
+
+import argparse
+import asyncio
+import logging
+import signal
+import sys
+from app.database import init_db
+from app.services.check_history import history_recorder
+from app.services.claim_worker import ClaimWorker
+from app.services.health import health_recorder
+from app.services.proxy_checker import CheckMode, checker_engine
+
+
+async def run(batch: int | None, batches: int | None, mode: CheckMode) -> None:
+    await init_db()
+    await checker_engine.start()
+    history_recorder.start()
+    health_recorder.start()  # outcomes of checks that raced traffic are folded in there
+    worker = ClaimWorker(batch_size=batch, batches=batches, mode=mode)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    worker.start()
+    try:
+        await stop.wait()
+    finally:
+        await worker.stop()
+        await health_recorder.stop()
+        await history_recorder.stop()
+        await checker_engine.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch", type=int, help="proxies claimed per batch (default: CLAIM_WORKER_BATCH)")
+    parser.add_argument("--batches", type=int, help="batches checked at once (default: CLAIM_WORKER_BATCHES)")
+    parser.add_argument("--mode", choices=[m.value for m in CheckMode], default=CheckMode.RACE.value)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run(args.batch, args.batches, CheckMode(args.mode)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
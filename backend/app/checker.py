@@ -0,0 +1,82 @@
+"""
+Run a proxy sweep outside the API process, sharded over worker processes.
+
+Usage:
+    cd backend && python -m app.checker                       # every proxy, one worker per core
+    cd backend && python -m app.checker --workers 4 --owner alice
+    cd backend && python -m app.checker --due --mode race     # only proxies due for a re-check
+    cd backend && python -m app.checker --workers 0           # in-process, for comparison
+
+Results are written exactly as a check job writes them (status, health,
+check history). Set CHECKER_WORKERS to have the API's check jobs use the
+same worker pool instead.
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from datetime import datetime, timezone
+from app.database import init_db
+from app.services.check_history import history_recorder
+from app.services.check_jobs import proxy_chunks
+from app.services.health import health_recorder
+from app.services.proxy_checker import CheckMode, SweepStats, check_all_proxies, checker_engine
+from app.services.result_writer import ResultWriter
+from app.services.sharded_checker import ShardedChecker
+
+
+async def run(workers: int | None, owner: str | None, due: bool, mode: CheckMode) -> SweepStats:
+    await init_db()
+    query = {"owner": owner} if owner else {}
+    if due:
+        query["$or"] = [{"next_check_at": {"$lte": datetime.now(timezone.utc)}}, {"next_check_at": None}]
+
+    stats = SweepStats()
+    writer = ResultWriter()
+    history_recorder.start()
+    health_recorder.start()  # outcomes of checks that raced traffic are folded in there
+    try:
+        async with writer:
+            if workers == 0:
+                async for chunk in proxy_chunks(query):
+                    await check_all_proxies(chunk, mode, stats, writer)
+            else:
+                checker = ShardedChecker(workers)
+                try:
+                    await checker.check(proxy_chunks(query), mode, stats, writer)
+                finally:
+                    await checker.close()
+    finally:
+        stats.write_dropped = writer.dropped
+        await health_recorder.stop()
+        await history_recorder.stop()
+        await checker_engine.close()
+    return stats
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CHECKER_WORKERS or one per core; 0 = in-process)")
+    parser.add_argument("--owner", help="only this owner's proxies")
+    parser.add_argument("--due", action="store_true", help="only proxies whose next_check_at has passed")
+    parser.add_argument("--mode", choices=[m.value for m in CheckMode], default=CheckMode.SEQUENTIAL.value)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    start = time.perf_counter()
+    stats = asyncio.run(run(args.workers, args.owner, args.due, CheckMode(args.mode)))
+    elapsed = time.perf_counter() - start
+    print(
+        f"✅ {stats.done}/{stats.total} checked in {elapsed:.1f}s ({stats.done / elapsed:.1f}/s): "
+        f"{stats.live} live, {stats.probe_eliminated} dead at probe, {stats.check_eliminated} dead at check"
+    )
+    if stats.write_dropped:
+        print(f"❌ {stats.write_dropped} results could not be saved")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,6 +5,116 @@ class Settings(BaseSettings):
     MONGODB_URL: str = "mongodb://localhost:27017"
     DB_NAME: str = "proxy_manager"
 
+    # Proxy checker engine (shared aiohttp session)
+    CHECKER_CONNECTOR_LIMIT: int = 200         # max open connections in total
+    CHECKER_CONNECTOR_LIMIT_PER_HOST: int = 0  # 0 = unlimited per proxy
+    CHECKER_KEEPALIVE_TIMEOUT: float = 30.0    # seconds an idle connection is kept
+    CHECKER_DNS_CACHE_TTL: int = 300           # seconds, for check target hosts
+    CHECKER_REAL_IP_TTL: int = 300             # seconds to reuse our detected real IP
+    CHECKER_SOCKS_POOL_SIZE: int = 256         # per-proxy SOCKS sessions kept open (LRU)
+    CHECKER_SOCKS_LIMIT_PER_PROXY: int = 4     # connections per SOCKS session
+    CHECKER_TARGETS: list[dict] = []           # replaces the built-in check targets when set (JSON list of {"url", "parse"})
+
+    # Fast-fail TCP pre-probe stage of a sweep
+    CHECKER_PROBE_ENABLED: bool = True
+    CHECKER_PROBE_TIMEOUT: float = 3.0         # seconds for connect (+ handshake)
+    CHECKER_PROBE_HANDSHAKE: bool = False      # also require a CONNECT / SOCKS greeting reply
+    CHECKER_PROBE_CONCURRENCY: int = 200       # probes are cheap, run many more at once
+    CHECKER_CONCURRENCY: int = 30              # full HTTP checks in flight per event loop
+
+    # Multi-process checker: sweeps sharded over worker processes
+    CHECKER_WORKERS: int = 0                   # worker processes for check jobs; 0 = in the API process
+    CHECKER_SHARD_BATCH: int = 200             # proxies per message to a worker
+    CHECKER_SHARD_QUEUE: int = 8               # messages queued per worker before the feeder waits
+
+    # Claim workers: check nodes that claim due proxies from MongoDB under a lease.
+    # Replaces the scheduler's re-check jobs; extra nodes run python -m app.check_worker.
+    CLAIM_WORKER_ENABLED: bool = False         # run a claim worker in the API process
+    CLAIM_WORKER_BATCH: int = 100              # proxies claimed per batch
+    CLAIM_WORKER_BATCHES: int = 2              # batches checked at once per worker
+    CLAIM_WORKER_LEASE: float = 120.0          # seconds a claim lasts without a heartbeat
+    CLAIM_WORKER_HEARTBEAT: float = 30.0       # seconds between lease extensions
+
+    # Batched write-back of sweep results
+    CHECKER_FLUSH_SIZE: int = 500              # updates per bulk_write
+    CHECKER_FLUSH_INTERVAL: float = 2.0        # seconds between time-based flushes
+    CHECKER_FLUSH_RETRIES: int = 3             # retries of a failed bulk_write before its results are dropped
+    CHECKER_FLUSH_BACKOFF: float = 0.5         # seconds before the first retry, doubled each time
+
+    # Streaming proxy import
+    IMPORT_BATCH_SIZE: int = 1000              # parsed lines per insert_many
+    IMPORT_DETECT_TIMEOUT: float = 2.0         # seconds per protocol sniff (connect + reply)
+    IMPORT_DETECT_CONCURRENCY: int = 200       # proxies sniffed at once during auto-detect
+
+    # Background check jobs
+    CHECK_JOB_CHUNK_SIZE: int = 1000           # proxies loaded from Mongo per step
+    CHECK_JOB_PROGRESS_INTERVAL: float = 2.0   # seconds between progress/cancel polls
+    CHECK_JOB_IDLE_POLL: float = 5.0           # seconds the worker sleeps when idle
+
+    # Adaptive re-check scheduler (intervals in seconds)
+    SCHEDULER_ENABLED: bool = True
+    SCHEDULER_TICK: int = 60                   # how often due proxies are queued
+    SCHEDULER_BATCH_SIZE: int = 2000           # max proxies queued per tick
+    SCHEDULER_LIVE_INTERVAL: int = 30 * 60     # stable LIVE proxies
+    SCHEDULER_FLAP_INTERVAL: int = 5 * 60      # proxies that keep changing status
+    SCHEDULER_DEAD_BASE_INTERVAL: int = 10 * 60  # first re-check after failing, doubles per failure
+    SCHEDULER_DEAD_MAX_INTERVAL: int = 24 * 3600
+    SCHEDULER_EXPIRY_WINDOW: int = 24 * 3600   # proxies expiring this soon are checked often
+
+    # Dashboard snapshots
+    DASHBOARD_CACHE_TTL: float = 30.0          # seconds; changes invalidate earlier
+
+    # Authenticated user cache
+    USER_CACHE_SIZE: int = 1024                # max users kept (LRU)
+    USER_CACHE_TTL: float = 30.0               # seconds before re-reading from Mongo
+
+    # bcrypt runs in a thread pool so it never blocks the event loop
+    PASSWORD_HASH_WORKERS: int = 4             # max concurrent hash/verify operations
+
+    # In-memory proxy rotation pool (GET /api/proxies/next)
+    ROTATION_REFRESH_INTERVAL: float = 300.0   # seconds before a pool is re-read from Mongo
+    ROTATION_LATENCY_TOP_K: int = 5            # lowest_latency mode rotates over this many
+    ROTATION_DEFAULT_LATENCY: float = 1000.0   # ms assumed for weighting when unknown
+
+    # Sticky proxy leases (/api/leases)
+    LEASE_DEFAULT_MINUTES: int = 10
+    LEASE_MAX_MINUTES: int = 24 * 60
+    LEASE_WHEEL_SLOTS: int = 3600              # one-second slots in the expiry wheel
+    LEASE_PERSIST_INTERVAL: float = 5.0        # seconds between syncs of leases to Mongo
+
+    # Local forward proxy gateway (services/gateway.py)
+    GATEWAY_ENABLED: bool = False
+    GATEWAY_HOST: str = "127.0.0.1"
+    GATEWAY_PORT: int = 8899
+    GATEWAY_POOL_OWNER: str = ""               # forward through this user's proxies; empty = all
+    GATEWAY_ROTATION_MODE: str = "weighted"    # see RotationMode
+    GATEWAY_RETRIES: int = 2                   # extra upstreams tried before answering 502
+    GATEWAY_CONNECT_TIMEOUT: float = 10.0
+    GATEWAY_IDLE_TIMEOUT: float = 60.0         # client keep-alive and pooled upstream connections
+    GATEWAY_MAX_IDLE_PER_UPSTREAM: int = 8
+    GATEWAY_MAX_BODY: int = 10 * 1024 * 1024   # bytes of a plain HTTP request body (buffered for retries)
+    GATEWAY_FAILURE_THRESHOLD: int = 3         # consecutive failures before an upstream is skipped
+    GATEWAY_FAILURE_COOLDOWN: float = 30.0     # seconds it stays skipped
+
+    # Rolling proxy health (checks + reported traffic)
+    HEALTH_EWMA_ALPHA: float = 0.2             # weight of the newest outcome
+    HEALTH_MIN_SAMPLES: int = 5                # below this, quality uses check latency only
+    HEALTH_GOOD_RATIO: float = 0.9             # success ratio needed for GOOD
+    HEALTH_BAD_RATIO: float = 0.5              # success ratio below this is BAD
+    HEALTH_FRESHNESS: int = 15 * 60            # a success this recent counts as live proof
+    HEALTH_FLUSH_INTERVAL: float = 5.0         # seconds between writes of reported outcomes
+
+    # Check history (time-series collection + hourly rollups)
+    HISTORY_RETENTION_DAYS: int = 14           # raw samples
+    HISTORY_ROLLUP_RETENTION_DAYS: int = 180   # hourly rollups
+    HISTORY_FLUSH_SIZE: int = 1000
+    HISTORY_FLUSH_INTERVAL: float = 5.0
+    HISTORY_RAW_MAX_HOURS: int = 48            # longer windows are served from rollups
+
+    # Local geo-IP lookups (build the file with `python -m app.build_geoip`)
+    GEOIP_DB_PATH: str = ""                    # empty = use geo fields from the check target
+    GEOIP_CACHE_SIZE: int = 65536              # exit IPs kept in the lookup cache
+
     model_config = {"env_file": ".env"}
 
 
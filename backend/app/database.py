@@ -1,15 +1,40 @@
 from beanie import init_beanie
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo.errors import OperationFailure
 from app.config import settings
 from app.models.account import Account
+from app.models.check_history import CheckRollup, CheckSample
+from app.models.check_job import CheckJob
+from app.models.lease import ProxyLease
 from app.models.proxy import Proxy
 from app.models.provider import Provider
 from app.models.user import User
 
+_DUPLICATE_KEY = 11000
 
-async def init_db():
-    client = AsyncIOMotorClient(settings.MONGODB_URL)
-    await init_beanie(
-        database=client[settings.DB_NAME],
-        document_models=[Account, Proxy, Provider, User],
-    )
+DOCUMENT_MODELS = [Account, CheckJob, CheckRollup, CheckSample, Proxy, Provider, ProxyLease, User]
+
+
+def get_database() -> AsyncIOMotorDatabase:
+    return AsyncIOMotorClient(settings.MONGODB_URL)[settings.DB_NAME]
+
+
+async def init_db(allow_index_dropping: bool = False):
+    """
+    Create the indexes declared in each model's Settings. Indexes that are no
+    longer declared are only dropped when asked (python -m app.migrate_db
+    --drop-indexes), so an index added by hand survives restarts.
+    """
+    try:
+        await init_beanie(
+            database=get_database(),
+            document_models=DOCUMENT_MODELS,
+            allow_index_dropping=allow_index_dropping,
+        )
+    except OperationFailure as exc:
+        if exc.code != _DUPLICATE_KEY:
+            raise
+        raise RuntimeError(
+            f"Cannot build a unique index, existing data has duplicates ({exc.details.get('errmsg', exc)}). "
+            "Run `python -m app.migrate_db` to resolve them."
+        ) from exc
@@ -1,16 +1,47 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from app.config import settings
 from app.database import init_db
-from app.routers import proxies, accounts, providers, dashboard, auth
+from app.routers import proxies, accounts, providers, dashboard, auth, leases, gateway
 from app.services.auth_service import ensure_default_users
+from app.services.check_history import history_recorder
+from app.services.check_jobs import check_job_worker
+from app.services.claim_worker import claim_worker
+from app.services.gateway import gateway as proxy_gateway
+from app.services.health import health_recorder
+from app.services.leases import lease_manager
+from app.services.proxy_checker import checker_engine
+from app.services.result_writer import flush_all_writers
+from app.services.scheduler import start_scheduler, stop_scheduler
+from app.services.sharded_checker import sharded_checker
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_db()
     await ensure_default_users()
+    await checker_engine.start()
+    check_job_worker.start()
+    await lease_manager.start()
+    health_recorder.start()
+    history_recorder.start()
+    if settings.CLAIM_WORKER_ENABLED:
+        claim_worker.start()
+    start_scheduler()
+    if settings.GATEWAY_ENABLED:
+        await proxy_gateway.start()
     yield
+    await proxy_gateway.close()
+    stop_scheduler()
+    await lease_manager.stop()
+    await health_recorder.stop()
+    await check_job_worker.stop()
+    await claim_worker.stop()
+    await sharded_checker.close()
+    await flush_all_writers()
+    await history_recorder.stop()
+    await checker_engine.close()
 
 
 app = FastAPI(
@@ -46,6 +77,8 @@ app.include_router(accounts.router, prefix="/api/accounts", tags=["Accounts"])
 app.include_router(providers.router, prefix="/api/providers", tags=["Providers"])
 app.include_router(dashboard.router, prefix="/api/dashboard", tags=["Dashboard"])
 app.include_router(auth.router, prefix="/api/auth", tags=["Auth"])
+app.include_router(leases.router, prefix="/api/leases", tags=["Leases"])
+app.include_router(gateway.router, prefix="/api/gateway", tags=["Gateway"])
 
 
 @app.get("/")
@@ -0,0 +1,94 @@
+"""
+One-off data migration for the unique indexes: resolves duplicate proxies,
+reports duplicate usernames, then creates the declared indexes.
+
+Usage:
+    docker compose exec backend python -m app.migrate_db --dry-run
+    docker compose exec backend python -m app.migrate_db
+    docker compose exec backend python -m app.migrate_db --drop-indexes
+
+Duplicate proxies (same ip, port, protocol and owner) keep their oldest copy.
+Accounts pointing at a removed copy are moved to the kept one and leases on
+removed copies are deleted; every removal is printed. Duplicate usernames are
+not merged automatically: the script lists them and stops, rename or remove
+the extra users and run it again. --drop-indexes also drops indexes that are
+not declared on the models (renamed indexes, or ones added by hand).
+"""
+
+import argparse
+import asyncio
+import sys
+from app.database import get_database, init_db
+from app.models.account import Account
+from app.models.lease import ProxyLease
+from app.models.proxy import Proxy
+from app.models.user import User
+
+
+async def _duplicates(collection, key: dict) -> list[list]:
+    """Ids of each group of documents sharing `key`, oldest first."""
+    pipeline = [
+        {"$sort": {"_id": 1}},
+        {"$group": {"_id": key, "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+    return [group["ids"] async for group in collection.aggregate(pipeline, allowDiskUse=True)]
+
+
+async def find_duplicate_usernames(db) -> list[list]:
+    return await _duplicates(db[User.Settings.name], "$username")
+
+
+async def dedupe_proxies(db, dry_run: bool) -> int:
+    """Remove every copy but the oldest of each duplicated proxy. Returns how many went."""
+    proxies = db[Proxy.Settings.name]
+    key = {"ip": "$ip", "port": "$port", "protocol": "$protocol", "owner": "$owner"}
+    removed = 0
+    for kept, *extra in await _duplicates(proxies, key):
+        doc = await proxies.find_one({"_id": kept}, {"ip": 1, "port": 1, "protocol": 1, "owner": 1})
+        accounts = await db[Account.Settings.name].count_documents({"proxy_id": {"$in": extra}})
+        print(
+            f"{'would remove' if dry_run else 'removing'} {len(extra)} cop{'y' if len(extra) == 1 else 'ies'} of "
+            f"{doc.get('protocol')}://{doc['ip']}:{doc['port']} (owner {doc.get('owner')!r}), keeping {kept}: "
+            f"{', '.join(map(str, extra))}; {accounts} account(s) moved to the kept copy"
+        )
+        removed += len(extra)
+        if dry_run:
+            continue
+        # References first: a crash in between leaves duplicates, never dangling accounts
+        await db[Account.Settings.name].update_many({"proxy_id": {"$in": extra}}, {"$set": {"proxy_id": kept}})
+        await db[ProxyLease.Settings.name].delete_many({"proxy_id": {"$in": extra}})
+        await proxies.delete_many({"_id": {"$in": extra}})
+    return removed
+
+
+async def run(dry_run: bool, drop_indexes: bool) -> int:
+    db = get_database()
+    usernames = await find_duplicate_usernames(db)
+    for ids in usernames:
+        user = await db[User.Settings.name].find_one({"_id": ids[0]}, {"username": 1})
+        print(f"❌ username {user['username']!r} is used by {len(ids)} users: {', '.join(map(str, ids))}")
+
+    removed = await dedupe_proxies(db, dry_run)
+    if dry_run:
+        print(f"Dry run: {removed} duplicate proxies and {len(usernames)} duplicate usernames found, nothing changed")
+        return 1 if usernames else 0
+    if usernames:
+        print("❌ Rename or remove the duplicate users above, then run the migration again")
+        return 1
+
+    await init_db(allow_index_dropping=drop_indexes)
+    print(f"✅ Removed {removed} duplicate proxies; indexes are up to date")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="only report what would change")
+    parser.add_argument("--drop-indexes", action="store_true", help="also drop indexes not declared on the models")
+    args = parser.parse_args()
+    return asyncio.run(run(args.dry_run, args.drop_indexes))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
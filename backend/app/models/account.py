@@ -1,5 +1,6 @@
 from beanie import Document, PydanticObjectId
 from pydantic import Field
+from pymongo import ASCENDING, IndexModel
 from typing import Optional
 from datetime import datetime, timezone
 from enum import Enum
@@ -25,3 +26,8 @@ class Account(Document):
 
     class Settings:
         name = "accounts"
+        indexes = [
+            IndexModel([("owner", ASCENDING), ("_id", ASCENDING)], name="owner_id"),
+            IndexModel([("owner", ASCENDING), ("status", ASCENDING), ("_id", ASCENDING)], name="owner_status_id"),
+            IndexModel([("owner", ASCENDING), ("platform", ASCENDING), ("_id", ASCENDING)], name="owner_platform_id"),
+        ]
@@ -0,0 +1,65 @@
+from beanie import Document, Granularity, PydanticObjectId, TimeSeriesConfig
+from pydantic import BaseModel
+from pymongo import ASCENDING, IndexModel
+from typing import Optional
+from datetime import datetime
+from app.config import settings
+
+
+class CheckMeta(BaseModel):
+    """Time-series meta field: samples are bucketed per proxy."""
+    p: PydanticObjectId           # proxy id
+    o: str = ""                   # owner
+    v: Optional[str] = None       # provider_name
+
+
+class CheckSample(Document):
+    """One check result. Field names are short because every sample stores them."""
+    t: datetime                   # checked at
+    m: CheckMeta
+    s: str                        # ProxyStatus value
+    l: Optional[float] = None     # latency, ms
+    c: Optional[str] = None       # country
+    r: Optional[str] = None       # region
+    ci: Optional[str] = None      # city
+    ipv: Optional[str] = None     # ip_version
+
+    class Settings:
+        name = "check_history"
+        timeseries = TimeSeriesConfig(
+            time_field="t",
+            meta_field="m",
+            granularity=Granularity.minutes,
+            expire_after_seconds=settings.HISTORY_RETENTION_DAYS * 86400,
+        )
+        indexes = [
+            IndexModel([("m.p", ASCENDING), ("t", ASCENDING)], name="proxy_time"),
+            IndexModel([("m.o", ASCENDING), ("t", ASCENDING)], name="owner_time"),
+        ]
+
+
+class CheckRollup(Document):
+    """Hourly per-proxy aggregate of CheckSample, kept longer than raw samples."""
+    proxy_id: PydanticObjectId
+    owner: str = ""
+    provider_name: Optional[str] = None
+    hour: datetime
+    checks: int = 0
+    live: int = 0
+    latency_sum: float = 0.0
+    latency_count: int = 0
+    latency_min: Optional[float] = None
+    latency_max: Optional[float] = None
+    latency_hist: dict[str, int] = {}   # "le<ms>" bucket -> count (see LATENCY_BUCKETS)
+
+    class Settings:
+        name = "check_rollups"
+        indexes = [
+            IndexModel([("proxy_id", ASCENDING), ("hour", ASCENDING)], name="proxy_hour", unique=True),
+            IndexModel([("owner", ASCENDING), ("hour", ASCENDING)], name="owner_hour"),
+            IndexModel(
+                [("hour", ASCENDING)],
+                name="hour_ttl",
+                expireAfterSeconds=settings.HISTORY_ROLLUP_RETENTION_DAYS * 86400,
+            ),
+        ]
@@ -0,0 +1,57 @@
+from beanie import Document, PydanticObjectId
+from pydantic import Field
+from pymongo import ASCENDING, IndexModel
+from typing import Optional
+from datetime import datetime, timezone
+from enum import Enum
+
+
+class CheckJobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    CANCELLED = "cancelled"
+    FAILED = "failed"
+
+
+class CheckJob(Document):
+    owner: str                                   # username that requested the sweep
+    scope_owner: Optional[str] = None            # only this owner's proxies; None = all
+    proxy_ids: Optional[list[PydanticObjectId]] = None  # explicit subset (e.g. an import)
+    import_batch: Optional[str] = None           # proxies of one streaming import (Proxy.import_batch)
+    mode: str = "sequential"                     # proxy_checker.CheckMode value
+    sweep_key: Optional[str] = None              # scope of a full sweep, set while queued or running
+    status: CheckJobStatus = CheckJobStatus.QUEUED
+    total: int = 0
+    done: int = 0
+    live: int = 0
+    dead: int = 0
+    probe_eliminated: int = 0
+    cancel_requested: bool = False
+    error: Optional[str] = None
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc)
+    )
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    @property
+    def rate_per_sec(self) -> float:
+        if not self.started_at or not self.done:
+            return 0.0
+        started = self.started_at.replace(tzinfo=timezone.utc)
+        finished = (self.finished_at or datetime.now(timezone.utc)).replace(tzinfo=timezone.utc)
+        elapsed = (finished - started).total_seconds()
+        return round(self.done / elapsed, 2) if elapsed > 0 else 0.0
+
+    class Settings:
+        name = "check_jobs"
+        indexes = [
+            IndexModel([("status", ASCENDING), ("created_at", ASCENDING)], name="status_created_at"),
+            IndexModel([("scope_owner", ASCENDING), ("status", ASCENDING)], name="scope_owner_status"),
+            # At most one active full sweep per scope; finished jobs clear the key
+            IndexModel(
+                [("sweep_key", ASCENDING)], name="active_sweep", unique=True,
+                partialFilterExpression={"sweep_key": {"$type": "string"}},
+            ),
+        ]
@@ -0,0 +1,25 @@
+from beanie import Document, PydanticObjectId
+from pydantic import Field
+from pymongo import ASCENDING, IndexModel
+from datetime import datetime, timezone
+
+
+class ProxyLease(Document):
+    """Persisted copy of an in-memory lease (see services/leases.py)."""
+    lease_id: str
+    proxy_id: PydanticObjectId
+    owner: str                      # username that took the lease
+    holder: str                     # account id or client id the proxy is pinned to
+    expires_at: datetime
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc)
+    )
+
+    class Settings:
+        name = "proxy_leases"
+        indexes = [
+            IndexModel([("lease_id", ASCENDING)], name="lease_id", unique=True),
+            IndexModel([("proxy_id", ASCENDING)], name="proxy_id", unique=True),
+            # Mongo removes rows the app did not get to (e.g. after a crash)
+            IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+        ]
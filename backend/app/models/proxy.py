@@ -1,5 +1,6 @@
 from beanie import Document, PydanticObjectId
-from pydantic import Field
+from pydantic import BaseModel, Field
+from pymongo import ASCENDING, IndexModel
 from typing import Optional
 from datetime import datetime, timezone
 from enum import Enum
@@ -8,6 +9,7 @@ from enum import Enum
 class ProxyProtocol(str, Enum):
     HTTP = "http"
     HTTPS = "https"
+    SOCKS4 = "socks4"
     SOCKS5 = "socks5"
 
 
@@ -31,6 +33,16 @@ class ProxyAnonymity(str, Enum):
     ELITE = "elite"              # fully anonymous
 
 
+class ProxyHealth(BaseModel):
+    """Rolling health from active checks and real traffic (see services/health.py)."""
+    latency: Optional[float] = None        # EWMA of successful uses, ms
+    success_ratio: Optional[float] = None  # EWMA of outcomes, 0..1
+    samples: int = 0
+    errors: dict[str, float] = {}          # decaying share of each failure kind
+    last_success_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
 class Proxy(Document):
     ip: str
     port: int
@@ -45,20 +57,43 @@ class Proxy(Document):
     last_check: Optional[datetime] = None
     latency: Optional[float] = None  # milliseconds
     check_count: int = 0
+    next_check_at: Optional[datetime] = None  # set by the adaptive scheduler
+    claimed_by: Optional[str] = None          # check worker holding this proxy (claim_worker)
+    lease_until: Optional[datetime] = None    # claim expires unless the worker heartbeats
+    fail_streak: int = 0                      # consecutive non-LIVE checks
+    flap_score: float = 0.0                   # decaying rate of status changes, 0..1
+    health: Optional[ProxyHealth] = None
     anonymity: Optional[ProxyAnonymity] = None
     country: Optional[str] = None
     note: Optional[str] = None
     provider_id: Optional[PydanticObjectId] = None
     owner: str = ""  # username of the creator
+    import_batch: Optional[str] = None        # streaming import that created it
     created_at: datetime = Field(
         default_factory=lambda: datetime.now(timezone.utc)
     )
 
     @property
     def connection_string(self) -> str:
+        scheme = ProxyProtocol(self.protocol).value
         if self.username and self.password:
-            return f"{self.protocol}://{self.username}:{self.password}@{self.ip}:{self.port}"
-        return f"{self.protocol}://{self.ip}:{self.port}"
+            return f"{scheme}://{self.username}:{self.password}@{self.ip}:{self.port}"
+        return f"{scheme}://{self.ip}:{self.port}"
 
     class Settings:
         name = "proxies"
+        indexes = [
+            # _id suffix lets keyset pagination walk the index without a sort
+            IndexModel([("owner", ASCENDING), ("_id", ASCENDING)], name="owner_id"),
+            IndexModel([("owner", ASCENDING), ("status", ASCENDING), ("_id", ASCENDING)], name="owner_status_id"),
+            IndexModel([("owner", ASCENDING), ("provider_name", ASCENDING), ("_id", ASCENDING)], name="owner_provider_id"),
+            IndexModel([("expire_at", ASCENDING)], name="expire_at"),
+            IndexModel([("next_check_at", ASCENDING)], name="next_check_at"),
+            IndexModel([("claimed_by", ASCENDING)], name="claimed_by"),
+            IndexModel([("import_batch", ASCENDING), ("_id", ASCENDING)], name="import_batch_id"),
+            IndexModel(
+                [("ip", ASCENDING), ("port", ASCENDING), ("protocol", ASCENDING), ("owner", ASCENDING)],
+                name="ip_port_protocol_owner",
+                unique=True,
+            ),
+        ]
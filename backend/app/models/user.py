@@ -1,5 +1,6 @@
 from beanie import Document
 from pydantic import Field
+from pymongo import ASCENDING, IndexModel
 from typing import Optional
 from datetime import datetime, timezone
 from enum import Enum
@@ -21,3 +22,6 @@ class User(Document):
 
     class Settings:
         name = "users"
+        indexes = [
+            IndexModel([("username", ASCENDING)], name="username", unique=True),
+        ]
@@ -4,6 +4,8 @@ from typing import Optional
 from app.models.account import Account, AccountStatus
 from app.models.user import User, UserRole
 from app.routers.auth import get_current_user
+from app.routers.pagination import paginate
+from app.services.dashboard_cache import dashboard_cache
 
 router = APIRouter()
 
@@ -52,6 +54,8 @@ async def list_accounts(
     status: Optional[AccountStatus] = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    include_total: bool = True,
     current_user: User = Depends(get_current_user),
 ):
     query = _owner_filter(current_user)
@@ -60,9 +64,10 @@ async def list_accounts(
     if status:
         query["status"] = status
 
-    accounts = await Account.find(query).skip(skip).limit(limit).to_list()
-    total = await Account.find(query).count()
-    return {"data": accounts, "total": total, "skip": skip, "limit": limit}
+    return await paginate(
+        Account, query, limit, skip, cursor, include_total,
+        estimate_total=current_user.role == UserRole.ADMIN,
+    )
 
 
 @router.post("", status_code=201)
@@ -72,6 +77,7 @@ async def create_account(
 ):
     account = Account(**body.model_dump(), owner=current_user.username)
     await account.insert()
+    await dashboard_cache.invalidate(account.owner)
     return account
 
 
@@ -93,6 +99,7 @@ async def update_account(
     for key, value in body.model_dump(exclude_none=True).items():
         setattr(account, key, value)
     await account.save()
+    await dashboard_cache.invalidate(account.owner)
     return account
 
 
@@ -103,4 +110,5 @@ async def delete_account(
 ):
     account = await _get_account_owned(account_id, current_user)
     await account.delete()
+    await dashboard_cache.invalidate(account.owner)
     return {"message": "Account deleted"}
@@ -2,7 +2,7 @@ from fastapi import APIRouter, HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
 from typing import List, Optional
-from app.services.auth_service import authenticate_user, create_access_token, decode_token, get_user_by_username, create_user
+from app.services.auth_service import authenticate_user, create_access_token, decode_token, get_user_by_username, get_cached_user, create_user, user_cache
 from app.models.user import User, UserRole
 
 router = APIRouter()
@@ -54,7 +54,7 @@ async def get_current_user(
     if username is None:
         raise credentials_exception
 
-    user = await get_user_by_username(username)
+    user = await get_cached_user(username)
     if user is None or not user.is_active:
         raise credentials_exception
 
@@ -141,6 +141,7 @@ async def update_user_role(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     user.role = body.role
     await user.save()
+    user_cache.invalidate(username)
     return UserInfo(username=user.username, role=user.role, is_active=user.is_active)
 
 
@@ -164,10 +165,11 @@ async def edit_user(
         user.username = body.new_username
     
     if body.new_password:
-        from app.services.auth_service import hash_password
-        user.hashed_password = hash_password(body.new_password)
+        from app.services.auth_service import hash_password_async
+        user.hashed_password = await hash_password_async(body.new_password)
         
     await user.save()
+    user_cache.invalidate(username, user.username)
     return UserInfo(username=user.username, role=user.role, is_active=user.is_active)
 
 
@@ -185,6 +187,7 @@ async def toggle_user_active(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     user.is_active = not user.is_active
     await user.save()
+    user_cache.invalidate(username)
     return UserInfo(username=user.username, role=user.role, is_active=user.is_active)
 
 
@@ -201,4 +204,12 @@ async def delete_user(
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     await user.delete()
+    user_cache.invalidate(username)
+
 
+@router.get("/cache-stats")
+async def get_user_cache_stats(current_user: User = Depends(get_current_user)):
+    """Hit rate of the authenticated-user cache (admin only)."""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin only")
+    return user_cache.stats()
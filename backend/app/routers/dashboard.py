@@ -1,77 +1,233 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from datetime import datetime, timezone, timedelta
+from app.config import settings
+from app.models.check_history import CheckRollup, CheckSample
 from app.models.proxy import Proxy, ProxyStatus
 from app.models.account import Account
 from app.models.user import User, UserRole
 from app.routers.auth import get_current_user
+from app.services.check_history import histogram_percentile
+from app.services.dashboard_cache import ADMIN_KEY, dashboard_cache
 
 router = APIRouter()
 
 
+def _proxy_pipeline(match: dict, now: datetime, expiry_threshold: datetime) -> list[dict]:
+    """One $facet pass over the owner's proxies: counts, costs and the expiring slice."""
+    return [
+        {"$match": match},
+        {"$facet": {
+            "total": [{"$count": "count"}],
+            "by_status": [{"$group": {"_id": "$status", "count": {"$sum": 1}}}],
+            "expiring_soon": [
+                {"$match": {"expire_at": {"$gte": now, "$lte": expiry_threshold}}},
+                {"$project": {"ip": 1, "port": 1, "expire_at": 1, "provider_name": 1, "cost": 1}},
+            ],
+            "live_cost": [
+                {"$match": {"status": ProxyStatus.LIVE.value}},
+                {"$group": {"_id": None, "total": {"$sum": {"$ifNull": ["$cost", 0]}}}},
+            ],
+            "by_provider": [
+                {"$match": {"cost": {"$nin": [None, 0]}, "provider_name": {"$nin": [None, ""]}}},
+                {"$group": {"_id": "$provider_name", "total": {"$sum": "$cost"}}},
+            ],
+        }},
+    ]
+
+
+def _account_pipeline(match: dict) -> list[dict]:
+    return [
+        {"$match": match},
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}},
+    ]
+
+
 @router.get("")
 async def get_dashboard(current_user: User = Depends(get_current_user)):
-    """Return aggregated stats for the dashboard, scoped by role."""
-    now = datetime.now(timezone.utc)
-    expiry_threshold = now + timedelta(days=3)
-
+    """Return aggregated stats for the dashboard, scoped by role (cached per owner)."""
     # Admin sees all; user sees only their own data
     if current_user.role == UserRole.ADMIN:
-        all_proxies = await Proxy.find_all().to_list()
-        all_accounts = await Account.find_all().to_list()
+        key, match = ADMIN_KEY, {}
     else:
-        all_proxies = await Proxy.find({"owner": current_user.username}).to_list()
-        all_accounts = await Account.find({"owner": current_user.username}).to_list()
+        key, match = current_user.username, {"owner": current_user.username}
 
-    # Proxy counts by status
-    status_counts = {s.value: 0 for s in ProxyStatus}
-    for p in all_proxies:
-        status_counts[p.status.value] += 1
+    return await dashboard_cache.get_or_compute(key, lambda: _compute_dashboard(match))
 
-    # Proxies expiring within 3 days
-    expiring_soon = [
-        p for p in all_proxies
-        if p.expire_at and now <= p.expire_at.replace(tzinfo=timezone.utc) <= expiry_threshold
-    ]
 
-    # Cost calculations
-    active_proxies = [p for p in all_proxies if p.status == ProxyStatus.LIVE]
-    total_monthly_cost = sum(p.cost or 0 for p in active_proxies)
-    renewal_cost = sum(p.cost or 0 for p in expiring_soon)
+async def _compute_dashboard(match: dict) -> dict:
+    now = datetime.now(timezone.utc)
+    expiry_threshold = now + timedelta(days=3)
 
-    # Account counts by status
-    account_status_counts = {}
-    for a in all_accounts:
-        account_status_counts[a.status.value] = account_status_counts.get(a.status.value, 0) + 1
+    proxy_stats = (await Proxy.get_motor_collection()
+                   .aggregate(_proxy_pipeline(match, now, expiry_threshold))
+                   .to_list(None))[0]
+    account_groups = await Account.get_motor_collection().aggregate(_account_pipeline(match)).to_list(None)
 
-    # Cost breakdown by provider
-    provider_costs: dict[str, float] = {}
-    for p in all_proxies:
-        if p.cost and p.provider_name:
-            provider_costs[p.provider_name] = provider_costs.get(p.provider_name, 0) + p.cost
+    # Proxy counts by status
+    status_counts = {s.value: 0 for s in ProxyStatus}
+    for group in proxy_stats["by_status"]:
+        status_counts[group["_id"]] = group["count"]
+
+    expiring_soon = proxy_stats["expiring_soon"]
+    live_cost = proxy_stats["live_cost"]
+    total_monthly_cost = live_cost[0]["total"] if live_cost else 0
+    renewal_cost = sum(p.get("cost") or 0 for p in expiring_soon)
+
+    account_status_counts = {g["_id"]: g["count"] for g in account_groups}
 
     return {
         "proxies": {
-            "total": len(all_proxies),
+            "total": proxy_stats["total"][0]["count"] if proxy_stats["total"] else 0,
             "by_status": status_counts,
             "expiring_soon": [
                 {
-                    "id": str(p.id),
-                    "ip": p.ip,
-                    "port": p.port,
-                    "expire_at": p.expire_at,
-                    "provider_name": p.provider_name,
-                    "cost": p.cost,
+                    "id": str(p["_id"]),
+                    "ip": p["ip"],
+                    "port": p["port"],
+                    "expire_at": p["expire_at"],
+                    "provider_name": p.get("provider_name"),
+                    "cost": p.get("cost"),
                 }
                 for p in expiring_soon
             ],
         },
         "accounts": {
-            "total": len(all_accounts),
+            "total": sum(account_status_counts.values()),
             "by_status": account_status_counts,
         },
         "billing": {
             "total_monthly_cost": round(total_monthly_cost, 2),
             "renewal_needed": round(renewal_cost, 2),
-            "by_provider": {k: round(v, 2) for k, v in provider_costs.items()},
+            "by_provider": {g["_id"]: round(g["total"], 2) for g in proxy_stats["by_provider"]},
         },
     }
+
+
+# ── Provider analytics ───────────────────────────────────────────────────────
+
+def _provider_inventory_pipeline(match: dict) -> list[dict]:
+    return [
+        {"$match": match},
+        {"$group": {
+            "_id": "$provider_name",
+            "proxies": {"$sum": 1},
+            "live": {"$sum": {"$cond": [{"$eq": ["$status", ProxyStatus.LIVE.value]}, 1, 0]}},
+            "cost": {"$sum": {"$ifNull": ["$cost", 0]}},
+        }},
+    ]
+
+
+def _churn_stages(provider: str, proxy: str, checks, live) -> list[dict]:
+    """Share of each provider's checked proxies that were both live and dead in the window."""
+    return [
+        {"$group": {"_id": {"v": provider, "p": proxy}, "checks": {"$sum": checks}, "live": {"$sum": live}}},
+        {"$group": {
+            "_id": "$_id.v",
+            "proxies": {"$sum": 1},
+            "flapping": {"$sum": {"$cond": [
+                {"$and": [{"$gt": ["$live", 0]}, {"$lt": ["$live", "$checks"]}]}, 1, 0,
+            ]}},
+        }},
+    ]
+
+
+def _provider_raw_pipeline(match: dict, since: datetime) -> list[dict]:
+    """Per-provider stats straight from check_history samples (short windows)."""
+    live = {"$cond": [{"$eq": ["$s", ProxyStatus.LIVE.value]}, 1, 0]}
+    return [
+        {"$match": {**match, "t": {"$gte": since}}},
+        {"$facet": {
+            "stats": [{"$group": {
+                "_id": "$m.v",
+                "checks": {"$sum": 1},
+                "live": {"$sum": live},
+                # $percentile needs MongoDB 7.0+; nulls (failed checks) are ignored
+                "latency": {"$percentile": {"input": "$l", "p": [0.5, 0.95], "method": "approximate"}},
+            }}],
+            "churn": _churn_stages("$m.v", "$m.p", 1, live),
+        }},
+    ]
+
+
+def _provider_rollup_pipeline(match: dict, since: datetime) -> list[dict]:
+    """Same stats from the hourly rollups; percentiles come from their histograms."""
+    return [
+        {"$match": {**match, "hour": {"$gte": since.replace(minute=0, second=0, microsecond=0)}}},
+        {"$facet": {
+            "stats": [{"$group": {"_id": "$provider_name", "checks": {"$sum": "$checks"}, "live": {"$sum": "$live"}}}],
+            "latency": [
+                {"$project": {"provider_name": 1, "h": {"$objectToArray": {"$ifNull": ["$latency_hist", {}]}}}},
+                {"$unwind": "$h"},
+                {"$group": {"_id": {"v": "$provider_name", "b": "$h.k"}, "count": {"$sum": "$h.v"}}},
+            ],
+            "churn": _churn_stages("$provider_name", "$proxy_id", "$checks", "$live"),
+        }},
+    ]
+
+
+@router.get("/providers")
+async def get_provider_analytics(
+    days: int = Query(7, ge=1, le=settings.HISTORY_ROLLUP_RETENTION_DAYS),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Which providers deliver: live ratio, p50/p95 latency and churn over the
+    last `days` days, plus cost per currently live proxy. Windows longer than
+    HISTORY_RAW_MAX_HOURS are computed from the hourly rollups.
+    """
+    owner = None if current_user.role == UserRole.ADMIN else current_user.username
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    use_raw = days * 24 <= settings.HISTORY_RAW_MAX_HOURS
+
+    inventory = await Proxy.get_motor_collection().aggregate(
+        _provider_inventory_pipeline({"owner": owner} if owner else {})
+    ).to_list(None)
+    if use_raw:
+        history = (await CheckSample.get_motor_collection().aggregate(
+            _provider_raw_pipeline({"m.o": owner} if owner else {}, since)
+        ).to_list(None))[0]
+        percentiles = {g["_id"]: g["latency"] for g in history["stats"]}
+    else:
+        history = (await CheckRollup.get_motor_collection().aggregate(
+            _provider_rollup_pipeline({"owner": owner} if owner else {}, since)
+        ).to_list(None))[0]
+        histograms: dict = {}
+        for g in history["latency"]:
+            histograms.setdefault(g["_id"].get("v"), {})[g["_id"]["b"]] = g["count"]
+        percentiles = {
+            name: [histogram_percentile(hist, 0.5), histogram_percentile(hist, 0.95)]
+            for name, hist in histograms.items()
+        }
+
+    stats = {g["_id"]: g for g in history["stats"]}
+    churn = {g["_id"]: g for g in history["churn"]}
+    current = {g["_id"]: g for g in inventory}
+
+    providers = []
+    for name in {*current, *stats}:
+        now_stats = current.get(name, {})
+        window = stats.get(name, {})
+        flaps = churn.get(name, {})
+        p50, p95 = percentiles.get(name) or (None, None)
+        checks = window.get("checks", 0)
+        live_now = now_stats.get("live", 0)
+        providers.append({
+            "provider_name": name,
+            "proxies": now_stats.get("proxies", 0),
+            "live_now": live_now,
+            "cost": round(now_stats.get("cost", 0), 2),
+            "cost_per_live": round(now_stats["cost"] / live_now, 2) if live_now else None,
+            "checks": checks,
+            "live_ratio": round(window["live"] / checks, 4) if checks else None,
+            "latency_p50": round(p50, 1) if p50 is not None else None,
+            "latency_p95": round(p95, 1) if p95 is not None else None,
+            "churn": round(flaps["flapping"] / flaps["proxies"], 4) if flaps.get("proxies") else None,
+        })
+    providers.sort(key=lambda p: (p["live_ratio"] is None, -(p["live_ratio"] or 0)))
+
+    return {
+        "days": days,
+        "since": since,
+        "source": "raw" if use_raw else "rollup",
+        "providers": providers,
+    }
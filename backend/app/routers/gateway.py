@@ -0,0 +1,19 @@
+from fastapi import APIRouter, HTTPException, Depends
+from app.config import settings
+from app.models.user import User, UserRole
+from app.routers.auth import get_current_user
+from app.services.gateway import gateway
+
+router = APIRouter()
+
+
+@router.get("/stats")
+async def get_gateway_stats(current_user: User = Depends(get_current_user)):
+    """Per-upstream request counts, failures and throughput (admin only)."""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin only")
+    return {
+        "enabled": settings.GATEWAY_ENABLED,
+        "listen": f"{gateway.host}:{gateway.port}",
+        "upstreams": gateway.stats(),
+    }
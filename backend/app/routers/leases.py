@@ -0,0 +1,114 @@
+from fastapi import APIRouter, HTTPException, Depends
+from pydantic import BaseModel, Field
+from typing import Optional
+from app.config import settings
+from app.models.account import Account
+from app.models.proxy import ProxyAnonymity, ProxyProtocol
+from app.models.user import User, UserRole
+from app.routers.auth import get_current_user
+from app.services.leases import Lease, lease_manager
+from app.services.rotation import ALL_OWNERS, RotationMode
+
+router = APIRouter()
+
+
+# ── Schemas ──────────────────────────────────────────────────────────────────
+
+class LeaseCreate(BaseModel):
+    # Exactly one of account_id / client_id identifies who holds the proxy
+    account_id: Optional[str] = None
+    client_id: Optional[str] = None
+    minutes: int = Field(default=settings.LEASE_DEFAULT_MINUTES, ge=1, le=settings.LEASE_MAX_MINUTES)
+    mode: RotationMode = RotationMode.ROUND_ROBIN
+    country: Optional[str] = None
+    protocol: Optional[ProxyProtocol] = None
+    anonymity: Optional[ProxyAnonymity] = None
+
+
+class LeaseRenew(BaseModel):
+    minutes: int = Field(default=settings.LEASE_DEFAULT_MINUTES, ge=1, le=settings.LEASE_MAX_MINUTES)
+
+
+def _get_lease_owned(lease_id: str, current_user: User) -> Lease:
+    lease = lease_manager.get(lease_id)
+    if not lease:
+        raise HTTPException(status_code=404, detail="Lease not found or expired")
+    if current_user.role != UserRole.ADMIN and lease.owner != current_user.username:
+        raise HTTPException(status_code=403, detail="Access denied")
+    return lease
+
+
+async def _holder(body: LeaseCreate, current_user: User) -> str:
+    if (body.account_id is None) == (body.client_id is None):
+        raise HTTPException(status_code=400, detail="Provide exactly one of account_id or client_id")
+    if body.client_id is not None:
+        return f"client:{body.client_id}"
+    account = await Account.get(body.account_id)
+    if not account:
+        raise HTTPException(status_code=404, detail="Account not found")
+    if current_user.role != UserRole.ADMIN and account.owner != current_user.username:
+        raise HTTPException(status_code=403, detail="Access denied")
+    return f"account:{account.id}"
+
+
+# ── Endpoints ────────────────────────────────────────────────────────────────
+
+@router.get("")
+async def list_leases(current_user: User = Depends(get_current_user)):
+    owner = None if current_user.role == UserRole.ADMIN else current_user.username
+    return [lease.as_dict() for lease in lease_manager.active(owner)]
+
+
+@router.post("")
+async def create_lease(
+    body: LeaseCreate,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Lease a LIVE + GOOD proxy exclusively for an account or client. Asking
+    again for the same holder returns (and extends) its current lease.
+    """
+    holder = await _holder(body, current_user)
+    key = ALL_OWNERS if current_user.role == UserRole.ADMIN else current_user.username
+    lease = await lease_manager.acquire(
+        current_user.username,
+        key,
+        holder,
+        body.minutes,
+        body.mode,
+        body.country,
+        body.protocol.value if body.protocol else None,
+        body.anonymity.value if body.anonymity else None,
+    )
+    if lease is None:
+        raise HTTPException(status_code=404, detail="No unleased live proxy available")
+    return lease.as_dict()
+
+
+@router.get("/{lease_id}")
+async def get_lease(
+    lease_id: str,
+    current_user: User = Depends(get_current_user),
+):
+    return _get_lease_owned(lease_id, current_user).as_dict()
+
+
+@router.post("/{lease_id}/renew")
+async def renew_lease(
+    lease_id: str,
+    body: LeaseRenew,
+    current_user: User = Depends(get_current_user),
+):
+    lease = await lease_manager.renew(_get_lease_owned(lease_id, current_user), body.minutes)
+    if lease is None:
+        raise HTTPException(status_code=404, detail="Lease not found or expired")
+    return lease.as_dict()
+
+
+@router.delete("/{lease_id}")
+async def release_lease(
+    lease_id: str,
+    current_user: User = Depends(get_current_user),
+):
+    await lease_manager.release(_get_lease_owned(lease_id, current_user))
+    return {"message": "Lease released"}
@@ -0,0 +1,64 @@
+import base64
+import binascii
+from typing import Optional
+from beanie import Document
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException
+
+
+def encode_cursor(last_id: ObjectId) -> str:
+    """Opaque page token: the last _id of the page, url-safe base64."""
+    return base64.urlsafe_b64encode(ObjectId(last_id).binary).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> ObjectId:
+    try:
+        return ObjectId(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, InvalidId, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def paginate(
+    model: type[Document],
+    query: dict,
+    limit: int,
+    skip: int = 0,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    estimate_total: bool = False,
+) -> dict:
+    """
+    Keyset pagination in _id order. With a cursor the page starts after the
+    cursor's _id, so deep pages cost the same as the first one; `skip` is only
+    honoured without a cursor (legacy clients). The total can be skipped, or
+    estimated from collection metadata when the query is unfiltered.
+    """
+    page_query = query
+    if cursor:
+        page_query = {**query, "_id": {"$gt": decode_cursor(cursor)}}
+
+    finder = model.find(page_query).sort("_id")
+    if skip and not cursor:
+        finder = finder.skip(skip)
+    items = await finder.limit(limit + 1).to_list()
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1].id)
+
+    total = None
+    if include_total:
+        if estimate_total and not query:
+            total = await model.get_motor_collection().estimated_document_count()
+        else:
+            total = await model.find(query).count()
+
+    return {
+        "data": items,
+        "total": total,
+        "skip": skip,
+        "limit": limit,
+        "next_cursor": next_cursor,
+    }
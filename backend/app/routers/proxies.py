@@ -1,12 +1,24 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Query, Depends
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Query, Depends, Request
+from pydantic import BaseModel, Field
 from typing import Optional
+from pymongo.errors import DuplicateKeyError
 import re
 from datetime import datetime, timezone
-from app.models.proxy import Proxy, ProxyProtocol, ProxyStatus
+from app.config import settings
+from app.models.check_job import CheckJob
+from app.models.proxy import Proxy, ProxyAnonymity, ProxyProtocol, ProxyStatus
 from app.models.user import User, UserRole
 from app.routers.auth import get_current_user
-from app.services.proxy_checker import check_and_update_proxy, check_all_proxies
+from app.routers.pagination import paginate
+from app.services.check_history import HistoryResolution, proxy_history
+from app.services.check_jobs import cancel_check_job, enqueue_check_job
+from app.services.dashboard_cache import dashboard_cache
+from app.services.health import health_recorder
+from app.services.leases import lease_manager
+from app.services.proxy_checker import CheckMode, check_and_update_proxy
+from app.services.protocol_detect import detect_protocols
+from app.services.proxy_import import StreamImport, iter_lines, line_protocol, parse_proxy_line
+from app.services.rotation import ALL_OWNERS, RotationMode, rotation_service
 
 router = APIRouter()
 
@@ -40,48 +52,16 @@ class ProxyUpdate(BaseModel):
 class ImportBody(BaseModel):
     text: str
     protocol: ProxyProtocol = ProxyProtocol.HTTP
+    detect_protocol: bool = False  # sniff bare ip:port lines; `protocol` is the fallback
     provider_name: Optional[str] = None
     cost: Optional[float] = None
     auto_check: bool = True  # tự động check sau import
+    check_mode: CheckMode = CheckMode.SEQUENTIAL
 
 
 _PROTO_RE = re.compile(r"^(https?|socks[45])://", re.IGNORECASE)
 
 
-def parse_proxy_line(line: str, protocol: ProxyProtocol, provider_name: Optional[str], cost: Optional[float]) -> Optional[Proxy]:
-    line = line.strip()
-    if not line or line.startswith("#"):
-        return None
-    try:
-        # Bóc tách protocol prefix: http:// https:// socks4:// socks5://
-        cleaned = _PROTO_RE.sub("", line)
-
-        if "@" in cleaned:
-            auth, host = cleaned.rsplit("@", 1)
-            username, password = auth.split(":", 1)
-            ip, port_str = host.rsplit(":", 1)
-        else:
-            parts = cleaned.split(":")
-            if len(parts) == 2:
-                ip, port_str = parts
-                username, password = None, None
-            elif len(parts) == 4:
-                ip, port_str, username, password = parts
-            else:
-                return None
-        return Proxy(
-            ip=ip.strip(),
-            port=int(port_str.strip()),
-            username=username.strip() if username else None,
-            password=password.strip() if password else None,
-            protocol=protocol,
-            provider_name=provider_name,
-            cost=cost,
-        )
-    except Exception:
-        return None
-
-
 def _owner_filter(current_user: User) -> dict:
     """Return a filter dict: empty for admin (see all), or owner filter for user."""
     if current_user.role == UserRole.ADMIN:
@@ -106,6 +86,8 @@ async def list_proxies(
     provider_name: Optional[str] = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    include_total: bool = True,
     current_user: User = Depends(get_current_user),
 ):
     query = _owner_filter(current_user)
@@ -114,9 +96,10 @@ async def list_proxies(
     if provider_name:
         query["provider_name"] = provider_name
 
-    proxies = await Proxy.find(query).skip(skip).limit(limit).to_list()
-    total = await Proxy.find(query).count()
-    return {"data": proxies, "total": total, "skip": skip, "limit": limit}
+    return await paginate(
+        Proxy, query, limit, skip, cursor, include_total,
+        estimate_total=current_user.role == UserRole.ADMIN,
+    )
 
 
 @router.post("", status_code=201)
@@ -125,43 +108,126 @@ async def create_proxy(
     current_user: User = Depends(get_current_user),
 ):
     proxy = Proxy(**body.model_dump(), owner=current_user.username)
-    await proxy.insert()
+    try:
+        await proxy.insert()
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Proxy already exists")
+    await dashboard_cache.invalidate(proxy.owner)
     return proxy
 
 
 @router.post("/import")
 async def import_proxies(
     body: ImportBody,
-    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
 ):
     lines = body.text.strip().splitlines()
     created = []
     failed_lines = 0
 
-    for line in lines:
-        proxy = parse_proxy_line(line, body.protocol, body.provider_name, body.cost)
+    parsed = [(line, parse_proxy_line(line, body.protocol, body.provider_name, body.cost)) for line in lines]
+    detected = 0
+    if body.detect_protocol:
+        undetected = []
+        for line, proxy in parsed:
+            if proxy is None:
+                continue
+            explicit = line_protocol(line)
+            if explicit:
+                proxy.protocol = explicit
+            else:
+                undetected.append(proxy)
+        detected = await detect_protocols(undetected, body.protocol)
+
+    for line, proxy in parsed:
         if proxy:
             proxy.owner = current_user.username
-            await proxy.insert()
+            try:
+                await proxy.insert()
+            except DuplicateKeyError:
+                failed_lines += 1
+                continue
             created.append(proxy)
         else:
             failed_lines += 1
 
+    if created:
+        await dashboard_cache.invalidate(current_user.username)
+
     # Auto-check proxy vừa import trong background
+    job = None
     if body.auto_check and created:
-        async def run_check():
-            await check_all_proxies(created)
-
-        background_tasks.add_task(run_check)
+        job = await enqueue_check_job(
+            current_user.username,
+            proxy_ids=[p.id for p in created],
+            mode=body.check_mode,
+        )
 
     return {
         "imported": len(created),
         "failed": failed_lines,
+        "detected": detected,
         "proxies": created,
-        "checking": body.auto_check and len(created) > 0,
+        "checking": job is not None,
+        "job_id": str(job.id) if job else None,
     }
 
+
+@router.post("/import/stream")
+async def import_proxies_stream(
+    request: Request,
+    protocol: ProxyProtocol = ProxyProtocol.HTTP,
+    detect_protocol: bool = False,
+    provider_name: Optional[str] = None,
+    cost: Optional[float] = None,
+    auto_check: bool = True,
+    check_mode: CheckMode = CheckMode.SEQUENTIAL,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Import a large proxy list sent as a text/plain body or a multipart `file`
+    upload. Lines are parsed as they arrive, deduplicated on
+    (ip, port, protocol, owner) and inserted in batches; only counts are returned.
+    With `detect_protocol`, lines without a scheme have their protocol sniffed.
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(400, "Missing 'file' field")
+
+        async def chunks():
+            while chunk := await upload.read(64 * 1024):
+                yield chunk
+
+        source = chunks()
+    else:
+        source = request.stream()
+
+    importer = StreamImport(current_user.username, protocol, provider_name, cost, detect=detect_protocol)
+    await importer.run(iter_lines(source))
+    if importer.imported:
+        await dashboard_cache.invalidate(current_user.username)
+
+    job = None
+    if auto_check and importer.imported:
+        job = await enqueue_check_job(
+            current_user.username,
+            mode=check_mode,
+            import_batch=importer.batch_id,
+        )
+
+    return {
+        "imported": importer.imported,
+        "duplicates": importer.duplicates,
+        "failed": importer.failed,
+        "detected": importer.detected,
+        "job_id": str(job.id) if job else None,
+        "checking": job is not None,
+    }
+
+
 class CheckRawBody(BaseModel):
     proxy_url: str  # format: protocol://ip:port hoặc ip:port
 
@@ -174,6 +240,7 @@ class CheckBatchItem(BaseModel):
 
 class CheckBatchBody(BaseModel):
     proxies: list[CheckBatchItem]
+    mode: CheckMode = CheckMode.SEQUENTIAL
 
 
 @router.post("/check-batch")
@@ -209,19 +276,14 @@ async def check_batch_proxies(
 
             # Detect protocol
             proto_match = re.match(r"^(https?|socks[45])://", proxy_url, re.IGNORECASE)
-            protocol = ProxyProtocol.HTTP
-            if proto_match:
-                p = proto_match.group(1).lower()
-                protocol = {"http": ProxyProtocol.HTTP, "https": ProxyProtocol.HTTPS,
-                            "socks4": ProxyProtocol.SOCKS5, "socks5": ProxyProtocol.SOCKS5
-                            }.get(p, ProxyProtocol.HTTP)
+            protocol = ProxyProtocol(proto_match.group(1).lower()) if proto_match else ProxyProtocol.HTTP
 
             temp_proxy = Proxy(
                 ip=ip.strip(), port=port, protocol=protocol,
                 username=item.username, password=item.password,
                 owner=current_user.username,
             )
-            result = await check_single_proxy(temp_proxy, real_ip)
+            result = await check_single_proxy(temp_proxy, real_ip, body.mode)
 
             return {
                 "proxy_url": proxy_url,
@@ -277,11 +339,7 @@ async def check_raw_proxy(
 
     # Detect protocol from URL
     proto_match = re.match(r"^(https?|socks[45])://", body.proxy_url, re.IGNORECASE)
-    protocol = ProxyProtocol.HTTP
-    if proto_match:
-        p = proto_match.group(1).lower()
-        protocol = {"http": ProxyProtocol.HTTP, "https": ProxyProtocol.HTTPS,
-                     "socks4": ProxyProtocol.SOCKS5, "socks5": ProxyProtocol.SOCKS5}.get(p, ProxyProtocol.HTTP)
+    protocol = ProxyProtocol(proto_match.group(1).lower()) if proto_match else ProxyProtocol.HTTP
 
     # Tạo proxy tạm (không lưu DB)
     temp_proxy = Proxy(ip=ip, port=port, protocol=protocol, owner=current_user.username)
@@ -299,6 +357,29 @@ async def check_raw_proxy(
     }
 
 
+@router.get("/next")
+async def next_proxy(
+    mode: RotationMode = RotationMode.ROUND_ROBIN,
+    country: Optional[str] = None,
+    protocol: Optional[ProxyProtocol] = None,
+    anonymity: Optional[ProxyAnonymity] = None,
+    current_user: User = Depends(get_current_user),
+):
+    """Allocate the next LIVE + GOOD proxy from the in-memory rotation pool."""
+    key = ALL_OWNERS if current_user.role == UserRole.ADMIN else current_user.username
+    entry = await rotation_service.next(
+        key,
+        mode,
+        country,
+        protocol.value if protocol else None,
+        anonymity.value if anonymity else None,
+        exclude=lease_manager.leased_ids(),
+    )
+    if entry is None:
+        raise HTTPException(status_code=404, detail="No live proxy available")
+    return entry.as_dict()
+
+
 @router.get("/{proxy_id}")
 async def get_proxy(
     proxy_id: str,
@@ -307,6 +388,18 @@ async def get_proxy(
     return await _get_proxy_owned(proxy_id, current_user)
 
 
+@router.get("/{proxy_id}/history")
+async def get_proxy_history(
+    proxy_id: str,
+    hours: int = Query(24, ge=1, le=settings.HISTORY_ROLLUP_RETENTION_DAYS * 24),
+    resolution: HistoryResolution = HistoryResolution.AUTO,
+    current_user: User = Depends(get_current_user),
+):
+    """Latency and uptime of a proxy over time, from its check history."""
+    proxy = await _get_proxy_owned(proxy_id, current_user)
+    return await proxy_history(proxy.id, hours, resolution)
+
+
 @router.put("/{proxy_id}")
 async def update_proxy(
     proxy_id: str,
@@ -316,7 +409,12 @@ async def update_proxy(
     proxy = await _get_proxy_owned(proxy_id, current_user)
     for key, value in body.model_dump(exclude_none=True).items():
         setattr(proxy, key, value)
-    await proxy.save()
+    try:
+        await proxy.save()
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Proxy already exists")
+    await dashboard_cache.invalidate(proxy.owner)
+    rotation_service.apply_results([proxy])
     return proxy
 
 
@@ -327,6 +425,8 @@ async def delete_proxy(
 ):
     proxy = await _get_proxy_owned(proxy_id, current_user)
     await proxy.delete()
+    await dashboard_cache.invalidate(proxy.owner)
+    rotation_service.remove(proxy)
     return {"message": "Proxy deleted"}
 
 
@@ -340,16 +440,84 @@ async def check_proxy(
     return updated
 
 
+class OutcomeReport(BaseModel):
+    ok: bool
+    latency: Optional[float] = None  # ms, for successful requests
+    error: Optional[str] = None      # failure kind, e.g. "timeout", "blocked", "connect_failed"
+
+
+class OutcomeReportBody(BaseModel):
+    outcomes: list[OutcomeReport] = Field(min_length=1, max_length=1000)
+
+
+@router.post("/{proxy_id}/report", status_code=202)
+async def report_proxy_outcomes(
+    proxy_id: str,
+    body: OutcomeReportBody,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Report how real requests through this proxy went. Outcomes are folded into
+    the proxy's rolling health (and quality) within HEALTH_FLUSH_INTERVAL.
+    """
+    proxy = await _get_proxy_owned(proxy_id, current_user)
+    for outcome in body.outcomes:
+        health_recorder.record(proxy.id, outcome.ok, outcome.latency, outcome.error)
+    return {"accepted": len(body.outcomes)}
+
+
 @router.post("/check-all/run")
 async def check_all(
-    background_tasks: BackgroundTasks,
+    mode: CheckMode = CheckMode.SEQUENTIAL,
     current_user: User = Depends(get_current_user),
 ):
-    query = _owner_filter(current_user)
-    proxies = await Proxy.find(query).to_list()
+    scope_owner = _owner_filter(current_user).get("owner")
+    job = await enqueue_check_job(current_user.username, scope_owner=scope_owner, mode=mode)
+    return {"message": "Proxy check queued", "job": _job_progress(job)}
+
+
+def _job_progress(job: CheckJob) -> dict:
+    return {
+        "id": str(job.id),
+        "status": job.status,
+        "mode": job.mode,
+        "total": job.total,
+        "done": job.done,
+        "live": job.live,
+        "dead": job.dead,
+        "probe_eliminated": job.probe_eliminated,
+        "rate_per_sec": job.rate_per_sec,
+        "cancel_requested": job.cancel_requested,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
 
-    async def run_check():
-        await check_all_proxies(proxies)
 
-    background_tasks.add_task(run_check)
-    return {"message": f"Started checking {len(proxies)} proxies in background"}
+async def _get_job_owned(job_id: str, current_user: User) -> CheckJob:
+    job = await CheckJob.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Check job not found")
+    if current_user.role != UserRole.ADMIN and job.owner != current_user.username:
+        raise HTTPException(status_code=403, detail="Access denied")
+    return job
+
+
+@router.get("/check-jobs/{job_id}")
+async def get_check_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+):
+    job = await _get_job_owned(job_id, current_user)
+    return _job_progress(job)
+
+
+@router.post("/check-jobs/{job_id}/cancel")
+async def cancel_check_job_endpoint(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+):
+    job = await _get_job_owned(job_id, current_user)
+    job = await cancel_check_job(job)
+    return _job_progress(job)
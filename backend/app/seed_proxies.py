@@ -26,7 +26,7 @@ LINE_RE = re.compile(r"^(https?|socks[45])://(.+):(\d+)\s*$", re.IGNORECASE)
 PROTOCOL_MAP = {
     "http":   ProxyProtocol.HTTP,
     "https":  ProxyProtocol.HTTPS,
-    "socks4": ProxyProtocol.SOCKS5,   # closest match in our enum
+    "socks4": ProxyProtocol.SOCKS4,
     "socks5": ProxyProtocol.SOCKS5,
 }
 
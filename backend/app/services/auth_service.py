@@ -1,7 +1,12 @@
+import asyncio
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from app.config import settings
 from app.models.user import User, UserRole
 
 SECRET_KEY = "proxy-manager-super-secret-key-change-in-production"
@@ -10,6 +15,12 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 1 day
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt takes ~100-300ms of CPU and releases the GIL, so a small dedicated pool
+# keeps logins off the event loop; its size caps concurrent hashing.
+_password_pool = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt"
+)
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -19,6 +30,16 @@ def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_pool, verify_password, plain_password, hashed_password)
+
+
+async def hash_password_async(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_pool, hash_password, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + (
@@ -37,7 +58,7 @@ def decode_token(token: str) -> Optional[dict]:
 
 async def authenticate_user(username: str, password: str) -> Optional[User]:
     user = await User.find_one(User.username == username)
-    if not user or not verify_password(password, user.hashed_password):
+    if not user or not await verify_password_async(password, user.hashed_password):
         return None
     if not user.is_active:
         return None
@@ -48,10 +69,65 @@ async def get_user_by_username(username: str) -> Optional[User]:
     return await User.find_one(User.username == username)
 
 
+class UserCache:
+    """Bounded LRU of users keyed by username, each entry valid for `ttl` seconds."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[float, User]] = OrderedDict()
+
+    def get(self, username: str) -> Optional[User]:
+        entry = self._entries.get(username)
+        if entry is None or entry[0] < time.monotonic():
+            self._entries.pop(username, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(username)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, user: User) -> None:
+        self._entries[user.username] = (time.monotonic() + self.ttl, user)
+        self._entries.move_to_end(user.username)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, *usernames: str) -> None:
+        for username in usernames:
+            self._entries.pop(username, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+user_cache = UserCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL)
+
+
+async def get_cached_user(username: str) -> Optional[User]:
+    """Like get_user_by_username, but served from user_cache when possible."""
+    user = user_cache.get(username)
+    if user is None:
+        user = await get_user_by_username(username)
+        if user is not None:
+            user_cache.put(user)
+    return user
+
+
 async def create_user(username: str, password: str, role: UserRole = UserRole.USER) -> User:
     user = User(
         username=username,
-        hashed_password=hash_password(password),
+        hashed_password=await hash_password_async(password),
         role=role,
     )
     await user.insert()
@@ -0,0 +1,198 @@
+import asyncio
+import bisect
+import logging
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from typing import Optional
+from pymongo import UpdateOne
+from app.config import settings
+from app.models.check_history import CheckRollup, CheckSample
+from app.models.proxy import Proxy, ProxyStatus
+
+logger = logging.getLogger(__name__)
+
+
+# Upper edges (ms) of the rollup latency histogram, used for percentiles
+# over windows too long to read raw samples
+LATENCY_BUCKETS = (100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 8000, 12000)
+_OVERFLOW_BUCKET = "le_inf"
+
+
+def latency_bucket(latency: float) -> str:
+    index = bisect.bisect_left(LATENCY_BUCKETS, latency)
+    return f"le{LATENCY_BUCKETS[index]}" if index < len(LATENCY_BUCKETS) else _OVERFLOW_BUCKET
+
+
+def histogram_percentile(hist: dict[str, int], q: float) -> Optional[float]:
+    """Upper bucket edge below which a `q` share of the samples fall."""
+    total = sum(hist.values())
+    if not total:
+        return None
+    seen = 0
+    for edge in LATENCY_BUCKETS:
+        seen += hist.get(f"le{edge}", 0)
+        if seen >= q * total:
+            return float(edge)
+    return float(LATENCY_BUCKETS[-1])  # in the overflow bucket: at least the last edge
+
+
+class HistoryResolution(str, Enum):
+    AUTO = "auto"      # raw up to HISTORY_RAW_MAX_HOURS, hourly beyond
+    RAW = "raw"
+    HOURLY = "hourly"
+
+
+def _hour(at: datetime) -> datetime:
+    return at.replace(minute=0, second=0, microsecond=0)
+
+
+class HistoryRecorder:
+    """
+    Buffers check results and writes them to the check_history time-series
+    collection with insert_many, folding them into hourly rollups (one $inc
+    upsert per proxy-hour) in the same flush. Flushed at HISTORY_FLUSH_SIZE
+    samples or every HISTORY_FLUSH_INTERVAL seconds.
+    """
+
+    def __init__(self, batch_size: int | None = None, interval: float | None = None):
+        self.batch_size = batch_size or settings.HISTORY_FLUSH_SIZE
+        self.interval = interval or settings.HISTORY_FLUSH_INTERVAL
+        self.written = 0
+        self._samples: list[dict] = []
+        self._rollups: dict[tuple, dict] = {}
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    async def add(self, proxy: Proxy, result: dict, at: datetime) -> None:
+        if proxy.id is None:
+            return  # preview check of an unsaved proxy
+        status = ProxyStatus(result["status"])
+        latency = result.get("latency")
+        self._samples.append({
+            "t": at,
+            "m": {"p": proxy.id, "o": proxy.owner, "v": proxy.provider_name},
+            "s": status.value,
+            "l": latency,
+            "c": result.get("country"),
+            "r": result.get("region"),
+            "ci": result.get("city"),
+            "ipv": result.get("ip_version"),
+        })
+
+        rollup = self._rollups.setdefault((proxy.id, _hour(at)), {
+            "owner": proxy.owner, "provider_name": proxy.provider_name,
+            "checks": 0, "live": 0, "latency_sum": 0.0, "latency_count": 0,
+            "latency_min": None, "latency_max": None, "latency_hist": {},
+        })
+        rollup["checks"] += 1
+        if status == ProxyStatus.LIVE:
+            rollup["live"] += 1
+        if latency is not None:
+            rollup["latency_sum"] += latency
+            rollup["latency_count"] += 1
+            rollup["latency_min"] = latency if rollup["latency_min"] is None else min(rollup["latency_min"], latency)
+            rollup["latency_max"] = latency if rollup["latency_max"] is None else max(rollup["latency_max"], latency)
+            bucket = latency_bucket(latency)
+            rollup["latency_hist"][bucket] = rollup["latency_hist"].get(bucket, 0) + 1
+
+        if len(self._samples) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        async with self._lock:
+            samples, self._samples = self._samples, []
+            rollups, self._rollups = self._rollups, {}
+            if not samples:
+                return
+            try:
+                await CheckSample.get_motor_collection().insert_many(samples, ordered=False)
+                await CheckRollup.get_motor_collection().bulk_write(
+                    [_rollup_op(proxy_id, hour, r) for (proxy_id, hour), r in rollups.items()],
+                    ordered=False,
+                )
+                self.written += len(samples)
+            except Exception:
+                logger.exception("Failed to write %d check history samples", len(samples))
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await asyncio.shield(self.flush())
+
+
+def _rollup_op(proxy_id, hour: datetime, rollup: dict) -> UpdateOne:
+    update = {
+        "$set": {"owner": rollup["owner"], "provider_name": rollup["provider_name"]},
+        "$inc": {key: rollup[key] for key in ("checks", "live", "latency_sum", "latency_count")},
+    }
+    for bucket, count in rollup["latency_hist"].items():
+        update["$inc"][f"latency_hist.{bucket}"] = count
+    if rollup["latency_count"]:
+        update["$min"] = {"latency_min": rollup["latency_min"]}
+        update["$max"] = {"latency_max": rollup["latency_max"]}
+    return UpdateOne({"proxy_id": proxy_id, "hour": hour}, update, upsert=True)
+
+
+history_recorder = HistoryRecorder()
+
+
+# ── Queries ──────────────────────────────────────────────────────────────────
+
+async def proxy_history(proxy_id, hours: int, resolution: HistoryResolution = HistoryResolution.AUTO) -> dict:
+    """Latency/uptime points for one proxy over the last `hours` hours."""
+    since = datetime.now(timezone.utc) - timedelta(hours=hours)
+    if resolution == HistoryResolution.AUTO:
+        resolution = HistoryResolution.RAW if hours <= settings.HISTORY_RAW_MAX_HOURS else HistoryResolution.HOURLY
+
+    if resolution == HistoryResolution.RAW:
+        cursor = CheckSample.get_motor_collection().find(
+            {"m.p": proxy_id, "t": {"$gte": since}},
+            {"_id": 0, "t": 1, "s": 1, "l": 1, "c": 1},
+        ).sort("t", 1)
+        points = [
+            {"at": doc["t"], "status": doc["s"], "latency": doc.get("l"), "country": doc.get("c")}
+            async for doc in cursor
+        ]
+        checks = len(points)
+        live = sum(p["status"] == ProxyStatus.LIVE.value for p in points)
+        latencies = [p["latency"] for p in points if p["latency"] is not None]
+        latency_avg = sum(latencies) / len(latencies) if latencies else None
+    else:
+        cursor = CheckRollup.get_motor_collection().find(
+            {"proxy_id": proxy_id, "hour": {"$gte": _hour(since)}},
+        ).sort("hour", 1)
+        points, checks, live, latency_sum, latency_count = [], 0, 0, 0.0, 0
+        async for doc in cursor:
+            points.append({
+                "at": doc["hour"],
+                "checks": doc["checks"],
+                "uptime": round(doc["live"] / doc["checks"], 4) if doc["checks"] else None,
+                "latency_avg": round(doc["latency_sum"] / doc["latency_count"], 1) if doc["latency_count"] else None,
+                "latency_min": doc.get("latency_min"),
+                "latency_max": doc.get("latency_max"),
+            })
+            checks += doc["checks"]
+            live += doc["live"]
+            latency_sum += doc["latency_sum"]
+            latency_count += doc["latency_count"]
+        latency_avg = latency_sum / latency_count if latency_count else None
+
+    return {
+        "resolution": resolution.value,
+        "since": since,
+        "checks": checks,
+        "uptime": round(live / checks, 4) if checks else None,
+        "latency_avg": round(latency_avg, 1) if latency_avg is not None else None,
+        "points": points,
+    }
@@ -0,0 +1,234 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import AsyncIterator, Optional
+from beanie import PydanticObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.config import settings
+from app.models.check_job import CheckJob, CheckJobStatus
+from app.models.proxy import Proxy
+from app.services.proxy_checker import CheckMode, SweepStats, check_all_proxies
+from app.services.result_writer import ResultWriter
+from app.services.sharded_checker import sharded_checker
+
+logger = logging.getLogger(__name__)
+
+
+async def proxy_chunks(query: dict, chunk_size: int | None = None) -> AsyncIterator[list[Proxy]]:
+    """Walk the proxies matching `query` in _id order, one chunk in memory at a time."""
+    chunk_size = chunk_size or settings.CHECK_JOB_CHUNK_SIZE
+    last_id = None
+    while True:
+        page_query = dict(query)
+        if last_id is not None:
+            page_query = {"$and": [query, {"_id": {"$gt": last_id}}]}
+        chunk = await Proxy.find(page_query).sort("_id").limit(chunk_size).to_list()
+        if not chunk:
+            return
+        last_id = chunk[-1].id
+        yield chunk
+
+
+def _job_query(job: CheckJob) -> dict:
+    if job.proxy_ids is not None:
+        return {"_id": {"$in": job.proxy_ids}}
+    if job.import_batch is not None:
+        return {"owner": job.owner, "import_batch": job.import_batch}
+    if job.scope_owner is not None:
+        return {"owner": job.scope_owner}
+    return {}
+
+
+def _sweep_key(scope_owner: Optional[str]) -> str:
+    return f"owner:{scope_owner}" if scope_owner is not None else "all"
+
+
+async def enqueue_check_job(
+    owner: str,
+    scope_owner: Optional[str] = None,
+    proxy_ids: Optional[list[PydanticObjectId]] = None,
+    mode: CheckMode = CheckMode.SEQUENTIAL,
+    import_batch: Optional[str] = None,
+) -> CheckJob:
+    """
+    Queue a sweep. A full sweep of a scope that is already queued or running
+    returns the existing job instead of starting an overlapping one; the
+    unique active_sweep index settles concurrent requests. `proxy_ids` or
+    `import_batch` (the owner's proxies of one streaming import) narrow it.
+    """
+    full = proxy_ids is None and import_batch is None
+    sweep_key = _sweep_key(scope_owner) if full else None
+    while True:
+        job = CheckJob(
+            owner=owner, scope_owner=scope_owner, proxy_ids=proxy_ids, import_batch=import_batch,
+            mode=mode.value, sweep_key=sweep_key,
+        )
+        try:
+            await job.insert()
+        except DuplicateKeyError:
+            existing = await CheckJob.find_one({"sweep_key": sweep_key})
+            if existing:
+                return existing
+            continue  # it finished in between; queue ours
+        check_job_worker.wake()
+        return job
+
+
+async def cancel_check_job(job: CheckJob) -> CheckJob:
+    """Cancel a queued job outright; ask the worker to stop a running one."""
+    if job.status == CheckJobStatus.QUEUED:
+        finished_at = datetime.now(timezone.utc)
+        # Conditional: the worker may claim the job between our read and this write
+        result = await CheckJob.get_motor_collection().update_one(
+            {"_id": job.id, "status": CheckJobStatus.QUEUED},
+            {"$set": {"status": CheckJobStatus.CANCELLED, "finished_at": finished_at, "sweep_key": None}},
+        )
+        if result.matched_count:
+            job.status = CheckJobStatus.CANCELLED
+            job.finished_at = finished_at
+            job.sweep_key = None
+            return job
+        job = await CheckJob.get(job.id) or job
+    if job.status in (CheckJobStatus.QUEUED, CheckJobStatus.RUNNING):
+        job.cancel_requested = True
+        await job.set({CheckJob.cancel_requested: True})
+    return job
+
+
+class CheckJobWorker:
+    """Single loop that runs queued check jobs one at a time."""
+
+    def __init__(self):
+        self._task: asyncio.Task | None = None
+        self._wake = asyncio.Event()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    async def _run(self) -> None:
+        requeued = False
+        while True:
+            try:
+                if not requeued:
+                    # Jobs left RUNNING by a previous process never finished — run them again
+                    await CheckJob.get_motor_collection().update_many(
+                        {"status": CheckJobStatus.RUNNING},
+                        {"$set": {"status": CheckJobStatus.QUEUED, "done": 0, "live": 0, "dead": 0}},
+                    )
+                    requeued = True
+                job = await self._claim_next()
+                if job is not None:
+                    await self._run_claimed(job)
+                    continue
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), settings.CHECK_JOB_IDLE_POLL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Check job worker failed")
+            await asyncio.sleep(settings.CHECK_JOB_IDLE_POLL)
+
+    async def _run_claimed(self, job: CheckJob) -> None:
+        try:
+            await self._run_job(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.exception("Check job %s failed", job.id)
+            try:
+                await self._finish(job, CheckJobStatus.FAILED, str(exc))
+            except Exception:
+                # Stays RUNNING; the next start re-queues it
+                logger.exception("Failed to mark check job %s as failed", job.id)
+
+    async def _claim_next(self) -> CheckJob | None:
+        doc = await CheckJob.get_motor_collection().find_one_and_update(
+            {"status": CheckJobStatus.QUEUED},
+            {"$set": {
+                "status": CheckJobStatus.RUNNING,
+                "started_at": datetime.now(timezone.utc),
+            }},
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+        return CheckJob.model_validate(doc) if doc else None
+
+    async def _run_job(self, job: CheckJob) -> None:
+        query = _job_query(job)
+        job.total = await Proxy.find(query).count()
+        await job.set({CheckJob.total: job.total})
+
+        stats = SweepStats()
+        sweep = asyncio.create_task(self._sweep(query, CheckMode(job.mode), stats))
+        cancelled = False
+        try:
+            while not sweep.done():
+                await asyncio.wait({sweep}, timeout=settings.CHECK_JOB_PROGRESS_INTERVAL)
+                await self._save_progress(job, stats)
+                current = await CheckJob.get(job.id)
+                if current and current.cancel_requested and not sweep.done():
+                    sweep.cancel()
+                    cancelled = True
+            await asyncio.gather(sweep, return_exceptions=cancelled)
+        finally:
+            if not sweep.done():
+                sweep.cancel()
+                await asyncio.gather(sweep, return_exceptions=True)
+
+        await self._save_progress(job, stats)
+        await self._finish(job, CheckJobStatus.CANCELLED if cancelled else CheckJobStatus.DONE)
+
+    async def _sweep(self, query: dict, mode: CheckMode, stats: SweepStats) -> None:
+        writer = ResultWriter()
+        try:
+            async with writer:
+                if settings.CHECKER_WORKERS:
+                    await sharded_checker.check(proxy_chunks(query), mode, stats, writer)
+                    return
+                async for chunk in proxy_chunks(query):
+                    await check_all_proxies(chunk, mode, stats, writer)
+        finally:
+            stats.write_dropped = writer.dropped
+
+    async def _save_progress(self, job: CheckJob, stats: SweepStats) -> None:
+        job.done = stats.done
+        job.live = stats.live
+        job.dead = stats.done - stats.live
+        job.probe_eliminated = stats.probe_eliminated
+        await job.set({
+            CheckJob.done: job.done,
+            CheckJob.live: job.live,
+            CheckJob.dead: job.dead,
+            CheckJob.probe_eliminated: job.probe_eliminated,
+        })
+
+    async def _finish(self, job: CheckJob, status: CheckJobStatus, error: str | None = None) -> None:
+        job.status = status
+        job.error = error
+        job.finished_at = datetime.now(timezone.utc)
+        job.sweep_key = None
+        await job.set({
+            CheckJob.status: status,
+            CheckJob.error: error,
+            CheckJob.finished_at: job.finished_at,
+            CheckJob.sweep_key: None,
+        })
+        logger.info("Check job %s %s: %d/%d checked", job.id, status.value, job.done, job.total)
+
+
+check_job_worker = CheckJobWorker()
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import os
+import socket
+from datetime import datetime, timedelta, timezone
+from app.config import settings
+from app.models.proxy import Proxy
+from app.services.proxy_checker import CheckMode, SweepStats, check_all_proxies
+from app.services.result_writer import Guarded, ResultWriter
+
+logger = logging.getLogger(__name__)
+
+
+def _claimable(now: datetime) -> dict:
+    """Due for a re-check and not held under a live lease."""
+    return {"$and": [
+        {"$or": [{"next_check_at": {"$lte": now}}, {"next_check_at": None}]},
+        {"$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}]},
+    ]}
+
+
+class _ClaimWriter(ResultWriter):
+    """
+    Saves a result only while the claim is still ours (a worker whose lease
+    ran out has been superseded) and releases the claim in the same update.
+    """
+
+    def __init__(self, worker_id: str):
+        super().__init__()
+        self.worker_id = worker_id
+
+    def _filter(self, proxy: Proxy) -> dict:
+        return {"_id": proxy.id, "claimed_by": self.worker_id}
+
+    def _guard_filter(self, proxy: Proxy) -> dict:
+        # Our own main update may already have released the claim
+        return {"_id": proxy.id, "claimed_by": {"$in": [self.worker_id, None]}}
+
+    async def add(
+        self,
+        proxy: Proxy,
+        set_fields: dict,
+        inc_fields: dict | None = None,
+        guarded: Guarded | None = None,
+    ) -> None:
+        await super().add(proxy, {**set_fields, "claimed_by": None, "lease_until": None}, inc_fields, guarded)
+
+
+class ClaimWorker:
+    """
+    Checks due proxies claimed straight from the proxies collection, so check
+    nodes on any number of hosts share the work without a coordinator.
+
+    A claim stamps claimed_by / lease_until through a conditional update (a
+    proxy under a live lease never matches); a heartbeat keeps extending the
+    lease of everything the worker holds, and saving the result releases it.
+    Whatever a batch still holds when it finishes (check or write failed) is
+    released too. A worker that dies stops heartbeating, its leases lapse and
+    other workers pick the proxies up again.
+    """
+
+    def __init__(
+        self,
+        worker_id: str | None = None,
+        batch_size: int | None = None,
+        batches: int | None = None,
+        mode: CheckMode = CheckMode.RACE,
+    ):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.batch_size = batch_size or settings.CLAIM_WORKER_BATCH
+        self.batches = batches or settings.CLAIM_WORKER_BATCHES
+        self.mode = mode
+        self.stats = SweepStats()
+        self._writer: _ClaimWriter | None = None
+        self._claim_lock = asyncio.Lock()
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._writer = _ClaimWriter(self.worker_id)
+        self._writer.start()
+        self._tasks = [asyncio.create_task(self._heartbeat())]
+        self._tasks += [asyncio.create_task(self._run()) for _ in range(self.batches)]
+        logger.info("Claim worker %s started", self.worker_id)
+
+    async def stop(self) -> None:
+        if not self._tasks:
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self._writer.close()
+        self.stats.write_dropped = self._writer.dropped
+        await self.release()
+        logger.info("Claim worker %s stopped: %s", self.worker_id, self.stats.as_dict())
+
+    async def claim(self) -> list[Proxy]:
+        """
+        Claim up to batch_size due proxies, most overdue first: pick candidates,
+        take them with one update_many that re-checks claimability (so proxies
+        another node took in between are skipped), then read back what we got.
+        Claims by this worker's own batches are serialized, since the read-back
+        goes by claimed_by.
+        """
+        async with self._claim_lock:
+            now = datetime.now(timezone.utc)
+            lease_until = now + timedelta(seconds=settings.CLAIM_WORKER_LEASE)
+            collection = Proxy.get_motor_collection()
+            candidates = await collection.find(
+                _claimable(now), {"_id": 1}, sort=[("next_check_at", 1)], limit=self.batch_size,
+            ).to_list(None)
+            if not candidates:
+                return []
+            ids = [doc["_id"] for doc in candidates]
+            await collection.update_many(
+                {"$and": [{"_id": {"$in": ids}}, _claimable(now)]},
+                {"$set": {"claimed_by": self.worker_id, "lease_until": lease_until}},
+            )
+            docs = await collection.find({"_id": {"$in": ids}, "claimed_by": self.worker_id}).to_list(None)
+        return [Proxy.model_validate(doc) for doc in docs]
+
+    async def release(self, ids: list | None = None) -> None:
+        """
+        Give back claims still held (unchecked proxies become claimable at
+        once): all of them, or only those among `ids`.
+        """
+        query = {"claimed_by": self.worker_id}
+        if ids is not None:
+            query["_id"] = {"$in": ids}
+        await Proxy.get_motor_collection().update_many(query, {"$set": {"claimed_by": None, "lease_until": None}})
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(settings.CLAIM_WORKER_HEARTBEAT)
+            lease_until = datetime.now(timezone.utc) + timedelta(seconds=settings.CLAIM_WORKER_LEASE)
+            try:
+                await Proxy.get_motor_collection().update_many(
+                    {"claimed_by": self.worker_id},
+                    {"$set": {"lease_until": lease_until}},
+                )
+            except Exception:
+                logger.exception("Claim worker %s failed to extend its leases", self.worker_id)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                batch = await self.claim()
+                if batch:
+                    try:
+                        await check_all_proxies(batch, self.mode, self.stats, self._writer)
+                        await self._writer.flush()
+                    finally:
+                        # A saved result already released its claim; anything still held
+                        # failed to check or to write and must not be heartbeated forever
+                        await self.release([proxy.id for proxy in batch])
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Claim worker %s batch failed", self.worker_id)
+            await asyncio.sleep(settings.CHECK_JOB_IDLE_POLL)
+
+
+claim_worker = ClaimWorker()
@@ -0,0 +1,84 @@
+import asyncio
+import time
+from collections import defaultdict
+from typing import Awaitable, Callable, Optional, Protocol
+from app.config import settings
+from app.models.proxy import Proxy
+from app.services.result_writer import add_result_listener
+
+ADMIN_KEY = "*"  # snapshot of the admin (all owners) dashboard
+
+
+class CacheBackend(Protocol):
+    """Storage for dashboard snapshots; swap in e.g. a Redis-backed one."""
+
+    async def get(self, key: str) -> Optional[dict]: ...
+    async def set(self, key: str, value: dict, ttl: float) -> None: ...
+    async def delete(self, key: str) -> None: ...
+
+
+class MemoryCacheBackend:
+    """In-process TTL store (default)."""
+
+    def __init__(self):
+        self._data: dict[str, tuple[float, dict]] = {}
+
+    async def get(self, key: str) -> Optional[dict]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._data.pop(key, None)
+            return None
+        return value
+
+    async def set(self, key: str, value: dict, ttl: float) -> None:
+        self._data[key] = (time.monotonic() + ttl, value)
+
+    async def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+
+class DashboardCache:
+    """
+    Per-owner dashboard snapshots. Concurrent misses for the same owner share
+    one computation, and a snapshot computed while its owner's data changed is
+    not stored, so Mongo sees one aggregation per change rather than per poll.
+    """
+
+    def __init__(self, backend: CacheBackend | None = None, ttl: float | None = None):
+        self.backend = backend or MemoryCacheBackend()
+        self.ttl = ttl or settings.DASHBOARD_CACHE_TTL
+        self._locks: dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._generation: dict[str, int] = defaultdict(int)
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[dict]]) -> dict:
+        cached = await self.backend.get(key)
+        if cached is not None:
+            return cached
+        async with self._locks[key]:
+            cached = await self.backend.get(key)
+            if cached is not None:
+                return cached
+            generation = self._generation[key]
+            value = await compute()
+            if generation == self._generation[key]:
+                await self.backend.set(key, value, self.ttl)
+            return value
+
+    async def invalidate(self, *owners: str) -> None:
+        """Drop the snapshots of these owners and the admin-wide snapshot."""
+        for key in {*owners, ADMIN_KEY}:
+            self._generation[key] += 1
+            await self.backend.delete(key)
+
+
+dashboard_cache = DashboardCache()
+
+
+async def _on_results(proxies: list[Proxy]) -> None:
+    await dashboard_cache.invalidate(*{p.owner for p in proxies})
+
+
+add_result_listener(_on_results)
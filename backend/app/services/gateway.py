@@ -0,0 +1,563 @@
+import asyncio
+import base64
+import ipaddress
+import logging
+import struct
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+from urllib.parse import urlsplit
+from app.config import settings
+from app.services.health import health_recorder
+from app.services.leases import lease_manager
+from app.services.rotation import ALL_OWNERS, PoolEntry, RotationMode, rotation_service
+
+logger = logging.getLogger(__name__)
+
+# Returns an upstream proxy not in the given ids, or None when none is left.
+# The default draws from the rotation pool; tests can plug in a local stand-in.
+UpstreamSelector = Callable[[set], Awaitable[Optional[PoolEntry]]]
+
+_HOP_BY_HOP = {"connection", "keep-alive", "proxy-connection", "proxy-authorization", "te", "upgrade"}
+_RELAY_CHUNK = 64 * 1024
+
+
+class GatewayError(Exception):
+    """The upstream failed before anything was sent to the client (retryable)."""
+
+
+class _BodyTooLarge(Exception):
+    """A plain HTTP request body exceeds GATEWAY_MAX_BODY."""
+
+
+@dataclass
+class UpstreamStats:
+    address: str
+    requests: int = 0
+    failures: int = 0
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    consecutive_failures: int = 0
+    open_until: float = 0.0   # monotonic; skipped by selection until then
+    first_used: float = 0.0
+    last_used: float = 0.0
+    last_error: Optional[str] = None
+
+    def as_dict(self) -> dict:
+        active = max(self.last_used - self.first_used, 1.0)
+        return {
+            "address": self.address,
+            "requests": self.requests,
+            "failures": self.failures,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "throughput_bps": round((self.bytes_sent + self.bytes_received) / active, 1),
+            "circuit_open": self.open_until > time.monotonic(),
+            "last_error": self.last_error,
+        }
+
+
+async def pool_selector(exclude: set) -> Optional[PoolEntry]:
+    return await rotation_service.next(
+        settings.GATEWAY_POOL_OWNER or ALL_OWNERS,
+        RotationMode(settings.GATEWAY_ROTATION_MODE),
+        exclude=exclude | lease_manager.leased_ids(),  # leased proxies are pinned to their holder
+    )
+
+
+# ── HTTP/1.1 framing helpers ─────────────────────────────────────────────────
+
+async def _read_head(reader: asyncio.StreamReader) -> Optional[tuple[str, list[tuple[str, str]]]]:
+    """Read a request/status line plus headers; None when the peer closed cleanly."""
+    try:
+        raw = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError as exc:
+        if not exc.partial:
+            return None
+        raise
+    first, *lines = raw.decode("latin-1").split("\r\n")
+    headers = []
+    for line in lines:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers.append((name.strip(), value.strip()))
+    return first, headers
+
+
+def _header(headers: list[tuple[str, str]], name: str) -> Optional[str]:
+    name = name.lower()
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _wants_close(version: str, headers: list[tuple[str, str]]) -> bool:
+    connection = (_header(headers, "connection") or _header(headers, "proxy-connection") or "").lower()
+    if version == "HTTP/1.0":
+        return connection != "keep-alive"
+    return connection == "close"
+
+
+def _build_head(first: str, headers: list[tuple[str, str]], extra: list[tuple[str, str]]) -> bytes:
+    lines = [first]
+    lines += [f"{k}: {v}" for k, v in headers if k.lower() not in _HOP_BY_HOP]
+    lines += [f"{k}: {v}" for k, v in extra]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def _copy_body(
+    reader: asyncio.StreamReader,
+    headers: list[tuple[str, str]],
+    write: Callable[[bytes], Awaitable[None]],
+    until_eof: bool = False,
+) -> tuple[int, bool]:
+    """
+    Copy one message body in its original framing. Returns the byte count and
+    whether the connection can carry another message afterwards.
+    """
+    total = 0
+    if "chunked" in (_header(headers, "transfer-encoding") or "").lower():
+        while True:
+            line = await reader.readuntil(b"\r\n")
+            size = int(line.split(b";", 1)[0].strip(), 16)
+            await write(line)
+            total += len(line)
+            if size == 0:
+                while True:  # trailers, then the blank line
+                    line = await reader.readuntil(b"\r\n")
+                    await write(line)
+                    total += len(line)
+                    if line == b"\r\n":
+                        return total, True
+            remaining = size + 2
+            while remaining:
+                chunk = await reader.readexactly(min(remaining, _RELAY_CHUNK))
+                await write(chunk)
+                total += len(chunk)
+                remaining -= len(chunk)
+    length = _header(headers, "content-length")
+    if length is not None:
+        remaining = int(length)
+        while remaining:
+            chunk = await reader.readexactly(min(remaining, _RELAY_CHUNK))
+            await write(chunk)
+            total += len(chunk)
+            remaining -= len(chunk)
+        return total, True
+    if not until_eof:
+        return 0, True
+    while chunk := await reader.read(_RELAY_CHUNK):
+        await write(chunk)
+        total += len(chunk)
+    return total, False
+
+
+def _split_host_port(value: str, default_port: int) -> tuple[str, int]:
+    if value.startswith("["):  # [IPv6]:port
+        host, _, rest = value[1:].partition("]")
+        return host, int(rest[1:]) if rest.startswith(":") else default_port
+    host, sep, port = value.rpartition(":")
+    if not sep or not port.isdigit():
+        return value, default_port
+    return host, int(port)
+
+
+def _error_response(status: int, reason: str) -> bytes:
+    body = f"{status} {reason}\n".encode()
+    return (
+        f"HTTP/1.1 {status} {reason}\r\nContent-Type: text/plain\r\n"
+        f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n"
+    ).encode() + body
+
+
+def _error_kind(exc: BaseException) -> str:
+    if isinstance(exc, asyncio.TimeoutError):
+        return "timeout"
+    if isinstance(exc, (GatewayError, asyncio.IncompleteReadError)):
+        return "handshake_failed"
+    return "connect_failed"
+
+
+def _proxy_auth(upstream: PoolEntry) -> list[tuple[str, str]]:
+    if not (upstream.username and upstream.password):
+        return []
+    token = base64.b64encode(f"{upstream.username}:{upstream.password}".encode()).decode()
+    return [("Proxy-Authorization", f"Basic {token}")]
+
+
+# ── Upstream handshakes ──────────────────────────────────────────────────────
+
+async def _socks5_connect(reader, writer, upstream: PoolEntry, host: str, port: int) -> None:
+    methods = b"\x00\x02" if upstream.username and upstream.password else b"\x00"
+    writer.write(b"\x05" + bytes([len(methods)]) + methods)
+    await writer.drain()
+    _, method = await reader.readexactly(2)
+    if method == 0x02:
+        user, password = upstream.username.encode(), upstream.password.encode()
+        writer.write(b"\x01" + bytes([len(user)]) + user + bytes([len(password)]) + password)
+        await writer.drain()
+        if (await reader.readexactly(2))[1] != 0:
+            raise GatewayError("SOCKS5 authentication rejected")
+    elif method != 0x00:
+        raise GatewayError("SOCKS5 proxy offered no usable auth method")
+
+    try:
+        ip = ipaddress.ip_address(host)
+        address = (b"\x01" if ip.version == 4 else b"\x04") + ip.packed
+    except ValueError:
+        address = b"\x03" + bytes([len(host)]) + host.encode("idna")  # resolved by the proxy
+    writer.write(b"\x05\x01\x00" + address + struct.pack(">H", port))
+    await writer.drain()
+    _, reply, _, atyp = await reader.readexactly(4)
+    if reply != 0:
+        raise GatewayError(f"SOCKS5 connect failed (reply {reply})")
+    if atyp == 0x01:
+        await reader.readexactly(4 + 2)
+    elif atyp == 0x04:
+        await reader.readexactly(16 + 2)
+    else:
+        await reader.readexactly((await reader.readexactly(1))[0] + 2)
+
+
+async def _socks4_connect(reader, writer, upstream: PoolEntry, host: str, port: int) -> None:
+    try:
+        address, hostname = ipaddress.IPv4Address(host).packed, b""
+    except ValueError:
+        address, hostname = b"\x00\x00\x00\x01", host.encode("idna") + b"\x00"  # SOCKS4a
+    user = (upstream.username or "").encode()
+    writer.write(b"\x04\x01" + struct.pack(">H", port) + address + user + b"\x00" + hostname)
+    await writer.drain()
+    reply = await reader.readexactly(8)
+    if reply[1] != 0x5A:
+        raise GatewayError(f"SOCKS4 connect rejected (reply {reply[1]:#x})")
+
+
+async def _http_connect(reader, writer, upstream: PoolEntry, host: str, port: int) -> None:
+    target = f"[{host}]:{port}" if ":" in host else f"{host}:{port}"
+    writer.write(_build_head(f"CONNECT {target} HTTP/1.1", [("Host", target)], _proxy_auth(upstream)))
+    await writer.drain()
+    head = await _read_head(reader)
+    if head is None:
+        raise GatewayError("Upstream closed during CONNECT")
+    status = head[0].split(" ", 2)
+    if len(status) < 2 or status[1] != "200":
+        raise GatewayError(f"Upstream refused CONNECT: {head[0]}")
+    await _copy_body(reader, head[1], _discard)
+
+
+async def _discard(_: bytes) -> None:
+    pass
+
+
+class ProxyGateway:
+    """
+    Local forward proxy (HTTP CONNECT and plain HTTP) that sends each request
+    through a LIVE proxy of the managed pool.
+
+    Upstreams that fail GATEWAY_FAILURE_THRESHOLD times in a row are skipped
+    for GATEWAY_FAILURE_COOLDOWN seconds. A request is retried on another
+    upstream while nothing has been sent to the client yet. Plain HTTP
+    upstream connections are kept alive and reused per (upstream, origin).
+    """
+
+    def __init__(
+        self,
+        host: str | None = None,
+        port: int | None = None,
+        selector: UpstreamSelector | None = None,
+    ):
+        self.host = host or settings.GATEWAY_HOST
+        self.port = port if port is not None else settings.GATEWAY_PORT
+        self.selector = selector or pool_selector
+        self._stats: dict = {}
+        self._idle: dict[tuple, list[tuple[asyncio.StreamReader, asyncio.StreamWriter, float]]] = {}
+        self._server: asyncio.AbstractServer | None = None
+
+    # ── Lifecycle ────────────────────────────────────────────────────────────
+
+    async def start(self) -> None:
+        if self._server is None:
+            self._server = await asyncio.start_server(self._handle_client, self.host, self.port)
+            self.port = self._server.sockets[0].getsockname()[1]
+            logger.info("Proxy gateway listening on %s:%d", self.host, self.port)
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for connections in self._idle.values():
+            for _, writer, _ in connections:
+                writer.close()
+        self._idle.clear()
+
+    def stats(self) -> dict:
+        return {str(upstream_id): s.as_dict() for upstream_id, s in self._stats.items()}
+
+    # ── Upstream selection and health ────────────────────────────────────────
+
+    def _stats_for(self, upstream: PoolEntry) -> UpstreamStats:
+        stats = self._stats.get(upstream.id)
+        if stats is None:
+            stats = self._stats[upstream.id] = UpstreamStats(f"{upstream.ip}:{upstream.port}")
+        return stats
+
+    async def _select(self, tried: set) -> Optional[PoolEntry]:
+        now = time.monotonic()
+        tripped = {upstream_id for upstream_id, s in self._stats.items() if s.open_until > now}
+        return await self.selector(tried | tripped)
+
+    def _record_success(self, upstream: PoolEntry, sent: int, received: int, latency: float) -> None:
+        health_recorder.record(upstream.id, True, latency)
+        stats = self._stats_for(upstream)
+        now = time.monotonic()
+        stats.first_used = stats.first_used or now
+        stats.last_used = now
+        stats.requests += 1
+        stats.bytes_sent += sent
+        stats.bytes_received += received
+        stats.consecutive_failures = 0
+
+    def _record_failure(self, upstream: PoolEntry, exc: BaseException) -> None:
+        health_recorder.record(upstream.id, False, error=_error_kind(exc))
+        stats = self._stats_for(upstream)
+        stats.failures += 1
+        stats.consecutive_failures += 1
+        stats.last_error = f"{type(exc).__name__}: {exc}"
+        if stats.consecutive_failures >= settings.GATEWAY_FAILURE_THRESHOLD:
+            stats.open_until = time.monotonic() + settings.GATEWAY_FAILURE_COOLDOWN
+
+    async def _open(self, upstream: PoolEntry, host: str, port: int, tunnel: bool):
+        if upstream.protocol not in ("http", "https", "socks4", "socks5"):
+            raise GatewayError(f"Unsupported upstream protocol {upstream.protocol}")
+        reader, writer = await asyncio.open_connection(upstream.ip, upstream.port)
+        try:
+            if upstream.protocol == "socks5":
+                await _socks5_connect(reader, writer, upstream, host, port)
+            elif upstream.protocol == "socks4":
+                await _socks4_connect(reader, writer, upstream, host, port)
+            elif tunnel:
+                await _http_connect(reader, writer, upstream, host, port)
+        except BaseException:
+            writer.close()
+            raise
+        return reader, writer
+
+    # ── Idle upstream connections (plain HTTP keep-alive) ────────────────────
+
+    def _checkout(self, key: tuple):
+        connections = self._idle.get(key)
+        while connections:
+            reader, writer, since = connections.pop()
+            if time.monotonic() - since < settings.GATEWAY_IDLE_TIMEOUT and not writer.is_closing() and not reader.at_eof():
+                return reader, writer
+            writer.close()
+        return None
+
+    def _checkin(self, key: tuple, reader, writer) -> None:
+        connections = self._idle.setdefault(key, [])
+        if len(connections) < settings.GATEWAY_MAX_IDLE_PER_UPSTREAM:
+            connections.append((reader, writer, time.monotonic()))
+        else:
+            writer.close()
+
+    # ── Client handling ──────────────────────────────────────────────────────
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                head = await asyncio.wait_for(_read_head(reader), settings.GATEWAY_IDLE_TIMEOUT)
+                if head is None:
+                    break
+                first, headers = head
+                method, target, version = first.split(" ", 2)
+                if method.upper() == "CONNECT":
+                    await self._tunnel(target, reader, writer)
+                    break
+                if not await self._forward(method, target, version, headers, reader, writer):
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                ConnectionError, ValueError):
+            pass
+        except Exception:
+            logger.exception("Gateway connection failed")
+        finally:
+            writer.close()
+
+    async def _tunnel(self, target: str, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        host, port = _split_host_port(target, 443)
+        tried: set = set()
+        for _ in range(settings.GATEWAY_RETRIES + 1):
+            upstream = await self._select(tried)
+            if upstream is None:
+                break
+            tried.add(upstream.id)
+            started = time.monotonic()
+            try:
+                up_reader, up_writer = await asyncio.wait_for(
+                    self._open(upstream, host, port, tunnel=True), settings.GATEWAY_CONNECT_TIMEOUT
+                )
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, GatewayError) as exc:
+                self._record_failure(upstream, exc)
+                continue
+            latency = (time.monotonic() - started) * 1000
+            writer.write(b"HTTP/1.1 200 Connection Established\r\n\r\n")
+            await writer.drain()
+            sent, received = await asyncio.gather(
+                _pipe(reader, up_writer), _pipe(up_reader, writer)
+            )
+            self._record_success(upstream, sent, received, latency)
+            return
+        writer.write(_error_response(502, "Bad Gateway"))
+        await writer.drain()
+
+    async def _forward(
+        self,
+        method: str,
+        target: str,
+        version: str,
+        headers: list[tuple[str, str]],
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> bool:
+        """Relay one plain HTTP request; returns whether the client connection stays open."""
+        url = urlsplit(target)
+        if url.scheme != "http" or not url.hostname:
+            writer.write(_error_response(400, "Bad Request"))
+            await writer.drain()
+            return False
+        host, port = url.hostname, url.port or 80
+        # Buffered so a failed upstream can be retried, hence capped
+        body_parts: list[bytes] = []
+        size = 0
+
+        async def collect(chunk: bytes) -> None:
+            nonlocal size
+            size += len(chunk)
+            if size > settings.GATEWAY_MAX_BODY:
+                raise _BodyTooLarge
+            body_parts.append(chunk)
+
+        try:
+            length = _header(headers, "content-length")
+            if length is not None and int(length) > settings.GATEWAY_MAX_BODY:
+                raise _BodyTooLarge
+            await _copy_body(reader, headers, collect)
+        except _BodyTooLarge:
+            writer.write(_error_response(413, "Payload Too Large"))
+            await writer.drain()
+            return False
+        body = b"".join(body_parts)
+        client_keep_alive = not _wants_close(version, headers)
+
+        tried: set = set()
+        for _ in range(settings.GATEWAY_RETRIES + 1):
+            upstream = await self._select(tried)
+            if upstream is None:
+                break
+            tried.add(upstream.id)
+            if upstream.protocol in ("socks4", "socks5"):
+                request_target, extra = url.path or "/", []
+                if url.query:
+                    request_target += "?" + url.query
+            else:
+                request_target, extra = target, _proxy_auth(upstream)
+            request = _build_head(
+                f"{method} {request_target} HTTP/1.1", headers, extra + [("Connection", "keep-alive")]
+            ) + body
+            key = (upstream.id, host, port)
+            started = time.monotonic()
+            try:
+                up_reader, up_writer, response = await self._exchange(upstream, key, host, port, request)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, GatewayError) as exc:
+                self._record_failure(upstream, exc)
+                continue
+            latency = (time.monotonic() - started) * 1000
+
+            first, response_headers = response
+            status = first.split(" ", 2)
+            no_body = (method.upper() == "HEAD" or len(status) < 2
+                       or status[1] in ("204", "304") or status[1].startswith("1"))
+            length_known = (
+                _header(response_headers, "content-length") is not None
+                or "chunked" in (_header(response_headers, "transfer-encoding") or "").lower()
+            )
+            keep_alive = client_keep_alive and (no_body or length_known)
+            response_head = _build_head(
+                first, response_headers, [("Connection", "keep-alive" if keep_alive else "close")]
+            )
+            writer.write(response_head)
+
+            async def relay(chunk: bytes) -> None:
+                writer.write(chunk)
+                await writer.drain()
+
+            try:
+                if no_body:
+                    received, reusable = 0, True
+                else:
+                    received, reusable = await _copy_body(up_reader, response_headers, relay, until_eof=True)
+                await writer.drain()
+            except Exception:
+                up_writer.close()
+                raise
+            self._record_success(upstream, len(request), len(response_head) + received, latency)
+            if reusable and not _wants_close("HTTP/1.1", response_headers):
+                self._checkin(key, up_reader, up_writer)
+            else:
+                up_writer.close()
+            return keep_alive
+
+        writer.write(_error_response(502, "Bad Gateway"))
+        await writer.drain()
+        return False
+
+    async def _exchange(self, upstream: PoolEntry, key: tuple, host: str, port: int, request: bytes):
+        """Send a request and read the response head, reusing an idle connection if any."""
+        idle = self._checkout(key)
+        if idle is not None:
+            up_reader, up_writer = idle
+            response = None
+            try:
+                up_writer.write(request)
+                await up_writer.drain()
+                response = await asyncio.wait_for(_read_head(up_reader), settings.GATEWAY_CONNECT_TIMEOUT)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+                pass  # went stale while idle; not the upstream's fault
+            finally:
+                if response is None:
+                    up_writer.close()
+            if response is not None:
+                return up_reader, up_writer, response
+
+        up_reader, up_writer = await asyncio.wait_for(
+            self._open(upstream, host, port, tunnel=False), settings.GATEWAY_CONNECT_TIMEOUT
+        )
+        try:
+            up_writer.write(request)
+            await up_writer.drain()
+            response = await asyncio.wait_for(_read_head(up_reader), settings.GATEWAY_CONNECT_TIMEOUT)
+            if response is None:
+                raise GatewayError("Upstream closed without a response")
+        except BaseException:
+            up_writer.close()
+            raise
+        return up_reader, up_writer, response
+
+
+async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> int:
+    total = 0
+    try:
+        while chunk := await reader.read(_RELAY_CHUNK):
+            writer.write(chunk)
+            await writer.drain()
+            total += len(chunk)
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+    return total
+
+
+gateway = ProxyGateway()
@@ -0,0 +1,144 @@
+import bisect
+import ipaddress
+import logging
+import mmap
+import struct
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Optional
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# File layout (all integers big-endian):
+#   header    MAGIC, u32 range count, u32 location count
+#   ranges    per range: 16-byte start, 16-byte end (IPv6; IPv4 as ::ffff:a.b.c.d), u32 location
+#   offsets   u32 per location + 1, into the text blob
+#   text      UTF-8 "country_code\tcountry\tregion\tcity" per location
+# Ranges are sorted by start and do not overlap, so a lookup is one binary search.
+MAGIC = b"PMGEOIP1"
+_HEADER = struct.Struct(">8sII")
+_RANGE = struct.Struct(">16s16sI")
+_OFFSET = struct.Struct(">I")
+
+
+def ip_key(ip: str) -> bytes:
+    """16-byte big-endian key: byte order equals numeric order."""
+    address = ipaddress.ip_address(ip)
+    if address.version == 4:
+        return b"\x00" * 10 + b"\xff\xff" + address.packed
+    return address.packed
+
+
+class _Starts:
+    """Sequence view of range start keys, so `bisect` searches the mmap in place."""
+
+    def __init__(self, buf: mmap.mmap, offset: int, count: int):
+        self._buf = buf
+        self._offset = offset
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, i: int) -> bytes:
+        start = self._offset + i * _RANGE.size
+        return self._buf[start:start + 16]
+
+
+class GeoIPDatabase:
+    """Read-only, memory-mapped IP range -> location table (build with app.build_geoip)."""
+
+    def __init__(self, path: str | Path, cache_size: int | None = None):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.range_count, self.location_count = _HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a geo-IP database")
+        self._ranges_at = _HEADER.size
+        self._offsets_at = self._ranges_at + self.range_count * _RANGE.size
+        self._text_at = self._offsets_at + (self.location_count + 1) * _OFFSET.size
+        self._starts = _Starts(self._buf, self._ranges_at, self.range_count)
+        # Exit IPs repeat across checks; cache per IP on top of the search
+        self.lookup = lru_cache(maxsize=cache_size or settings.GEOIP_CACHE_SIZE)(self._lookup)
+
+    def _location(self, index: int) -> dict:
+        start, end = struct.unpack_from(">II", self._buf, self._offsets_at + index * _OFFSET.size)
+        text = self._buf[self._text_at + start:self._text_at + end].decode("utf-8")
+        country_code, country, region, city = text.split("\t")
+        return {
+            "country_code": country_code or None,
+            "country": country or None,
+            "region": region or None,
+            "city": city or None,
+        }
+
+    def _lookup(self, ip: str) -> Optional[dict]:
+        try:
+            key = ip_key(ip)
+        except ValueError:
+            return None
+        i = bisect.bisect_right(self._starts, key) - 1
+        if i < 0:
+            return None
+        _, end, location = _RANGE.unpack_from(self._buf, self._ranges_at + i * _RANGE.size)
+        if key > end:
+            return None
+        return self._location(location)
+
+    def close(self) -> None:
+        self.lookup.cache_clear()
+        self._buf.close()
+
+
+def write_database(rows: Iterable[tuple[str, str, str, str, str, str]], path: str | Path) -> int:
+    """
+    Write a database from (start_ip, end_ip, country_code, country, region, city)
+    rows. Returns the number of ranges written.
+    """
+    locations: dict[tuple, int] = {}
+    ranges = []
+    for start_ip, end_ip, *location in rows:
+        start, end = ip_key(start_ip.strip()), ip_key(end_ip.strip())
+        if end < start:
+            raise ValueError(f"Range {start_ip} - {end_ip} ends before it starts")
+        location = tuple(value.strip().replace("\t", " ") for value in location)
+        ranges.append((start, end, locations.setdefault(location, len(locations))))
+    ranges.sort()
+    for (_, prev_end, _), (start, _, _) in zip(ranges, ranges[1:]):
+        if start <= prev_end:
+            raise ValueError("Ranges overlap")
+
+    texts = ["\t".join(location).encode("utf-8") for location in locations]
+    offsets = [0]
+    for text in texts:
+        offsets.append(offsets[-1] + len(text))
+
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, len(ranges), len(texts)))
+        for start, end, location in ranges:
+            f.write(_RANGE.pack(start, end, location))
+        for offset in offsets:
+            f.write(_OFFSET.pack(offset))
+        for text in texts:
+            f.write(text)
+    return len(ranges)
+
+
+_database: GeoIPDatabase | None = None
+_loaded = False
+
+
+def get_geoip() -> GeoIPDatabase | None:
+    """The database at GEOIP_DB_PATH, opened on first use; None when not configured."""
+    global _database, _loaded
+    if not _loaded:
+        _loaded = True
+        if settings.GEOIP_DB_PATH:
+            try:
+                _database = GeoIPDatabase(settings.GEOIP_DB_PATH)
+                logger.info("Loaded geo-IP database %s (%d ranges)", settings.GEOIP_DB_PATH, _database.range_count)
+            except (OSError, ValueError):
+                logger.exception("Could not load geo-IP database %s", settings.GEOIP_DB_PATH)
+    return _database
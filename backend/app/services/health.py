@@ -0,0 +1,244 @@
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from beanie import PydanticObjectId
+from bson.errors import InvalidId
+from pymongo import UpdateOne
+from app.config import settings
+from app.models.proxy import Proxy, ProxyHealth, ProxyQuality, ProxyStatus
+from app.services.result_writer import notify_result_listeners
+
+logger = logging.getLogger(__name__)
+
+LATENCY_GOOD_THRESHOLD = 2000    # ms — below = good
+LATENCY_BAD_THRESHOLD = 5000     # ms — above = bad
+MAX_ERROR_KINDS = 8              # error mix keeps the most frequent kinds only
+FLUSH_ATTEMPTS = 3               # re-reads when a check result races a health write
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def record_outcome(
+    health: Optional[ProxyHealth],
+    ok: bool,
+    latency: Optional[float] = None,
+    error: Optional[str] = None,
+    at: Optional[datetime] = None,
+) -> ProxyHealth:
+    """Fold one outcome (a check or a real request) into a new health value."""
+    at = at or datetime.now(timezone.utc)
+    health = health.model_copy(deep=True) if health else ProxyHealth()
+    alpha = settings.HEALTH_EWMA_ALPHA
+
+    if health.success_ratio is None:
+        health.success_ratio = float(ok)
+    else:
+        health.success_ratio = round((1 - alpha) * health.success_ratio + alpha * ok, 4)
+
+    if ok and latency is not None:
+        health.latency = latency if health.latency is None else round(
+            (1 - alpha) * health.latency + alpha * latency, 1
+        )
+
+    errors = {kind: share * (1 - alpha) for kind, share in health.errors.items()}
+    if not ok:
+        kind = error or "unknown"
+        errors[kind] = errors.get(kind, 0.0) + alpha
+    kept = sorted(errors.items(), key=lambda item: item[1], reverse=True)[:MAX_ERROR_KINDS]
+    health.errors = {kind: round(share, 4) for kind, share in kept if share >= 0.01}
+
+    health.samples += 1
+    if ok:
+        health.last_success_at = at
+    health.updated_at = at
+    return health
+
+
+def derive_quality(status: ProxyStatus, latency: float | None, health: Optional[ProxyHealth] = None) -> ProxyQuality:
+    """
+    Rate quality from the latest check, and once there is enough history from
+    the rolling health: a proxy that keeps failing real traffic is BAD even if
+    its last check was fast.
+    """
+    if status != ProxyStatus.LIVE:
+        return ProxyQuality.BAD
+
+    if health is not None and health.samples >= settings.HEALTH_MIN_SAMPLES:
+        if health.success_ratio < settings.HEALTH_BAD_RATIO:
+            return ProxyQuality.BAD
+        latency = health.latency if health.latency is not None else latency
+        if latency is not None and latency >= LATENCY_BAD_THRESHOLD:
+            return ProxyQuality.BAD
+        if latency is not None and latency > LATENCY_GOOD_THRESHOLD:
+            # Slow but usable: only GOOD while nearly everything succeeds
+            return ProxyQuality.GOOD if health.success_ratio >= settings.HEALTH_GOOD_RATIO else ProxyQuality.BAD
+        return ProxyQuality.GOOD if latency is not None else ProxyQuality.UNKNOWN
+
+    if latency is None:
+        return ProxyQuality.UNKNOWN
+
+    if latency <= LATENCY_GOOD_THRESHOLD:
+        return ProxyQuality.GOOD
+    elif latency >= LATENCY_BAD_THRESHOLD:
+        return ProxyQuality.BAD
+    else:
+        # Between 2000-5000ms with no history to go on — acceptable
+        return ProxyQuality.GOOD
+
+
+def proven_healthy(health: Optional[ProxyHealth], now: datetime) -> bool:
+    """Recent real traffic succeeded reliably, so an active re-check can wait."""
+    if health is None or health.samples < settings.HEALTH_MIN_SAMPLES or health.last_success_at is None:
+        return False
+    last_success = health.last_success_at.replace(tzinfo=timezone.utc)
+    return (
+        health.success_ratio >= settings.HEALTH_GOOD_RATIO
+        and (now - last_success).total_seconds() <= settings.HEALTH_FRESHNESS
+    )
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    return value.replace(tzinfo=timezone.utc) if value else None
+
+
+def health_fence(health: Optional[ProxyHealth]) -> dict:
+    """
+    Filter matching a proxy only while its stored health is still `health`.
+    Health is folded client-side, so every writer of it (checks, reported
+    outcomes) makes the write conditional on the value it folded into.
+    """
+    if health is None:
+        return {"health": None}
+    return {"health.samples": health.samples, "health.updated_at": health.updated_at}
+
+
+class HealthRecorder:
+    """
+    Buffers passive outcomes (client reports, gateway traffic) and folds them
+    into each proxy's health every HEALTH_FLUSH_INTERVAL: one read and one
+    bulk write per flush, however many outcomes arrived.
+
+    A proxy proven healthy by traffic has its next scheduled check pushed out;
+    one that keeps failing is re-checked right away, unless a check already
+    looked at it since the failures started.
+
+    Writes are conditional on the health, status and last check they were
+    computed from; proxies a check result updated in between are re-read and
+    folded again (up to FLUSH_ATTEMPTS times).
+    """
+
+    def __init__(self, interval: float | None = None):
+        self.interval = interval or settings.HEALTH_FLUSH_INTERVAL
+        self._pending: dict[PydanticObjectId, list[tuple]] = defaultdict(list)
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    def record(
+        self,
+        proxy_id,
+        ok: bool,
+        latency: float | None = None,
+        error: str | None = None,
+        at: datetime | None = None,
+    ) -> None:
+        try:
+            proxy_id = PydanticObjectId(proxy_id)
+        except (InvalidId, TypeError):
+            return  # not a stored proxy (e.g. a stand-in upstream)
+        self._pending[proxy_id].append((ok, latency, error, at or datetime.now(timezone.utc)))
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await asyncio.shield(self.flush())
+
+    async def flush(self) -> None:
+        async with self._lock:
+            pending, self._pending = self._pending, defaultdict(list)
+            saved: list[Proxy] = []
+            try:
+                for _ in range(FLUSH_ATTEMPTS):
+                    if not pending:
+                        break
+                    lost = await self._write(pending, saved)
+                    pending = {proxy_id: pending[proxy_id] for proxy_id in lost}
+                if pending:
+                    logger.warning("Dropped health outcomes of %d proxies updated concurrently", len(pending))
+            except Exception:
+                logger.exception("Failed to record health for %d proxies", len(pending))
+        if saved:
+            await notify_result_listeners(saved)
+
+    async def _write(self, pending: dict, saved: list[Proxy]) -> list:
+        """One read and one bulk write; returns the ids whose write lost a race."""
+        proxies = await Proxy.find({"_id": {"$in": list(pending)}}).to_list()
+        now = datetime.now(timezone.utc)
+        ops = [self._apply(proxy, pending[proxy.id], now) for proxy in proxies]
+        if not ops:
+            return []
+        result = await Proxy.get_motor_collection().bulk_write(ops, ordered=False)
+        if result.matched_count == len(ops):
+            saved.extend(proxies)
+            return []
+        # Find the ones that did not land: their stored health is not what we wrote
+        written = {proxy.id: _stamp(proxy.health) for proxy in proxies}
+        cursor = Proxy.get_motor_collection().find({"_id": {"$in": list(written)}}, {"health": 1})
+        landed = {
+            doc["_id"] async for doc in cursor
+            if doc.get("health") and _stamp(ProxyHealth(**doc["health"])) == written[doc["_id"]]
+        }
+        saved.extend(proxy for proxy in proxies if proxy.id in landed)
+        return [proxy_id for proxy_id in written if proxy_id not in landed]
+
+    def _apply(self, proxy: Proxy, outcomes: list[tuple], now: datetime) -> UpdateOne:
+        fence = {
+            "_id": proxy.id,
+            "status": proxy.status,
+            "last_check": proxy.last_check,
+            **health_fence(proxy.health),
+        }
+        health = proxy.health
+        for ok, latency, error, at in outcomes:
+            health = record_outcome(health, ok, latency, error, at)
+        proxy.health = health
+        proxy.quality = derive_quality(proxy.status, proxy.latency, health)
+
+        next_check = _as_utc(proxy.next_check_at)
+        last_check = _as_utc(proxy.last_check)
+        first = min(at for *_, at in outcomes)
+        first -= timedelta(microseconds=first.microsecond % 1000)  # stored datetimes are ms precise
+        if proxy.status == ProxyStatus.LIVE and proven_healthy(health, now):
+            skip_until = now + timedelta(seconds=settings.SCHEDULER_LIVE_INTERVAL)
+            if next_check is None or next_check < skip_until:
+                proxy.next_check_at = skip_until
+        elif health.success_ratio < settings.HEALTH_BAD_RATIO and (last_check is None or last_check < first):
+            proxy.next_check_at = now  # traffic says it broke; confirm with a check
+
+        return UpdateOne(fence, {"$set": {
+            "health": health.model_dump(),
+            "quality": proxy.quality,
+            "next_check_at": proxy.next_check_at,
+        }})
+
+
+def _stamp(health: Optional[ProxyHealth]) -> Optional[tuple]:
+    """Identifies a stored health value; Mongo keeps datetimes to the millisecond."""
+    if health is None:
+        return None
+    return health.samples, (_as_utc(health.updated_at) - _EPOCH) // timedelta(milliseconds=1)
+
+
+health_recorder = HealthRecorder()
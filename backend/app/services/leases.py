@@ -0,0 +1,267 @@
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Collection, Optional
+from pymongo import DeleteOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from app.config import settings
+from app.models.lease import ProxyLease
+from app.services.rotation import PoolEntry, RotationMode, load_entries, rotation_service
+
+logger = logging.getLogger(__name__)
+
+
+def _to_datetime(ts: float) -> datetime:
+    return datetime.fromtimestamp(ts, timezone.utc)
+
+
+def _to_timestamp(dt: datetime) -> float:
+    if dt.tzinfo is None:  # Mongo hands back naive UTC datetimes
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+class Lease:
+    __slots__ = ("id", "entry", "owner", "holder", "expires_at", "created_at")
+
+    def __init__(self, lease_id: str, entry: PoolEntry, owner: str, holder: str,
+                 expires_at: float, created_at: float):
+        self.id = lease_id
+        self.entry = entry
+        self.owner = owner
+        self.holder = holder
+        self.expires_at = expires_at
+        self.created_at = created_at
+
+    def as_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "holder": self.holder,
+            "owner": self.owner,
+            "expires_at": _to_datetime(self.expires_at),
+            "created_at": _to_datetime(self.created_at),
+            "proxy": self.entry.as_dict(),
+        }
+
+
+class TimingWheel:
+    """
+    Hashed timing wheel with one-second slots. A key scheduled further out
+    than one revolution comes back early from `advance`; the caller checks the
+    real deadline and schedules it again.
+    """
+
+    def __init__(self, slots: int):
+        self._slots: list[set] = [set() for _ in range(slots)]
+        self._tick = int(time.time())
+
+    def schedule(self, key, deadline: float) -> None:
+        tick = max(int(deadline), self._tick + 1)
+        self._slots[tick % len(self._slots)].add(key)
+
+    def advance(self, now: float) -> list:
+        """Return the keys in every slot passed since the last call."""
+        target = int(now)
+        due = []
+        # After a stall longer than one revolution, each slot is visited once
+        for tick in range(max(self._tick + 1, target - len(self._slots) + 1), target + 1):
+            slot = self._slots[tick % len(self._slots)]
+            if slot:
+                due.extend(slot)
+                slot.clear()
+        self._tick = max(self._tick, target)
+        return due
+
+
+class LeaseManager:
+    """
+    Exclusive, expiring proxy leases held in memory. Allocation runs under one
+    lock and skips every leased proxy, so concurrent requests never get the
+    same proxy; a holder asking again gets its current lease back (sticky).
+    Leases are synced to Mongo every LEASE_PERSIST_INTERVAL and reloaded on
+    startup. The guarantee holds within one API process.
+    """
+
+    def __init__(self):
+        self._leases: dict[str, Lease] = {}
+        self._by_proxy: dict = {}
+        self._by_holder: dict[tuple[str, str], Lease] = {}
+        self._wheel = TimingWheel(settings.LEASE_WHEEL_SLOTS)
+        self._lock = asyncio.Lock()
+        self._dirty: set[str] = set()  # lease ids to upsert (still held) or delete
+        self._task: asyncio.Task | None = None
+
+    # ── Lease operations ─────────────────────────────────────────────────────
+
+    def get(self, lease_id: str) -> Optional[Lease]:
+        lease = self._leases.get(lease_id)
+        if lease is None or lease.expires_at <= time.time():
+            return None
+        return lease
+
+    def leased_ids(self) -> Collection:
+        """Ids of proxies under a lease; every allocation path must skip them."""
+        return self._by_proxy.keys()
+
+    def active(self, owner: Optional[str] = None) -> list[Lease]:
+        now = time.time()
+        return [
+            lease for lease in self._leases.values()
+            if lease.expires_at > now and (owner is None or lease.owner == owner)
+        ]
+
+    async def acquire(
+        self,
+        owner: str,
+        pool_key: str,
+        holder: str,
+        minutes: int,
+        mode: RotationMode = RotationMode.ROUND_ROBIN,
+        country: Optional[str] = None,
+        protocol: Optional[str] = None,
+        anonymity: Optional[str] = None,
+    ) -> Optional[Lease]:
+        async with self._lock:
+            now = time.time()
+            lease = self._by_holder.get((owner, holder))
+            if lease is not None and lease.expires_at > now:
+                self._extend(lease, now + minutes * 60)
+                return lease
+            entry = await rotation_service.next(
+                pool_key, mode, country, protocol, anonymity, exclude=self._by_proxy,
+            )
+            if entry is None:
+                return None
+            lease = Lease(uuid.uuid4().hex, entry, owner, holder, now + minutes * 60, now)
+            self._add(lease)
+            return lease
+
+    async def renew(self, lease: Lease, minutes: int) -> Optional[Lease]:
+        async with self._lock:
+            now = time.time()
+            if self._leases.get(lease.id) is not lease or lease.expires_at <= now:
+                return None
+            self._extend(lease, now + minutes * 60)
+            return lease
+
+    async def release(self, lease: Lease) -> None:
+        async with self._lock:
+            if self._leases.get(lease.id) is lease:
+                self._drop(lease)
+
+    def _add(self, lease: Lease) -> None:
+        self._leases[lease.id] = lease
+        self._by_proxy[lease.entry.id] = lease
+        self._by_holder[(lease.owner, lease.holder)] = lease
+        self._wheel.schedule(lease.id, lease.expires_at)
+        self._dirty.add(lease.id)
+
+    def _extend(self, lease: Lease, expires_at: float) -> None:
+        lease.expires_at = expires_at
+        self._wheel.schedule(lease.id, expires_at)
+        self._dirty.add(lease.id)
+
+    def _drop(self, lease: Lease) -> None:
+        self._leases.pop(lease.id, None)
+        self._by_proxy.pop(lease.entry.id, None)
+        if self._by_holder.get((lease.owner, lease.holder)) is lease:
+            del self._by_holder[(lease.owner, lease.holder)]
+        self._dirty.add(lease.id)
+
+    def _expire(self, now: float) -> int:
+        expired = 0
+        for lease_id in self._wheel.advance(now):
+            lease = self._leases.get(lease_id)
+            if lease is None:
+                continue  # released, or a stale slot left behind by a renewal
+            if lease.expires_at <= now:
+                self._drop(lease)
+                expired += 1
+            else:
+                self._wheel.schedule(lease_id, lease.expires_at)
+        return expired
+
+    # ── Persistence ──────────────────────────────────────────────────────────
+
+    async def load(self) -> None:
+        now = time.time()
+        docs = await ProxyLease.get_motor_collection().find(
+            {"expires_at": {"$gt": _to_datetime(now)}}
+        ).to_list(None)
+        if not docs:
+            return
+        entries = {e.id: e for e in await load_entries({"_id": {"$in": [d["proxy_id"] for d in docs]}})}
+        async with self._lock:
+            for doc in docs:
+                entry = entries.get(doc["proxy_id"])
+                if entry is None:
+                    continue  # proxy deleted while the app was down
+                self._add(Lease(
+                    doc["lease_id"], entry, doc["owner"], doc["holder"],
+                    _to_timestamp(doc["expires_at"]), _to_timestamp(doc["created_at"]),
+                ))
+            self._dirty.clear()
+        logger.info("Restored %d proxy leases", len(self._leases))
+
+    async def persist(self) -> None:
+        dirty, self._dirty = self._dirty, set()
+        if not dirty:
+            return
+        ops, op_leases = [], []
+        for lease_id in dirty:
+            lease = self._leases.get(lease_id)
+            if lease is None:
+                ops.append(DeleteOne({"lease_id": lease_id}))
+            else:
+                # Keyed by proxy: replaces any row left for the proxy by an older lease
+                # (released, or expired and not yet removed by the TTL index)
+                ops.append(UpdateOne({"proxy_id": lease.entry.id}, {"$set": {
+                    "lease_id": lease_id,
+                    "owner": lease.owner,
+                    "holder": lease.holder,
+                    "expires_at": _to_datetime(lease.expires_at),
+                    "created_at": _to_datetime(lease.created_at),
+                }}, upsert=True))
+            op_leases.append(lease_id)
+        try:
+            # Unordered: a delete by lease_id never matches a row an upsert took over
+            await ProxyLease.get_motor_collection().bulk_write(ops, ordered=False)
+        except BulkWriteError as exc:
+            failed = {op_leases[error["index"]] for error in exc.details.get("writeErrors", [])}
+            logger.error("Failed to persist %d of %d proxy leases: %s", len(failed), len(dirty),
+                         exc.details.get("writeErrors", [])[:1])
+            self._dirty |= failed
+        except Exception:
+            logger.exception("Failed to persist %d proxy leases", len(dirty))
+            self._dirty |= dirty
+
+    # ── Lifecycle ────────────────────────────────────────────────────────────
+
+    async def start(self) -> None:
+        if self._task is None:
+            await self.load()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.persist()
+
+    async def _run(self) -> None:
+        last_persist = time.monotonic()
+        while True:
+            await asyncio.sleep(1)
+            async with self._lock:
+                expired = self._expire(time.time())
+            if expired:
+                logger.debug("Expired %d proxy leases", expired)
+            if time.monotonic() - last_persist >= settings.LEASE_PERSIST_INTERVAL:
+                await self.persist()
+                last_persist = time.monotonic()
+
+
+lease_manager = LeaseManager()
@@ -0,0 +1,119 @@
+import asyncio
+import base64
+import struct
+from typing import Iterable, Optional
+from app.config import settings
+from app.models.proxy import Proxy, ProxyProtocol
+
+# One connection per candidate protocol, all opened at once. Each sniffer sends
+# the smallest request its protocol must answer and reads a few bytes back; a
+# reply is recognised by shape alone (a refusal still identifies the protocol).
+# When a proxy speaks several (mixed ports), the first in this order wins. HTTP
+# goes first: SOCKS servers drop a text CONNECT at once, while HTTP servers
+# tend to sit on a binary greeting until the timeout.
+PREFERENCE = (ProxyProtocol.HTTP, ProxyProtocol.SOCKS5, ProxyProtocol.SOCKS4)
+
+_SNIFF_HOST = "api.ipify.org"
+_SNIFF_PORT = 443
+
+
+async def _sniff_http(reader, writer, username: Optional[str], password: Optional[str]) -> bool:
+    request = f"CONNECT {_SNIFF_HOST}:{_SNIFF_PORT} HTTP/1.1\r\nHost: {_SNIFF_HOST}:{_SNIFF_PORT}\r\n"
+    if username and password:
+        token = base64.b64encode(f"{username}:{password}".encode()).decode()
+        request += f"Proxy-Authorization: Basic {token}\r\n"
+    writer.write((request + "\r\n").encode())
+    await writer.drain()
+    return (await reader.readline()).startswith(b"HTTP/")
+
+
+async def _sniff_socks5(reader, writer, username: Optional[str], password: Optional[str]) -> bool:
+    methods = b"\x00\x02" if username else b"\x00"
+    writer.write(b"\x05" + bytes([len(methods)]) + methods)
+    await writer.drain()
+    reply = await reader.readexactly(2)
+    return reply[0] == 0x05 and reply[1] in (0x00, 0x02, 0xFF)
+
+
+async def _sniff_socks4(reader, writer, username: Optional[str], password: Optional[str]) -> bool:
+    # SOCKS4a CONNECT (0.0.0.1 + hostname): plain SOCKS4 servers reject it,
+    # which still answers in the 0x00 0x5A-0x5D reply format
+    user = (username or "").encode()
+    writer.write(
+        b"\x04\x01" + struct.pack(">H", _SNIFF_PORT) + b"\x00\x00\x00\x01"
+        + user + b"\x00" + _SNIFF_HOST.encode() + b"\x00"
+    )
+    await writer.drain()
+    reply = await reader.readexactly(8)
+    return reply[0] == 0x00 and 0x5A <= reply[1] <= 0x5D
+
+
+_SNIFFERS = {
+    ProxyProtocol.HTTP: _sniff_http,
+    ProxyProtocol.SOCKS4: _sniff_socks4,
+    ProxyProtocol.SOCKS5: _sniff_socks5,
+}
+
+
+async def _sniff(protocol: ProxyProtocol, ip: str, port: int, username, password, timeout: float) -> bool:
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+    except (asyncio.TimeoutError, OSError, ValueError):
+        return False
+    try:
+        return await asyncio.wait_for(_SNIFFERS[protocol](reader, writer, username, password), timeout)
+    except (asyncio.TimeoutError, OSError, asyncio.IncompleteReadError):
+        return False
+    finally:
+        writer.close()
+
+
+async def detect_protocol(
+    ip: str,
+    port: int,
+    username: Optional[str] = None,
+    password: Optional[str] = None,
+    timeout: float | None = None,
+) -> Optional[ProxyProtocol]:
+    """
+    Sniff which protocol a proxy speaks, all candidates concurrently. Returns
+    as soon as the most preferred protocol still in the running answers, or
+    None if nothing recognisable came back within `timeout`.
+    """
+    timeout = timeout or settings.IMPORT_DETECT_TIMEOUT
+    tasks = {
+        asyncio.create_task(_sniff(protocol, ip, port, username, password, timeout)): protocol
+        for protocol in PREFERENCE
+    }
+    confirmed: set[ProxyProtocol] = set()
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            confirmed.update(tasks[task] for task in done if task.result())
+            open_protocols = {tasks[task] for task in pending}
+            for protocol in PREFERENCE:
+                if protocol in confirmed:
+                    return protocol
+                if protocol in open_protocols:
+                    break  # a preferred protocol may still answer
+        return None
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def detect_protocols(proxies: Iterable[Proxy], fallback: ProxyProtocol, concurrency: int | None = None) -> int:
+    """
+    Set `protocol` on each proxy from what it answers to, or `fallback` when it
+    does not answer at all. Returns how many were detected.
+    """
+    semaphore = asyncio.Semaphore(concurrency or settings.IMPORT_DETECT_CONCURRENCY)
+
+    async def detect(proxy: Proxy) -> bool:
+        async with semaphore:
+            protocol = await detect_protocol(proxy.ip, proxy.port, proxy.username, proxy.password)
+        proxy.protocol = protocol or fallback
+        return protocol is not None
+
+    return sum(await asyncio.gather(*(detect(proxy) for proxy in proxies)))
@@ -1,65 +1,253 @@
 import asyncio
+import base64
 import json
+import logging
+import random
 import time
 import aiohttp
-from datetime import datetime, timezone
-from app.models.proxy import Proxy, ProxyStatus, ProxyQuality, ProxyAnonymity
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from typing import AsyncIterator
+from aiohttp_socks import ProxyConnector, ProxyError, ProxyType
+from app.config import settings
+from app.models.proxy import Proxy, ProxyProtocol, ProxyStatus, ProxyQuality, ProxyAnonymity
+from app.services.check_history import history_recorder
+from app.services.geoip import get_geoip
+from app.services.health import derive_quality, health_fence, health_recorder, record_outcome
+from app.services.result_writer import Guarded, ResultWriter, notify_result_listeners
+
+logger = logging.getLogger(__name__)
 
 # ── Check targets ──────────────────────────────────────────────────────────────
 # Use multiple targets for reliability; fall back if one is down.
 
 CHECK_TARGETS = [
-    {"url": "http://ip-api.com/json/?fields=query,country,countryCode,regionName,city", "parse": "query"},
+    {"url": "http://ip-api.com/json/?fields=query,country,countryCode,regionName,city", "parse": "query", "geo": True},
     {"url": "http://httpbin.org/ip", "parse": "origin"},
     {"url": "https://api.ipify.org?format=json", "parse": "ip"},
 ]
 
 TIMEOUT = 12.0
-LATENCY_GOOD_THRESHOLD = 2000    # ms — below = good
-LATENCY_BAD_THRESHOLD = 5000     # ms — above = bad
+RACE_STAGGER = 0.3               # s — head start each target gets over the next in race mode
+FLAP_DECAY = 0.7                 # weight of history in flap_score
+FLAP_THRESHOLD = 0.3             # flap_score above = flapping
+
+
+class CheckMode(str, Enum):
+    SEQUENTIAL = "sequential"  # try targets one after another
+    RACE = "race"              # staggered parallel attempts, first success wins
+
+
+@dataclass
+class SweepStats:
+    """Counters for one check_all_proxies run, per pipeline stage."""
+    total: int = 0
+    probe_eliminated: int = 0  # dropped by the TCP pre-probe
+    check_eliminated: int = 0  # passed the probe, failed the HTTP check
+    live: int = 0
+    write_dropped: int = 0     # results the writer gave up on after retries
+
+    @property
+    def done(self) -> int:
+        return self.probe_eliminated + self.check_eliminated + self.live
+
+    def count(self, result: dict, probed: bool) -> None:
+        if probed:
+            self.probe_eliminated += 1
+        elif result["status"] == ProxyStatus.LIVE:
+            self.live += 1
+        else:
+            self.check_eliminated += 1
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+# ── Checker engine ─────────────────────────────────────────────────────────────
+# One long-lived aiohttp session per process. Connections to a proxy are kept
+# alive between targets, DNS lookups are cached and the SSL context is built once.
+# aiohttp speaks HTTP proxies natively; a SOCKS proxy needs a connector bound to
+# that proxy, so those get small per-proxy sessions from an LRU pool.
+
+_SOCKS_TYPES = {
+    ProxyProtocol.SOCKS4: ProxyType.SOCKS4,
+    ProxyProtocol.SOCKS5: ProxyType.SOCKS5,
+}
+
+
+class _SocksSession:
+    __slots__ = ("session", "users", "evicted")
+
+    def __init__(self, session: aiohttp.ClientSession):
+        self.session = session
+        self.users = 0
+        self.evicted = False
+
+
+class CheckerEngine:
+    """Owns the aiohttp sessions used by every proxy check."""
+
+    def __init__(self):
+        self._session: aiohttp.ClientSession | None = None
+        self._socks: OrderedDict[tuple, _SocksSession] = OrderedDict()
+        self._lock = asyncio.Lock()
+        self._real_ip: str | None = None
+        self._real_ip_at: float = 0.0
+
+    @property
+    def started(self) -> bool:
+        return self._session is not None and not self._session.closed
+
+    async def start(self) -> None:
+        async with self._lock:
+            if self.started:
+                return
+            connector = aiohttp.TCPConnector(
+                limit=settings.CHECKER_CONNECTOR_LIMIT,
+                limit_per_host=settings.CHECKER_CONNECTOR_LIMIT_PER_HOST,
+                keepalive_timeout=settings.CHECKER_KEEPALIVE_TIMEOUT,
+                use_dns_cache=True,
+                ttl_dns_cache=settings.CHECKER_DNS_CACHE_TTL,
+                ssl=False,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=TIMEOUT, connect=8),
+            )
+
+    async def session(self) -> aiohttp.ClientSession:
+        """Return the shared session, starting the engine lazily (scripts, tests)."""
+        if not self.started:
+            await self.start()
+        return self._session
+
+    @asynccontextmanager
+    async def session_for(self, proxy: Proxy) -> AsyncIterator[tuple[aiohttp.ClientSession, str | None]]:
+        """
+        Yield (session, proxy_url) for requests through `proxy`. HTTP(S)
+        proxies share the main session (pass proxy_url per request); SOCKS
+        proxies get their own connector and proxy_url is None.
+        """
+        protocol = ProxyProtocol(proxy.protocol)
+        if protocol not in _SOCKS_TYPES:
+            yield await self.session(), proxy.connection_string
+            return
+
+        key = (protocol, proxy.ip, proxy.port, proxy.username, proxy.password)
+        pooled = self._socks.get(key)
+        if pooled is None or pooled.session.closed:
+            connector = ProxyConnector(
+                proxy_type=_SOCKS_TYPES[protocol],
+                host=proxy.ip,
+                port=proxy.port,
+                username=proxy.username,
+                password=proxy.password,
+                rdns=protocol == ProxyProtocol.SOCKS5,  # let the proxy resolve target names
+                limit=settings.CHECKER_SOCKS_LIMIT_PER_PROXY,
+                keepalive_timeout=settings.CHECKER_KEEPALIVE_TIMEOUT,
+                ssl=False,
+            )
+            pooled = self._socks[key] = _SocksSession(aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=TIMEOUT, connect=8),
+            ))
+        self._socks.move_to_end(key)
+        pooled.users += 1
+
+        idle_evicted = []
+        while len(self._socks) > settings.CHECKER_SOCKS_POOL_SIZE:
+            _, old = self._socks.popitem(last=False)
+            old.evicted = True
+            if not old.users:
+                idle_evicted.append(old.session)
+        for session in idle_evicted:
+            await session.close()
+
+        try:
+            yield pooled.session, None
+        finally:
+            pooled.users -= 1
+            if pooled.evicted and not pooled.users:
+                await pooled.session.close()
+
+    async def real_ip(self) -> str | None:
+        """Our real IP, cached for CHECKER_REAL_IP_TTL seconds."""
+        now = time.monotonic()
+        if self._real_ip and now - self._real_ip_at < settings.CHECKER_REAL_IP_TTL:
+            return self._real_ip
+        session = await self.session()
+        try:
+            async with session.get(
+                "https://api.ipify.org?format=json",
+                timeout=aiohttp.ClientTimeout(total=5),
+            ) as resp:
+                if resp.status == 200:
+                    data = await resp.json()
+                    self._real_ip = data.get("ip")
+                    self._real_ip_at = now
+        except Exception:
+            pass
+        return self._real_ip
+
+    async def close(self) -> None:
+        async with self._lock:
+            if self._session is not None:
+                await self._session.close()
+            self._session = None
+            socks, self._socks = self._socks, OrderedDict()
+            for pooled in socks.values():
+                await pooled.session.close()
+
+
+checker_engine = CheckerEngine()
 
 
 # ── Core checker (aiohttp) ─────────────────────────────────────────────────────
 
 async def _try_check(proxy: Proxy, target: dict) -> dict | None:
     """Try a single check target using aiohttp. Returns result dict or None on failure."""
-    proxy_url = proxy.connection_string
     start = time.monotonic()
 
     timeout = aiohttp.ClientTimeout(total=TIMEOUT, connect=8)
 
     try:
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.get(target["url"], proxy=proxy_url, ssl=False) as response:
-                elapsed_ms = round((time.monotonic() - start) * 1000, 2)
-
-                if response.status == 200:
-                    text = await response.text()
-                    try:
-                        data = json.loads(text)
-                    except (json.JSONDecodeError, ValueError):
-                        data = {}
-                    proxy_ip = data.get(target["parse"], "")
-                    country = data.get("country") or data.get("countryCode") or None
-                    region = data.get("regionName") or None
-                    city = data.get("city") or None
-                    # Detect IP version
-                    ip_version = "IPv6" if ":" in proxy_ip else "IPv4" if proxy_ip else None
-                    return {
-                        "alive": True,
-                        "latency": elapsed_ms,
-                        "proxy_ip": proxy_ip,
-                        "country": country,
-                        "region": region,
-                        "city": city,
-                        "ip_version": ip_version,
-                    }
-                return None
+        async with checker_engine.session_for(proxy) as (session, proxy_url), \
+                session.get(target["url"], proxy=proxy_url, ssl=False, timeout=timeout) as response:
+            elapsed_ms = round((time.monotonic() - start) * 1000, 2)
+
+            if response.status == 200:
+                text = await response.text()
+                try:
+                    data = json.loads(text)
+                except (json.JSONDecodeError, ValueError):
+                    data = {}
+                proxy_ip = data.get(target["parse"], "")
+                country = data.get("country") or data.get("countryCode") or None
+                region = data.get("regionName") or None
+                city = data.get("city") or None
+                # Detect IP version
+                ip_version = "IPv6" if ":" in proxy_ip else "IPv4" if proxy_ip else None
+                return {
+                    "alive": True,
+                    "latency": elapsed_ms,
+                    "proxy_ip": proxy_ip,
+                    "country": country,
+                    "region": region,
+                    "city": city,
+                    "ip_version": ip_version,
+                }
+            return None
 
     except aiohttp.ClientProxyConnectionError:
         return {"alive": False, "error": "auth_failed"}
     except asyncio.TimeoutError:
         return {"alive": False, "error": "timeout"}
+    except ProxyError as exc:
+        # SOCKS handshake refused; python-socks only says which in the message
+        return {"alive": False, "error": "auth_failed" if "authentication" in str(exc).lower() else "die"}
     except aiohttp.ClientError:
         return {"alive": False, "error": "die"}
     except Exception:
@@ -68,18 +256,117 @@ async def _try_check(proxy: Proxy, target: dict) -> dict | None:
 
 async def _get_real_ip() -> str | None:
     """Get our real IP (without proxy) for anonymity comparison."""
-    timeout = aiohttp.ClientTimeout(total=5)
+    return await checker_engine.real_ip()
+
+
+def _check_targets() -> list[dict]:
+    """With a local geo-IP database, geo targets lose their edge: plain IP echoes go first."""
+    targets = settings.CHECKER_TARGETS or CHECK_TARGETS
+    if get_geoip() is None:
+        return targets
+    return sorted(targets, key=lambda target: target.get("geo", False))
+
+
+async def _sequential_check(proxy: Proxy) -> dict | None:
+    """Try targets in order until one works."""
+    result = None
+    for target in _check_targets():
+        result = await _try_check(proxy, target)
+        if result and result.get("alive"):
+            break
+    return result
+
+
+async def _race_check(proxy: Proxy) -> dict | None:
+    """
+    Happy-eyeballs style: start target N+1 once target N has failed or
+    RACE_STAGGER seconds have passed, keep the first success, cancel the rest.
+    """
+    targets = _check_targets()
+    failed = [asyncio.Event() for _ in targets]
+
+    async def attempt(i: int, target: dict) -> dict | None:
+        if i:
+            try:
+                await asyncio.wait_for(failed[i - 1].wait(), RACE_STAGGER * i)
+            except asyncio.TimeoutError:
+                pass
+        result = await _try_check(proxy, target)
+        if not (result and result.get("alive")):
+            failed[i].set()
+        return result
+
+    tasks = [asyncio.create_task(attempt(i, t)) for i, t in enumerate(targets)]
+    result = None
     try:
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.get("https://api.ipify.org?format=json") as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    return data.get("ip")
-    except Exception:
-        pass
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            if result and result.get("alive"):
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return result
+
+
+# ── TCP pre-probe ──────────────────────────────────────────────────────────────
+# A raw connect (plus optional protocol greeting) with a short timeout. Most
+# imported proxies are dead; this settles them without the full HTTP path.
+
+async def _probe_handshake(proxy: Proxy, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> str | None:
+    """Send a minimal greeting for the proxy's protocol. Returns an error or None."""
+    if proxy.protocol == ProxyProtocol.SOCKS4:
+        return None  # SOCKS4 has no greeting short of a full CONNECT; TCP connect only
+    if proxy.protocol == ProxyProtocol.SOCKS5:
+        methods = b"\x00\x02" if proxy.username else b"\x00"
+        writer.write(b"\x05" + bytes([len(methods)]) + methods)
+        await writer.drain()
+        reply = await reader.readexactly(2)
+        if reply[0] != 0x05:
+            return "die"
+        if reply[1] == 0xFF:
+            return "auth_failed"
+        return None
+
+    request = "CONNECT api.ipify.org:443 HTTP/1.1\r\nHost: api.ipify.org:443\r\n"
+    if proxy.username and proxy.password:
+        token = base64.b64encode(f"{proxy.username}:{proxy.password}".encode()).decode()
+        request += f"Proxy-Authorization: Basic {token}\r\n"
+    writer.write((request + "\r\n").encode())
+    await writer.drain()
+    status_line = await reader.readline()
+    if not status_line.startswith(b"HTTP/"):
+        return "die"
+    if b" 407" in status_line:
+        return "auth_failed"
     return None
 
 
+async def _tcp_probe(proxy: Proxy) -> str | None:
+    """Return None if the proxy answers, else the failure reason (die/timeout/auth_failed)."""
+    timeout = settings.CHECKER_PROBE_TIMEOUT
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(proxy.ip, proxy.port), timeout
+        )
+    except asyncio.TimeoutError:
+        return "timeout"
+    except (OSError, ValueError):
+        return "die"
+
+    try:
+        if settings.CHECKER_PROBE_HANDSHAKE:
+            return await asyncio.wait_for(_probe_handshake(proxy, reader, writer), timeout)
+        return None
+    except asyncio.TimeoutError:
+        return "timeout"
+    except (OSError, asyncio.IncompleteReadError):
+        return "die"
+    finally:
+        writer.close()
+
+
 def _determine_anonymity(real_ip: str | None, proxy_ip: str, proxy_obj: Proxy) -> ProxyAnonymity:
     """Determine proxy anonymity level."""
     if not real_ip:
@@ -92,62 +379,79 @@ def _determine_anonymity(real_ip: str | None, proxy_ip: str, proxy_obj: Proxy) -
     return ProxyAnonymity.ELITE
 
 
-def _determine_quality(status: ProxyStatus, latency: float | None) -> ProxyQuality:
-    """Rate quality based on status and latency."""
-    if status != ProxyStatus.LIVE:
-        return ProxyQuality.BAD
+def _failure_result(error: str) -> dict:
+    """Build a check result for a dead proxy from its failure reason."""
+    status = {
+        "auth_failed": ProxyStatus.AUTH_FAILED,
+        "timeout": ProxyStatus.TIMEOUT,
+    }.get(error, ProxyStatus.DIE)
+
+    return {
+        "status": status,
+        "quality": ProxyQuality.BAD,
+        "latency": None,
+        "anonymity": None,
+        "country": None,
+        "region": None,
+        "city": None,
+        "ip_version": None,
+    }
 
-    if latency is None:
-        return ProxyQuality.UNKNOWN
 
-    if latency <= LATENCY_GOOD_THRESHOLD:
-        return ProxyQuality.GOOD
-    elif latency >= LATENCY_BAD_THRESHOLD:
-        return ProxyQuality.BAD
+def _plan_next_check(proxy: Proxy, now: datetime) -> datetime:
+    """
+    Pick the next re-check time from the proxy's history: flapping proxies
+    soon, stable LIVE ones rarely, dead ones with exponential backoff, and
+    proxies close to expire_at more often. ±10% jitter spreads the load.
+    """
+    if proxy.status == ProxyStatus.LIVE:
+        interval = settings.SCHEDULER_LIVE_INTERVAL
     else:
-        # Between 2000-5000ms — acceptable but not great → still good
-        return ProxyQuality.GOOD
+        interval = min(
+            settings.SCHEDULER_DEAD_BASE_INTERVAL * 2 ** max(proxy.fail_streak - 1, 0),
+            settings.SCHEDULER_DEAD_MAX_INTERVAL,
+        )
+    if proxy.flap_score >= FLAP_THRESHOLD:
+        interval = min(interval, settings.SCHEDULER_FLAP_INTERVAL)
+    if proxy.expire_at:
+        expires_in = (proxy.expire_at.replace(tzinfo=timezone.utc) - now).total_seconds()
+        if 0 < expires_in <= settings.SCHEDULER_EXPIRY_WINDOW:
+            interval = min(interval, settings.SCHEDULER_FLAP_INTERVAL)
+    return now + timedelta(seconds=interval * random.uniform(0.9, 1.1))
 
 
 # ── Public API ─────────────────────────────────────────────────────────────────
 
-async def check_single_proxy(proxy: Proxy, real_ip: str | None = None) -> dict:
+async def check_single_proxy(
+    proxy: Proxy,
+    real_ip: str | None = None,
+    mode: CheckMode = CheckMode.SEQUENTIAL,
+) -> dict:
     """
     Comprehensive check: try multiple targets, determine status,
     quality, anonymity, country.
     """
-    # Try targets in order until one works
-    result = None
-    for target in CHECK_TARGETS:
-        result = await _try_check(proxy, target)
-        if result and result.get("alive"):
-            break
+    if mode == CheckMode.RACE:
+        result = await _race_check(proxy)
+    else:
+        result = await _sequential_check(proxy)
 
     if not result or not result.get("alive"):
-        # Determine specific failure reason
-        error = (result or {}).get("error", "die")
-        status = {
-            "auth_failed": ProxyStatus.AUTH_FAILED,
-            "timeout": ProxyStatus.TIMEOUT,
-        }.get(error, ProxyStatus.DIE)
-
-        return {
-            "status": status,
-            "quality": ProxyQuality.BAD,
-            "latency": None,
-            "anonymity": None,
-            "country": None,
-            "region": None,
-            "city": None,
-            "ip_version": None,
-        }
+        return _failure_result((result or {}).get("error", "die"))
 
     # Success path
     latency = result["latency"]
     status = ProxyStatus.LIVE
-    quality = _determine_quality(status, latency)
+    quality = derive_quality(status, latency)
     anonymity = _determine_anonymity(real_ip, result.get("proxy_ip", ""), proxy)
-    country = result.get("country")
+    country, region, city = result.get("country"), result.get("region"), result.get("city")
+
+    # Local geo-IP lookup on the exit IP (httpbin may report "ip1, ip2")
+    geoip = get_geoip()
+    exit_ip = (result.get("proxy_ip") or "").split(",")[0].strip()
+    geo = geoip.lookup(exit_ip) if geoip and exit_ip else None
+    if geo:
+        country, region, city = geo["country"] or geo["country_code"], geo["region"], geo["city"]
 
     return {
         "status": status,
@@ -155,41 +459,132 @@ async def check_single_proxy(proxy: Proxy, real_ip: str | None = None) -> dict:
         "latency": latency,
         "anonymity": anonymity,
         "country": country,
-        "region": result.get("region"),
-        "city": result.get("city"),
+        "region": region,
+        "city": city,
         "ip_version": result.get("ip_version"),
     }
 
 
-async def check_and_update_proxy(proxy: Proxy, real_ip: str | None = None) -> Proxy:
-    """Check proxy and persist all results to DB."""
-    result = await check_single_proxy(proxy, real_ip)
+async def check_and_update_proxy(
+    proxy: Proxy,
+    real_ip: str | None = None,
+    mode: CheckMode = CheckMode.SEQUENTIAL,
+    writer: ResultWriter | None = None,
+) -> Proxy:
+    """Check proxy and persist all results to DB (buffered if a writer is given)."""
+    result = await check_single_proxy(proxy, real_ip, mode)
+    return await _save_result(proxy, result, writer)
+
+
+async def _save_result(proxy: Proxy, result: dict, writer: ResultWriter | None = None) -> Proxy:
+    """Apply a check result to the proxy and persist it."""
+    now = datetime.now(timezone.utc)
+    changed = proxy.check_count > 0 and proxy.status != result["status"]
 
     proxy.status = result["status"]
-    proxy.quality = result["quality"]
     proxy.latency = result.get("latency")
+    live = proxy.status == ProxyStatus.LIVE
+    error = None if live else proxy.status.value
+    fence = health_fence(proxy.health)
+    proxy.health = record_outcome(proxy.health, live, proxy.latency, error, now)
+    proxy.quality = derive_quality(proxy.status, proxy.latency, proxy.health)
     proxy.anonymity = result.get("anonymity")
-    proxy.last_check = datetime.now(timezone.utc)
+    proxy.last_check = now
     proxy.check_count = (proxy.check_count or 0) + 1
     if result.get("country"):
         proxy.country = result["country"]
+    proxy.fail_streak = 0 if proxy.status == ProxyStatus.LIVE else proxy.fail_streak + 1
+    proxy.flap_score = round(proxy.flap_score * FLAP_DECAY + (1 - FLAP_DECAY) * changed, 4)
+    proxy.next_check_at = _plan_next_check(proxy, now)
+    await history_recorder.add(proxy, result, now)
+
+    if writer is None:
+        await proxy.save()
+        await notify_result_listeners([proxy])
+        return proxy
+
+    fields = {
+        "status": proxy.status,
+        "latency": proxy.latency,
+        "anonymity": proxy.anonymity,
+        "last_check": proxy.last_check,
+        "fail_streak": proxy.fail_streak,
+        "flap_score": proxy.flap_score,
+        "next_check_at": proxy.next_check_at,
+    }
+    if result.get("country"):
+        fields["country"] = proxy.country
+    # Health was folded from the sweep's snapshot: write it only if no traffic
+    # outcome landed since. Otherwise the writer hands this outcome to the
+    # health recorder, which folds it into the stored health.
+    health = {"health": proxy.health.model_dump()}
+    if live:
+        health["quality"] = proxy.quality
+    else:
+        fields["quality"] = proxy.quality
+
+    def refold(saved: Proxy) -> None:
+        health_recorder.record(saved.id, live, saved.latency, error, now)
 
-    await proxy.save()
+    await writer.add(proxy, fields, {"check_count": 1}, guarded=Guarded(fence, health, refold))
     return proxy
 
 
-async def check_all_proxies(proxies: list[Proxy]) -> list[Proxy]:
-    """Check all proxies concurrently with semaphore limit."""
+async def probe_and_check(
+    proxy: Proxy,
+    real_ip: str | None,
+    mode: CheckMode,
+    probe_semaphore: asyncio.Semaphore,
+    semaphore: asyncio.Semaphore,
+) -> tuple[dict, bool]:
+    """
+    Run one proxy through the pipeline without saving anything. Returns the
+    check result and whether the TCP pre-probe settled it.
+    """
+    if settings.CHECKER_PROBE_ENABLED:
+        async with probe_semaphore:
+            error = await _tcp_probe(proxy)
+        if error:
+            return _failure_result(error), True
+
+    async with semaphore:
+        return await check_single_proxy(proxy, real_ip, mode), False
+
+
+async def check_all_proxies(
+    proxies: list[Proxy],
+    mode: CheckMode = CheckMode.SEQUENTIAL,
+    stats: SweepStats | None = None,
+    writer: ResultWriter | None = None,
+    real_ip: str | None = None,
+) -> list[Proxy]:
+    """
+    Check all proxies as a two-stage pipeline: a cheap TCP pre-probe settles
+    unreachable proxies, survivors go through the full HTTP check. Results are
+    buffered and written back in batches.
+    """
+    if writer is None:
+        async with ResultWriter() as own_writer:
+            return await check_all_proxies(proxies, mode, stats, own_writer, real_ip)
+
+    stats = stats if stats is not None else SweepStats()
+    stats.total += len(proxies)
+
     # Get our real IP once for anonymity comparison
-    real_ip = await _get_real_ip()
+    if real_ip is None:
+        real_ip = await _get_real_ip()
 
-    semaphore = asyncio.Semaphore(30)  # max 30 concurrent checks
+    probe_semaphore = asyncio.Semaphore(settings.CHECKER_PROBE_CONCURRENCY)
+    semaphore = asyncio.Semaphore(settings.CHECKER_CONCURRENCY)
 
     async def bounded_check(proxy: Proxy) -> Proxy:
-        async with semaphore:
-            return await check_and_update_proxy(proxy, real_ip)
+        result, probed = await probe_and_check(proxy, real_ip, mode, probe_semaphore, semaphore)
+        updated = await _save_result(proxy, result, writer)
+        stats.count(result, probed)
+        return updated
 
     results = await asyncio.gather(
         *[bounded_check(p) for p in proxies], return_exceptions=True
     )
+    logger.info("Proxy sweep finished: %s", stats.as_dict())
     return [r for r in results if isinstance(r, Proxy)]
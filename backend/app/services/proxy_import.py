@@ -0,0 +1,176 @@
+import re
+import uuid
+from typing import AsyncIterator, Optional
+from pymongo.errors import BulkWriteError
+from app.config import settings
+from app.models.proxy import Proxy, ProxyProtocol
+from app.services.protocol_detect import detect_protocols
+
+_PROTO_RE = re.compile(r"^(https?|socks[45])://", re.IGNORECASE)
+
+
+def line_protocol(line: str) -> Optional[ProxyProtocol]:
+    """The protocol named by the line's scheme prefix, if it has one."""
+    match = _PROTO_RE.match(line.strip())
+    return ProxyProtocol(match.group(1).lower()) if match else None
+
+
+def parse_proxy_line(line: str, protocol: ProxyProtocol, provider_name: Optional[str], cost: Optional[float]) -> Optional[Proxy]:
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    try:
+        # Bóc tách protocol prefix: http:// https:// socks4:// socks5://
+        cleaned = _PROTO_RE.sub("", line)
+
+        if "@" in cleaned:
+            auth, host = cleaned.rsplit("@", 1)
+            username, password = auth.split(":", 1)
+            ip, port_str = host.rsplit(":", 1)
+        else:
+            parts = cleaned.split(":")
+            if len(parts) == 2:
+                ip, port_str = parts
+                username, password = None, None
+            elif len(parts) == 4:
+                ip, port_str, username, password = parts
+            else:
+                return None
+        return Proxy(
+            ip=ip.strip(),
+            port=int(port_str.strip()),
+            username=username.strip() if username else None,
+            password=password.strip() if password else None,
+            protocol=protocol,
+            provider_name=provider_name,
+            cost=cost,
+        )
+    except Exception:
+        return None
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a byte stream into text lines without buffering the whole body."""
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8", errors="ignore")
+    if pending:
+        yield pending.decode("utf-8", errors="ignore")
+
+
+def _dedup_key(proxy: Proxy) -> tuple:
+    return proxy.ip, proxy.port, ProxyProtocol(proxy.protocol).value
+
+
+class StreamImport:
+    """
+    Incremental importer: parses lines as they arrive, drops duplicates of
+    (ip, port, protocol, owner) — within the upload and against existing
+    data — and inserts in `insert_many` batches. Inserted proxies carry
+    `batch_id` as Proxy.import_batch, so follow-up work (the auto-check job)
+    finds them with a query instead of holding every id.
+
+    With `detect`, lines without a scheme prefix get their protocol sniffed
+    (see protocol_detect) at flush time; `protocol` is only the fallback for
+    proxies that do not answer.
+    """
+
+    def __init__(
+        self,
+        owner: str,
+        protocol: ProxyProtocol,
+        provider_name: Optional[str] = None,
+        cost: Optional[float] = None,
+        batch_size: int | None = None,
+        detect: bool = False,
+    ):
+        self.owner = owner
+        self.protocol = protocol
+        self.provider_name = provider_name
+        self.cost = cost
+        self.batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+        self.detect = detect
+        self.imported = 0
+        self.duplicates = 0
+        self.failed = 0
+        self.detected = 0
+        self.batch_id = uuid.uuid4().hex
+        self._seen: set[tuple] = set()
+        self._batch: list[Proxy] = []
+        self._undetected: list[Proxy] = []
+
+    async def feed(self, line: str) -> None:
+        if not line.strip() or line.strip().startswith("#"):
+            return
+        proxy = parse_proxy_line(line, self.protocol, self.provider_name, self.cost)
+        if not proxy:
+            self.failed += 1
+            return
+        proxy.owner = self.owner
+        proxy.import_batch = self.batch_id
+        if self.detect:
+            explicit = line_protocol(line)
+            if explicit is None:
+                key = (proxy.ip, proxy.port, None)  # protocol not known until sniffed
+                if key in self._seen:
+                    self.duplicates += 1
+                    return
+                self._seen.add(key)
+                self._undetected.append(proxy)
+                if len(self._batch) + len(self._undetected) >= self.batch_size:
+                    await self.flush()
+                return
+            proxy.protocol = explicit
+        if self._admit(proxy):
+            self._batch.append(proxy)
+        if len(self._batch) + len(self._undetected) >= self.batch_size:
+            await self.flush()
+
+    def _admit(self, proxy: Proxy) -> bool:
+        key = _dedup_key(proxy)
+        if key in self._seen:
+            self.duplicates += 1
+            return False
+        self._seen.add(key)
+        return True
+
+    async def flush(self) -> None:
+        batch, self._batch = self._batch, []
+        undetected, self._undetected = self._undetected, []
+        if undetected:
+            self.detected += await detect_protocols(undetected, self.protocol)
+            batch.extend(proxy for proxy in undetected if self._admit(proxy))
+        if not batch:
+            return
+
+        collection = Proxy.get_motor_collection()
+        existing = set()
+        cursor = collection.find(
+            {"owner": self.owner, "ip": {"$in": list({p.ip for p in batch})}},
+            {"ip": 1, "port": 1, "protocol": 1},
+        )
+        async for doc in cursor:
+            existing.add((doc["ip"], doc["port"], doc["protocol"]))
+
+        fresh = [p for p in batch if _dedup_key(p) not in existing]
+        self.duplicates += len(batch) - len(fresh)
+        if not fresh:
+            return
+
+        try:
+            await Proxy.insert_many(fresh, ordered=False)
+            failed_at = set()
+        except BulkWriteError as exc:
+            # Rows raced in by a concurrent import hit the unique index
+            failed_at = {err["index"] for err in exc.details.get("writeErrors", [])}
+            self.duplicates += len(failed_at)
+        self.imported += len(fresh) - len(failed_at)
+
+    async def run(self, lines: AsyncIterator[str]) -> "StreamImport":
+        async for line in lines:
+            await self.feed(line)
+        await self.flush()
+        return self
@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import weakref
+from typing import Awaitable, Callable, NamedTuple
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from app.config import settings
+from app.models.proxy import Proxy
+
+logger = logging.getLogger(__name__)
+
+# Writers that may still hold unflushed results; flushed on app shutdown.
+_active_writers: "weakref.WeakSet[ResultWriter]" = weakref.WeakSet()
+
+# Called with the proxies whose check results were just persisted.
+ResultListener = Callable[[list[Proxy]], Awaitable[None]]
+_result_listeners: list[ResultListener] = []
+
+
+def add_result_listener(listener: ResultListener) -> None:
+    _result_listeners.append(listener)
+
+
+async def notify_result_listeners(proxies: list[Proxy]) -> None:
+    for listener in _result_listeners:
+        try:
+            await listener(proxies)
+        except Exception:
+            logger.exception("Result listener %r failed", listener)
+
+
+class Guarded(NamedTuple):
+    """
+    Fields set in their own update, applied only while the document also
+    matches `condition`. When the result's main update landed but this one
+    did not, `on_miss` is called with the proxy.
+    """
+    condition: dict
+    fields: dict
+    on_miss: Callable[[Proxy], None] | None = None
+
+
+class ResultWriter:
+    """
+    Buffers proxy check results and writes them to MongoDB as batched
+    partial updates ($set / $inc) instead of one full-document save per proxy.
+
+    A batch is flushed when it reaches `batch_size` operations or every
+    `interval` seconds, whichever comes first, and always on close. A failed
+    write is retried with backoff (only the failed operations of a partly
+    applied batch); results still unwritten after CHECKER_FLUSH_RETRIES are
+    dropped and counted in `dropped`.
+
+        async with ResultWriter() as writer:
+            await writer.add(proxy, {"status": ...}, {"check_count": 1})
+    """
+
+    def __init__(
+        self,
+        batch_size: int | None = None,
+        interval: float | None = None,
+    ):
+        self.batch_size = batch_size or settings.CHECKER_FLUSH_SIZE
+        self.interval = interval or settings.CHECKER_FLUSH_INTERVAL
+        self.written = 0
+        self.dropped = 0
+        self._ops: list[UpdateOne] = []
+        self._proxies: list[Proxy] = []
+        self._guards: dict[int, tuple[dict, Guarded]] = {}  # op index -> (main $set, guarded)
+        self._lock = asyncio.Lock()
+        self._timer: asyncio.Task | None = None
+
+    async def __aenter__(self) -> "ResultWriter":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    def start(self) -> None:
+        _active_writers.add(self)
+        if self._timer is None:
+            self._timer = asyncio.create_task(self._flush_periodically())
+
+    async def add(
+        self,
+        proxy: Proxy,
+        set_fields: dict,
+        inc_fields: dict | None = None,
+        guarded: Guarded | None = None,
+    ) -> None:
+        if proxy.id is None:
+            return  # temporary proxy (preview checks) — nothing to persist
+        update = {"$set": set_fields}
+        if inc_fields:
+            update["$inc"] = inc_fields
+        self._ops.append(UpdateOne(self._filter(proxy), update))
+        self._proxies.append(proxy)
+        if guarded:
+            self._guards[len(self._ops)] = (set_fields, guarded)
+            self._ops.append(UpdateOne({**self._guard_filter(proxy), **guarded.condition}, {"$set": guarded.fields}))
+            self._proxies.append(proxy)
+        if len(self._ops) >= self.batch_size:
+            await self.flush()
+
+    def _filter(self, proxy: Proxy) -> dict:
+        return {"_id": proxy.id}
+
+    def _guard_filter(self, proxy: Proxy) -> dict:
+        """Filter of a guarded update, before its own condition."""
+        return self._filter(proxy)
+
+    async def flush(self) -> None:
+        async with self._lock:
+            ops, self._ops = self._ops, []
+            proxies, self._proxies = self._proxies, []  # one per op
+            guards, self._guards = self._guards, {}
+            if not ops:
+                return
+            failed, matched = await self._write_with_retries(ops)
+            unwritten = set(failed)
+            to_verify = [
+                (proxies[i], set_fields, guard) for i, (set_fields, guard) in guards.items()
+                if i not in unwritten and i - 1 not in unwritten  # the guarded op follows its main op
+            ]
+            if to_verify and matched != len(ops) - len(failed):
+                await self._find_guard_misses(to_verify)
+            lost = {id(proxies[i]) for i in failed}
+            saved = list({id(p): p for p in proxies if id(p) not in lost}.values())
+            self.written += len(saved)
+            if lost:
+                self.dropped += len(lost)
+                logger.error("Dropped %d proxy check results after %d retries", len(lost), settings.CHECKER_FLUSH_RETRIES)
+        if saved:
+            await notify_result_listeners(saved)
+
+    async def _write_with_retries(self, ops: list[UpdateOne]) -> tuple[list[int], int | None]:
+        """
+        Write `ops`, retrying what failed. Returns the indexes never written
+        and how many written ops matched a document (None when unknown).
+        """
+        pending = list(range(len(ops)))
+        matched = 0
+        for attempt in range(settings.CHECKER_FLUSH_RETRIES + 1):
+            if attempt:
+                await asyncio.sleep(settings.CHECKER_FLUSH_BACKOFF * 2 ** (attempt - 1))
+            try:
+                result = await self._write([ops[i] for i in pending])
+                if result is None:  # a writer that does not report matches (no database)
+                    return [], len(ops)
+                return [], None if matched is None else matched + result.matched_count
+            except BulkWriteError as exc:
+                errors = exc.details.get("writeErrors", [])
+                if errors:  # the rest of the batch went through
+                    pending = [pending[error["index"]] for error in errors]
+                    matched = None if matched is None else matched + exc.details.get("nMatched", 0)
+                else:
+                    matched = None
+                logger.warning("Failed to write %d proxy check results (attempt %d): %s",
+                               len(pending), attempt + 1, errors[:1])
+            except Exception:
+                matched = None  # unknown how much of the batch was applied
+                logger.warning("Failed to write %d proxy check results (attempt %d)",
+                               len(pending), attempt + 1, exc_info=True)
+        return pending, matched
+
+    async def _write(self, ops: list[UpdateOne]):
+        return await Proxy.get_motor_collection().bulk_write(ops, ordered=False)
+
+    async def _find_guard_misses(self, written: list[tuple[Proxy, dict, Guarded]]) -> None:
+        """
+        Some update matched nothing: find results whose main update landed
+        but whose guarded one did not, and hand those to `on_miss`.
+        """
+        try:
+            collection = Proxy.get_motor_collection()
+            main = collection.find({"$or": [{"_id": p.id, **fields} for p, fields, _ in written]}, {"_id": 1})
+            landed = {doc["_id"] async for doc in main}
+            guarded = collection.find(
+                {"$or": [{"_id": p.id, **guard.fields} for p, _, guard in written if p.id in landed]}, {"_id": 1},
+            ) if landed else None
+            applied = {doc["_id"] async for doc in guarded} if guarded is not None else set()
+        except Exception:
+            logger.exception("Failed to verify %d guarded proxy updates", len(written))
+            return
+        for proxy, _, guard in written:
+            if proxy.id in landed and proxy.id not in applied and guard.on_miss:
+                guard.on_miss(proxy)
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            # Shielded so close() cancelling the timer never drops a batch mid-write
+            await asyncio.shield(self.flush())
+
+    async def close(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        await self.flush()
+        _active_writers.discard(self)
+
+
+async def flush_all_writers() -> None:
+    """Flush every writer still holding results (called on app shutdown)."""
+    for writer in list(_active_writers):
+        await writer.flush()
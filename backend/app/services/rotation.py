@@ -0,0 +1,390 @@
+import asyncio
+import bisect
+import itertools
+import random
+import time
+from collections import OrderedDict
+from enum import Enum
+from typing import Collection, Optional
+from app.config import settings
+from app.models.proxy import Proxy, ProxyAnonymity, ProxyProtocol, ProxyQuality, ProxyStatus
+from app.services.result_writer import add_result_listener
+
+ALL_OWNERS = "*"  # pool key for admins, who rotate over every owner's proxies
+
+
+class RotationMode(str, Enum):
+    ROUND_ROBIN = "round_robin"
+    LEAST_RECENTLY_USED = "lru"
+    LOWEST_LATENCY = "lowest_latency"  # rotate over the fastest few
+    WEIGHTED = "weighted"              # random, weighted by 1 / latency
+
+
+class PoolEntry:
+    """What a client needs to use a proxy; detached from the Beanie document."""
+
+    __slots__ = ("id", "owner", "ip", "port", "protocol", "username", "password",
+                 "country", "anonymity", "latency", "last_used")
+
+    def __init__(self, doc: dict):
+        self.id = doc["_id"]
+        self.last_used = 0.0
+        self.update(doc)
+
+    def update(self, doc: dict) -> None:
+        """Refresh from a newer document; allocation history (last_used) is kept."""
+        self.owner = doc.get("owner", "")
+        self.ip = doc["ip"]
+        self.port = doc["port"]
+        self.protocol = ProxyProtocol(doc.get("protocol") or ProxyProtocol.HTTP).value
+        self.username = doc.get("username")
+        self.password = doc.get("password")
+        self.country = doc.get("country")
+        self.anonymity = ProxyAnonymity(doc["anonymity"]).value if doc.get("anonymity") else None
+        self.latency = doc.get("latency")
+
+    @property
+    def proxy_url(self) -> str:
+        if self.username and self.password:
+            return f"{self.protocol}://{self.username}:{self.password}@{self.ip}:{self.port}"
+        return f"{self.protocol}://{self.ip}:{self.port}"
+
+    def as_dict(self) -> dict:
+        return {
+            "id": str(self.id),
+            "ip": self.ip,
+            "port": self.port,
+            "protocol": self.protocol,
+            "username": self.username,
+            "password": self.password,
+            "country": self.country,
+            "anonymity": self.anonymity,
+            "latency": self.latency,
+            "proxy_url": self.proxy_url,
+        }
+
+
+_LOAD_PROJECTION = {name: 1 for name in (
+    "owner", "ip", "port", "protocol", "username", "password", "country", "anonymity", "latency",
+)}
+
+
+async def load_entries(query: dict) -> list[PoolEntry]:
+    cursor = Proxy.get_motor_collection().find(query, _LOAD_PROJECTION)
+    return [PoolEntry(doc) async for doc in cursor]
+
+
+def _matches(key: tuple, entry: PoolEntry) -> bool:
+    country, protocol, anonymity = key
+    return ((country is None or entry.country == country)
+            and (protocol is None or entry.protocol == protocol)
+            and (anonymity is None or entry.anonymity == anonymity))
+
+
+def _latency_key(entry: PoolEntry) -> float:
+    return entry.latency if entry.latency is not None else float("inf")
+
+
+def _weight(entry: PoolEntry) -> float:
+    return 1.0 / max(entry.latency or settings.ROTATION_DEFAULT_LATENCY, 1.0)
+
+
+class _Weights:
+    """
+    Entries by slot with their 1 / latency weights in a Fenwick tree, so a
+    weighted draw, an added entry and a changed weight each cost O(log n).
+    Removed entries leave an empty zero-weight slot until the next compaction.
+    """
+
+    def __init__(self, entries: list[PoolEntry]):
+        self._build(entries)
+
+    def _build(self, entries: list[PoolEntry]) -> None:
+        self.slots: list[PoolEntry | None] = list(entries)
+        self.slot_of: dict = {e.id: i for i, e in enumerate(self.slots)}
+        self.weights = [_weight(e) for e in self.slots]
+        self.total = sum(self.weights)
+        self.tree = [0.0] + self.weights  # 1-based
+        for i in range(1, len(self.tree)):
+            parent = i + (i & -i)
+            if parent < len(self.tree):
+                self.tree[parent] += self.tree[i]
+
+    def _prefix(self, i: int) -> float:
+        """Sum of the first `i` slot weights."""
+        total = 0.0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def _adjust(self, slot: int, delta: float) -> None:
+        self.weights[slot] += delta
+        self.total += delta
+        i = slot + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def add(self, entry: PoolEntry) -> None:
+        weight = _weight(entry)
+        i = len(self.tree)  # 1-based index of the new slot
+        self.tree.append(weight + self._prefix(i - 1) - self._prefix(i - (i & -i)))
+        self.slot_of[entry.id] = len(self.slots)
+        self.slots.append(entry)
+        self.weights.append(weight)
+        self.total += weight
+
+    def remove(self, proxy_id) -> None:
+        slot = self.slot_of.pop(proxy_id)
+        self.slots[slot] = None
+        self._adjust(slot, -self.weights[slot])
+        if len(self.slots) > 2 * len(self.slot_of) + 64:
+            self._build([e for e in self.slots if e is not None])  # also resets rounding drift
+
+    def update(self, entry: PoolEntry) -> None:
+        slot = self.slot_of[entry.id]
+        self._adjust(slot, _weight(entry) - self.weights[slot])
+
+    def sample(self) -> Optional[PoolEntry]:
+        """A random entry, drawn with probability proportional to its weight."""
+        target = random.random() * self.total
+        i, step = 0, 1 << (len(self.tree) - 1).bit_length()
+        while step:
+            if i + step < len(self.tree) and self.tree[i + step] <= target:
+                i += step
+                target -= self.tree[i]
+            step >>= 1
+        return self.slots[i] if i < len(self.slots) else None
+
+
+class _View:
+    """
+    Entries matching one filter combination, pre-arranged for every mode.
+    Kept up to date entry by entry, so check results arriving between
+    allocations never reset the round-robin position or the LRU order, and
+    a result flush costs O(log n) per changed entry rather than a re-sort.
+    """
+
+    def __init__(self, entries: list[PoolEntry]):
+        # Least recently used first, so a rebuilt view carries on where the old one was
+        self.entries = sorted(entries, key=lambda e: e.last_used)  # round-robin order
+        self._seq = itertools.count()
+        self._order = [next(self._seq) for _ in self.entries]  # sequence numbers, parallel to entries
+        self._index: dict = {e.id: (seq, _latency_key(e)) for e, seq in zip(self.entries, self._order)}
+        self.rr = 0
+        self.lru: OrderedDict = OrderedDict((e.id, e) for e in self.entries)
+        self.fast = 0
+        ranked = sorted(zip(self.entries, self._order), key=lambda pair: (_latency_key(pair[0]), pair[1]))
+        self._fastest = [e for e, _ in ranked]  # lowest latency first
+        self._fast_keys = [(_latency_key(e), seq) for e, seq in ranked]  # parallel to _fastest
+        self._weights = _Weights(self.entries)
+
+    def add(self, entry: PoolEntry) -> None:
+        seq = next(self._seq)
+        self._index[entry.id] = (seq, _latency_key(entry))
+        self.entries.append(entry)
+        self._order.append(seq)
+        self.lru[entry.id] = entry
+        self.lru.move_to_end(entry.id, last=entry.last_used > 0)  # never used: first in line
+        self._rank(entry, seq)
+        self._weights.add(entry)
+
+    def remove(self, proxy_id) -> None:
+        if self.lru.pop(proxy_id, None) is None:
+            return
+        seq, latency = self._index.pop(proxy_id)
+        i = bisect.bisect_left(self._order, seq)
+        del self.entries[i], self._order[i]
+        if i < self.rr:
+            self.rr -= 1  # the entry due next stays due next
+        self._unrank(seq, latency)
+        self._weights.remove(proxy_id)
+
+    def rearrange(self, entry: PoolEntry) -> None:
+        """The entry's latency changed: move it within the latency order and re-weight it."""
+        seq, latency = self._index[entry.id]
+        self._unrank(seq, latency)
+        self._index[entry.id] = (seq, _latency_key(entry))
+        self._rank(entry, seq)
+        self._weights.update(entry)
+
+    def _rank(self, entry: PoolEntry, seq: int) -> None:
+        key = (_latency_key(entry), seq)
+        i = bisect.bisect_left(self._fast_keys, key)
+        self._fast_keys.insert(i, key)
+        self._fastest.insert(i, entry)
+
+    def _unrank(self, seq: int, latency: float) -> None:
+        i = bisect.bisect_left(self._fast_keys, (latency, seq))
+        del self._fast_keys[i], self._fastest[i]
+
+    def touch(self, entry: PoolEntry) -> None:
+        if entry.id in self.lru:
+            self.lru.move_to_end(entry.id)
+
+    def pick(self, mode: RotationMode, exclude: Collection = ()) -> Optional[PoolEntry]:
+        """Next entry in the mode's order that is not in `exclude`."""
+        if not self.entries:
+            return None
+        if mode == RotationMode.LEAST_RECENTLY_USED:
+            return next((e for e in self.lru.values() if e.id not in exclude), None)
+        if mode == RotationMode.LOWEST_LATENCY:
+            top = min(len(self._fastest), settings.ROTATION_LATENCY_TOP_K)
+            for _ in range(top):
+                entry = self._fastest[self.fast % top]
+                self.fast = (self.fast + 1) % top
+                if entry.id not in exclude:
+                    return entry
+            return next((e for e in self._fastest[top:] if e.id not in exclude), None)
+        if mode == RotationMode.WEIGHTED:
+            # Keep the weighting for a bounded number of tries, then scan
+            for _ in range(min(len(self.entries), settings.ROTATION_LATENCY_TOP_K)):
+                entry = self._weights.sample()
+                if entry is not None and entry.id not in exclude:
+                    return entry
+            return next((e for e in self.entries if e.id not in exclude), None)
+        for _ in range(len(self.entries)):
+            entry = self.entries[self.rr % len(self.entries)]
+            self.rr = (self.rr + 1) % len(self.entries)
+            if entry.id not in exclude:
+                return entry
+        return None
+
+
+class ProxyPool:
+    """LIVE + GOOD proxies for one pool key, with lazily built filter views."""
+
+    def __init__(self, entries: list[PoolEntry]):
+        self.entries: dict = {e.id: e for e in entries}
+        self.loaded_at = time.monotonic()
+        self._views: dict[tuple, _View] = {}
+
+    def view(self, country: Optional[str], protocol: Optional[str], anonymity: Optional[str]) -> Optional[_View]:
+        key = (country, protocol, anonymity)
+        view = self._views.get(key)
+        if view is None:
+            matching = [e for e in self.entries.values() if _matches(key, e)]
+            if not matching:
+                return None
+            view = self._views[key] = _View(matching)
+        return view if view.entries else None
+
+    def upsert(self, doc: dict) -> None:
+        """Add a proxy, or refresh it in place (moving it between views if its filters changed)."""
+        entry = self.entries.get(doc["_id"])
+        if entry is None:
+            entry = self.entries[doc["_id"]] = PoolEntry(doc)
+            for key, view in self._views.items():
+                if _matches(key, entry):
+                    view.add(entry)
+            return
+        latency = entry.latency
+        before = {key: _matches(key, entry) for key in self._views}
+        entry.update(doc)
+        for key, view in self._views.items():
+            now = _matches(key, entry)
+            if before[key] and not now:
+                view.remove(entry.id)
+            elif now and not before[key]:
+                view.add(entry)
+            elif now and entry.latency != latency:
+                view.rearrange(entry)
+
+    def discard(self, proxy_id) -> None:
+        if self.entries.pop(proxy_id, None) is not None:
+            for view in self._views.values():
+                view.remove(proxy_id)
+
+    def touch(self, entry: PoolEntry) -> None:
+        """Record an allocation: the entry moves to the back of every LRU order."""
+        entry.last_used = time.monotonic()
+        for view in self._views.values():
+            view.touch(entry)
+
+
+class RotationService:
+    """
+    In-memory allocation of usable proxies for automation clients. Pools are
+    loaded from Mongo once per owner (and re-loaded every
+    ROTATION_REFRESH_INTERVAL as a safety net); check results keep them
+    current, so allocations never touch the database.
+    """
+
+    def __init__(self):
+        self._pools: dict[str, ProxyPool] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    async def _pool(self, key: str) -> ProxyPool:
+        pool = self._pools.get(key)
+        if pool is not None and time.monotonic() - pool.loaded_at < settings.ROTATION_REFRESH_INTERVAL:
+            return pool
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            pool = self._pools.get(key)
+            if pool is None or time.monotonic() - pool.loaded_at >= settings.ROTATION_REFRESH_INTERVAL:
+                fresh = await self._load(key)
+                if pool is not None:
+                    for entry in fresh.entries.values():
+                        if (old := pool.entries.get(entry.id)) is not None:
+                            entry.last_used = old.last_used
+                pool = self._pools[key] = fresh
+        return pool
+
+    async def _load(self, key: str) -> ProxyPool:
+        query = {"status": ProxyStatus.LIVE.value, "quality": ProxyQuality.GOOD.value}
+        if key != ALL_OWNERS:
+            query["owner"] = key
+        return ProxyPool(await load_entries(query))
+
+    async def next(
+        self,
+        key: str,
+        mode: RotationMode = RotationMode.ROUND_ROBIN,
+        country: Optional[str] = None,
+        protocol: Optional[str] = None,
+        anonymity: Optional[str] = None,
+        exclude: Collection = (),
+    ) -> Optional[PoolEntry]:
+        """Pick a proxy; ids in `exclude` (e.g. leased proxies) are skipped."""
+        pool = await self._pool(key)
+        view = pool.view(country, protocol, anonymity)
+        if view is None:
+            return None
+        entry = view.pick(mode, exclude)
+        if entry is not None:
+            pool.touch(entry)
+        return entry
+
+    def _pools_for(self, owner: str) -> list[ProxyPool]:
+        return [pool for key in (owner, ALL_OWNERS) if (pool := self._pools.get(key))]
+
+    def apply_results(self, proxies: list[Proxy]) -> None:
+        """Add proxies that became LIVE + GOOD, drop the ones that stopped being usable."""
+        for proxy in proxies:
+            usable = proxy.status == ProxyStatus.LIVE and proxy.quality == ProxyQuality.GOOD
+            for pool in self._pools_for(proxy.owner):
+                if usable:
+                    pool.upsert(_entry_doc(proxy))
+                else:
+                    pool.discard(proxy.id)
+
+    def remove(self, proxy: Proxy) -> None:
+        for pool in self._pools_for(proxy.owner):
+            pool.discard(proxy.id)
+
+
+def _entry_doc(proxy: Proxy) -> dict:
+    doc = proxy.model_dump(include=set(_LOAD_PROJECTION), mode="json")
+    doc["_id"] = proxy.id
+    return doc
+
+
+rotation_service = RotationService()
+
+
+async def _on_results(proxies: list[Proxy]) -> None:
+    rotation_service.apply_results(proxies)
+
+
+add_result_listener(_on_results)
@@ -0,0 +1,66 @@
+import logging
+from datetime import datetime, timezone
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from app.config import settings
+from app.models.check_job import CheckJob, CheckJobStatus
+from app.models.proxy import Proxy
+from app.services.check_jobs import enqueue_check_job
+from app.services.proxy_checker import CheckMode
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_OWNER = "scheduler"  # CheckJob.owner for scheduled re-checks
+
+scheduler = AsyncIOScheduler(timezone="UTC")
+
+
+async def queue_due_checks() -> CheckJob | None:
+    """
+    Queue one batch of proxies whose next_check_at has passed (or that were
+    never scheduled), most overdue first. Each tick queues at most
+    SCHEDULER_BATCH_SIZE proxies, so checks are spread over time.
+    """
+    running = await CheckJob.find_one({
+        "owner": SCHEDULER_OWNER,
+        "status": {"$in": [CheckJobStatus.QUEUED, CheckJobStatus.RUNNING]},
+    })
+    if running:
+        return None  # previous batch still in progress
+
+    now = datetime.now(timezone.utc)
+    cursor = (
+        Proxy.get_motor_collection()
+        .find(
+            {"$or": [{"next_check_at": {"$lte": now}}, {"next_check_at": None}]},
+            {"_id": 1},
+        )
+        .sort("next_check_at", 1)
+        .limit(settings.SCHEDULER_BATCH_SIZE)
+    )
+    ids = [doc["_id"] async for doc in cursor]
+    if not ids:
+        return None
+
+    logger.info("Scheduling re-check of %d due proxies", len(ids))
+    return await enqueue_check_job(SCHEDULER_OWNER, proxy_ids=ids, mode=CheckMode.RACE)
+
+
+def start_scheduler() -> None:
+    # Claim workers pick up due proxies themselves; queuing jobs too would check them twice
+    if not settings.SCHEDULER_ENABLED or settings.CLAIM_WORKER_ENABLED or scheduler.running:
+        return
+    scheduler.add_job(
+        queue_due_checks,
+        "interval",
+        seconds=settings.SCHEDULER_TICK,
+        id="queue_due_checks",
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True,
+    )
+    scheduler.start()
+
+
+def stop_scheduler() -> None:
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
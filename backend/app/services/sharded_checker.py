@@ -0,0 +1,244 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import zlib
+from collections import defaultdict
+from typing import AsyncIterable
+from bson import ObjectId
+from app.config import settings
+from app.models.proxy import Proxy, ProxyProtocol
+from app.services.proxy_checker import (
+    CheckMode, SweepStats, _failure_result, _save_result, checker_engine, probe_and_check,
+)
+from app.services.result_writer import ResultWriter
+
+logger = logging.getLogger(__name__)
+
+# ── Wire format ────────────────────────────────────────────────────────────────
+# Parent -> worker: (sweep, mode, real_ip, [(id, protocol, ip, port, username, password), ...]) or None to exit
+# Worker -> parent: (sweep, [(id, result, settled_by_probe), ...])
+# Workers never touch MongoDB; the parent owns the proxies and saves every result.
+
+RESULT_BATCH = 100            # results per message back to the parent
+RESULT_INTERVAL = 0.2         # s — partial result batches are sent at least this often
+_POLL = 0.2                   # s — blocking queue waits, so shutdown and dead workers are noticed
+
+
+def shard_of(proxy_id, shards: int) -> int:
+    """Stable shard for a proxy id: a proxy keeps hitting the same worker's connection pool."""
+    return zlib.crc32(ObjectId(proxy_id).binary) % shards
+
+
+def _payload(proxy: Proxy) -> tuple:
+    return str(proxy.id), ProxyProtocol(proxy.protocol).value, proxy.ip, proxy.port, proxy.username, proxy.password
+
+
+def _proxy(payload: tuple) -> Proxy:
+    proxy_id, protocol, ip, port, username, password = payload
+    # model_construct: the worker has no database, and a Document insists on one
+    return Proxy.model_construct(
+        id=ObjectId(proxy_id), protocol=ProxyProtocol(protocol),
+        ip=ip, port=port, username=username, password=password,
+    )
+
+
+# ── Worker process ─────────────────────────────────────────────────────────────
+
+def _worker_main(inbox: multiprocessing.Queue, results: multiprocessing.Queue) -> None:
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_worker(inbox, results))
+
+
+async def _worker(inbox: multiprocessing.Queue, results: multiprocessing.Queue) -> None:
+    """One event loop and connector pool per process; checks as many proxies as the semaphores allow."""
+    loop = asyncio.get_running_loop()
+    probe_semaphore = asyncio.Semaphore(settings.CHECKER_PROBE_CONCURRENCY)
+    semaphore = asyncio.Semaphore(settings.CHECKER_CONCURRENCY)
+    # Bounds proxies held by this worker, so a full inbox means a busy worker
+    in_flight = asyncio.Semaphore(settings.CHECKER_PROBE_CONCURRENCY + settings.CHECKER_CONCURRENCY)
+    outgoing: dict[int, list] = defaultdict(list)
+    tasks: set[asyncio.Task] = set()
+
+    def send() -> None:
+        for sweep, items in outgoing.items():
+            results.put((sweep, items))
+        outgoing.clear()
+
+    async def send_periodically() -> None:
+        while True:
+            await asyncio.sleep(RESULT_INTERVAL)
+            send()
+
+    async def check(sweep: int, mode: CheckMode, real_ip: str | None, payload: tuple) -> None:
+        try:
+            result, probed = await probe_and_check(_proxy(payload), real_ip, mode, probe_semaphore, semaphore)
+        except Exception:
+            logger.exception("Check of proxy %s failed", payload[0])
+            result, probed = _failure_result("die"), False  # the parent waits for every proxy
+        finally:
+            in_flight.release()
+        outgoing[sweep].append((payload[0], result, probed))
+        if len(outgoing[sweep]) >= RESULT_BATCH:
+            send()
+
+    sender = asyncio.create_task(send_periodically())
+    try:
+        while (message := await loop.run_in_executor(None, inbox.get)) is not None:
+            sweep, mode, real_ip, batch = message
+            for payload in batch:
+                await in_flight.acquire()
+                task = asyncio.create_task(check(sweep, CheckMode(mode), real_ip, payload))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+    finally:
+        sender.cancel()
+        send()
+        await checker_engine.close()
+
+
+# ── Parent side ────────────────────────────────────────────────────────────────
+
+class ShardedChecker:
+    """
+    Runs sweeps in `workers` child processes, each with its own event loop and
+    connector pool, so JSON/TLS/model work for large sweeps neither competes
+    with API requests nor is limited to one core. Proxies are sharded by id
+    hash; results stream back to this process and go through the usual
+    _save_result path (health, history, ResultWriter, listeners).
+
+    Workers are spawned on first use and kept for later sweeps; one sweep runs
+    at a time.
+    """
+
+    def __init__(self, workers: int | None = None):
+        self.workers = workers or settings.CHECKER_WORKERS or os.cpu_count() or 1
+        self._processes: list[multiprocessing.Process] = []
+        self._inboxes: list[multiprocessing.Queue] = []
+        self._results: multiprocessing.Queue | None = None
+        self._sweep = 0
+        self._lock = asyncio.Lock()
+
+    def start(self) -> None:
+        if self._processes:
+            return
+        context = multiprocessing.get_context("spawn")  # forking a running event loop is unsafe
+        self._results = context.Queue()
+        for shard in range(self.workers):
+            inbox = context.Queue(maxsize=settings.CHECKER_SHARD_QUEUE)
+            process = context.Process(
+                target=_worker_main, args=(inbox, self._results), name=f"checker-{shard}", daemon=True,
+            )
+            process.start()
+            self._inboxes.append(inbox)
+            self._processes.append(process)
+        logger.info("Started %d checker worker processes", self.workers)
+
+    async def close(self) -> None:
+        if not self._processes:
+            return
+        loop = asyncio.get_running_loop()
+        for inbox in self._inboxes:
+            inbox.put(None)
+        for process in self._processes:
+            await loop.run_in_executor(None, process.join, 10)
+        self._terminate()
+
+    def _terminate(self) -> None:
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+        for inbox in self._inboxes:
+            inbox.cancel_join_thread()  # nobody reads what is left; don't block interpreter exit on it
+        self._processes, self._inboxes, self._results = [], [], None
+
+    async def check(
+        self,
+        chunks: AsyncIterable[list[Proxy]],
+        mode: CheckMode = CheckMode.SEQUENTIAL,
+        stats: SweepStats | None = None,
+        writer: ResultWriter | None = None,
+        real_ip: str | None = None,
+    ) -> SweepStats:
+        """Check every proxy in `chunks` (fed lazily) and save the results through `writer`."""
+        if writer is None:
+            async with ResultWriter() as own_writer:
+                return await self.check(chunks, mode, stats, own_writer, real_ip)
+
+        stats = stats if stats is not None else SweepStats()
+        async with self._lock:
+            self.start()
+            if real_ip is None:
+                real_ip = await checker_engine.real_ip()
+            self._sweep += 1
+            pending: dict[str, Proxy] = {}
+            fed = asyncio.Event()
+            collector = asyncio.create_task(self._collect(self._sweep, pending, fed, stats, writer))
+            try:
+                await self._feed(self._sweep, chunks, mode, real_ip, pending, stats, collector)
+                fed.set()
+                await collector
+            finally:
+                # Results of an abandoned sweep carry its number and are dropped
+                if not collector.done():
+                    collector.cancel()
+                await asyncio.gather(collector, return_exceptions=True)  # also retrieves a failure _feed beat
+        logger.info("Sharded sweep finished: %s", stats.as_dict())
+        return stats
+
+    async def _feed(self, sweep, chunks, mode, real_ip, pending, stats, collector) -> None:
+        async for chunk in chunks:
+            stats.total += len(chunk)
+            batches = [[] for _ in range(self.workers)]
+            for proxy in chunk:
+                pending[str(proxy.id)] = proxy
+                batches[shard_of(proxy.id, self.workers)].append(_payload(proxy))
+            for shard, batch in enumerate(batches):
+                for i in range(0, len(batch), settings.CHECKER_SHARD_BATCH):
+                    message = (sweep, mode.value, real_ip, batch[i:i + settings.CHECKER_SHARD_BATCH])
+                    await self._put(shard, message, collector)
+
+    async def _put(self, shard: int, message: tuple, collector: asyncio.Task) -> None:
+        """
+        Bounded inbox: waits (off the loop, in _POLL slices) while that worker
+        is saturated. A dead worker never drains its inbox, so between tries
+        give up once collecting has stopped or the worker is gone.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            if collector.done():
+                await collector  # raises why collecting stopped (it may have torn the pool down)
+            inbox, process = self._inboxes[shard], self._processes[shard]
+            try:
+                await loop.run_in_executor(None, inbox.put, message, True, _POLL)
+                return
+            except queue.Full:
+                pass
+            if not process.is_alive():
+                self._terminate()
+                raise RuntimeError(f"Checker worker exited: {process.name}")
+
+    async def _collect(self, sweep, pending, fed, stats, writer) -> None:
+        loop = asyncio.get_running_loop()
+        while not (fed.is_set() and not pending):
+            try:
+                message_sweep, items = await loop.run_in_executor(None, self._results.get, True, _POLL)
+            except queue.Empty:
+                dead = [p.name for p in self._processes if not p.is_alive()]
+                if dead:
+                    self._terminate()  # its shard is lost; the next sweep starts a fresh pool
+                    raise RuntimeError(f"Checker worker exited: {', '.join(dead)}")
+                continue
+            if message_sweep != sweep:
+                continue
+            for proxy_id, result, probed in items:
+                proxy = pending.pop(proxy_id, None)
+                if proxy is None:
+                    continue
+                await _save_result(proxy, result, writer)
+                stats.count(result, probed)
+
+
+sharded_checker = ShardedChecker()
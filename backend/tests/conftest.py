@@ -0,0 +1,29 @@
+import asyncio
+import pytest
+from beanie import init_beanie
+from bson import ObjectId
+from app.database import DOCUMENT_MODELS
+from app.models.check_history import CheckSample
+from app.models.proxy import Proxy, ProxyProtocol
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    """Beanie on an in-memory mongomock database (skipped when mongomock-motor is missing)."""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    monkeypatch.setattr(CheckSample.Settings, "timeseries", None)  # no time-series collections in mongomock
+    database = mongomock_motor.AsyncMongoMockClient()["test"]
+    asyncio.run(init_beanie(database=database, document_models=DOCUMENT_MODELS))
+    return database
+
+
+@pytest.fixture
+def make_proxy():
+    """Factory for unsaved proxies: make_proxy(i, **fields), fields overriding the defaults."""
+
+    def make(i: int = 0, **fields) -> Proxy:
+        values = dict(id=ObjectId(), ip=f"10.0.0.{i}", port=8080, protocol=ProxyProtocol.HTTP)
+        values.update(fields)
+        return Proxy.model_construct(**values)
+
+    return make
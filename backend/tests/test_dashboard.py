@@ -0,0 +1,88 @@
+import asyncio
+import random
+from datetime import datetime, timedelta, timezone
+import pytest
+from app.models.account import Account, AccountStatus
+from app.models.proxy import Proxy, ProxyStatus
+from app.routers.dashboard import _compute_dashboard
+
+OWNERS = ["alice", "bob"]
+PROVIDERS = [None, "", "acme", "globex"]
+
+
+async def _seed(seed: int = 7) -> None:
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    await Proxy.insert_many([
+        Proxy(
+            ip=f"10.{i // 250}.{i % 250}.1", port=8000 + i % 7, owner=rng.choice(OWNERS),
+            status=rng.choice(list(ProxyStatus)),
+            provider_name=rng.choice(PROVIDERS),
+            cost=rng.choice([None, 0, round(rng.uniform(0.5, 9.5), 2)]),
+            # Clear of the window edges so the two clocks cannot disagree
+            expire_at=rng.choice([None, now + timedelta(hours=rng.choice([-30, 12, 40, 60, 100]))]),
+        )
+        for i in range(600)
+    ])
+    await Account.insert_many([
+        Account(username=f"acc{i}", password="x", platform="web", owner=rng.choice(OWNERS),
+                status=rng.choice(list(AccountStatus)))
+        for i in range(60)
+    ])
+
+
+async def _legacy_dashboard(match: dict) -> dict:
+    """The per-document computation the aggregation pipelines replaced."""
+    now = datetime.now(timezone.utc)
+    expiry_threshold = now + timedelta(days=3)
+    all_proxies = await Proxy.find(match).to_list()
+    all_accounts = await Account.find(match).to_list()
+
+    status_counts = {s.value: 0 for s in ProxyStatus}
+    for p in all_proxies:
+        status_counts[p.status.value] += 1
+    expiring_soon = [
+        p for p in all_proxies
+        if p.expire_at and now <= p.expire_at.replace(tzinfo=timezone.utc) <= expiry_threshold
+    ]
+    account_status_counts: dict = {}
+    for a in all_accounts:
+        account_status_counts[a.status.value] = account_status_counts.get(a.status.value, 0) + 1
+    provider_costs: dict = {}
+    for p in all_proxies:
+        if p.cost and p.provider_name:
+            provider_costs[p.provider_name] = provider_costs.get(p.provider_name, 0) + p.cost
+
+    return {
+        "proxies": {
+            "total": len(all_proxies),
+            "by_status": status_counts,
+            "expiring_soon": [
+                {"id": str(p.id), "ip": p.ip, "port": p.port, "expire_at": p.expire_at,
+                 "provider_name": p.provider_name, "cost": p.cost}
+                for p in expiring_soon
+            ],
+        },
+        "accounts": {"total": len(all_accounts), "by_status": account_status_counts},
+        "billing": {
+            "total_monthly_cost": round(sum(p.cost or 0 for p in all_proxies if p.status == ProxyStatus.LIVE), 2),
+            "renewal_needed": round(sum(p.cost or 0 for p in expiring_soon), 2),
+            "by_provider": {k: round(v, 2) for k, v in provider_costs.items()},
+        },
+    }
+
+
+def _normalized(dashboard: dict) -> dict:
+    dashboard["proxies"]["expiring_soon"].sort(key=lambda p: p["id"])
+    return dashboard
+
+
+@pytest.mark.parametrize("match", [{}, {"owner": "alice"}], ids=["admin", "user"])
+def test_pipelines_match_the_per_document_computation(mongo, match):
+    async def run():
+        await _seed()
+        return await _compute_dashboard(match), await _legacy_dashboard(match)
+
+    new, old = asyncio.run(run())
+    assert new["proxies"]["expiring_soon"]  # the fixture exercises every section
+    assert _normalized(new) == _normalized(old)
@@ -0,0 +1,100 @@
+import asyncio
+import socket
+import pytest
+from bson import ObjectId
+from app.config import settings
+from app.services import gateway as gateway_module
+from app.services.gateway import ProxyGateway
+from app.services.rotation import PoolEntry
+
+
+@pytest.fixture(autouse=True)
+def _no_health(monkeypatch):
+    monkeypatch.setattr(gateway_module.health_recorder, "record", lambda *args, **kwargs: None)
+
+
+def _entry(port: int) -> PoolEntry:
+    return PoolEntry({"_id": ObjectId(), "ip": "127.0.0.1", "port": port, "protocol": "http"})
+
+
+def _closed_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _stand_in_upstream(requests: list[bytes]) -> asyncio.AbstractServer:
+    """An HTTP proxy that answers every request itself with the request line it got."""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        head = await reader.readuntil(b"\r\n\r\n")
+        requests.append(head)
+        body = head.split(b"\r\n", 1)[0]
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body))
+        await writer.drain()
+        writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+async def _request(gateway: ProxyGateway, raw: bytes) -> bytes:
+    reader, writer = await asyncio.open_connection("127.0.0.1", gateway.port)
+    writer.write(raw)
+    await writer.drain()
+    response = await asyncio.wait_for(reader.read(), 10)
+    writer.close()
+    return response
+
+
+def _run(upstreams, raw: bytes, requests: list[bytes]) -> bytes:
+    async def run():
+        server = await _stand_in_upstream(requests)
+        entries = [_entry(server.sockets[0].getsockname()[1] if port is None else port) for port in upstreams]
+
+        async def selector(exclude: set):
+            return next((entry for entry in entries if entry.id not in exclude), None)
+
+        gateway = ProxyGateway("127.0.0.1", 0, selector)
+        await gateway.start()
+        try:
+            return await _request(gateway, raw)
+        finally:
+            await gateway.close()
+            server.close()
+            await server.wait_closed()
+
+    return asyncio.run(run())
+
+
+GET = b"GET http://origin.test/path?q=1 HTTP/1.1\r\nHost: origin.test\r\nConnection: close\r\n\r\n"
+
+
+def test_relays_a_request_through_the_upstream():
+    requests = []
+    response = _run([None], GET, requests)
+    assert response.startswith(b"HTTP/1.1 200 OK")
+    assert response.endswith(b"GET http://origin.test/path?q=1 HTTP/1.1")
+    assert len(requests) == 1 and b"Connection: keep-alive" in requests[0]
+
+
+def test_fails_over_when_the_first_upstream_is_down():
+    requests = []
+    response = _run([_closed_port(), None], GET, requests)
+    assert response.startswith(b"HTTP/1.1 200 OK")
+    assert len(requests) == 1
+
+
+def test_answers_502_when_every_upstream_fails():
+    response = _run([_closed_port(), _closed_port()], GET, [])
+    assert response.startswith(b"HTTP/1.1 502")
+
+
+def test_rejects_a_body_over_the_limit(monkeypatch):
+    monkeypatch.setattr(settings, "GATEWAY_MAX_BODY", 16)
+    requests = []
+    post = b"POST http://origin.test/ HTTP/1.1\r\nHost: origin.test\r\nContent-Length: 17\r\n\r\n" + b"x" * 17
+    chunked = (b"POST http://origin.test/ HTTP/1.1\r\nHost: origin.test\r\nTransfer-Encoding: chunked\r\n\r\n"
+               b"a\r\n" + b"x" * 10 + b"\r\na\r\n" + b"x" * 10 + b"\r\n0\r\n\r\n")
+    assert _run([None], post, requests).startswith(b"HTTP/1.1 413")
+    assert _run([None], chunked, requests).startswith(b"HTTP/1.1 413")
+    assert not requests
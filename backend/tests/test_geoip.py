@@ -0,0 +1,34 @@
+from pathlib import Path
+import pytest
+from app.services.geoip import GeoIPDatabase
+
+SAMPLE = Path(__file__).resolve().parents[1] / "app" / "data" / "geoip-sample.bin"
+
+
+@pytest.fixture
+def geoip():
+    database = GeoIPDatabase(SAMPLE)
+    yield database
+    database.close()
+
+
+def test_lookup_hits_a_range(geoip):
+    assert geoip.lookup("192.0.2.200") == {
+        "country_code": "VN", "country": "Vietnam", "region": "Hanoi", "city": "Hanoi",
+    }
+    assert geoip.lookup("2001:db8::42")["country_code"] == "JP"
+
+
+def test_lookup_misses_outside_every_range(geoip):
+    assert geoip.lookup("8.8.8.8") is None
+    assert geoip.lookup("126.255.255.255") is None   # just before the first range
+    assert geoip.lookup("2001:db8:2::1") is None      # just after the last range
+    assert geoip.lookup("not an ip") is None
+
+
+def test_lookup_covers_the_first_and_last_ranges(geoip):
+    assert geoip.range_count == 7
+    assert geoip.lookup("127.0.0.0")["country_code"] == "ZZ"
+    assert geoip.lookup("127.255.255.255")["country_code"] == "ZZ"
+    assert geoip.lookup("2001:db8:1::")["country_code"] == "SG"
+    assert geoip.lookup("2001:db8:1:ffff:ffff:ffff:ffff:ffff")["country_code"] == "SG"
@@ -0,0 +1,35 @@
+import asyncio
+import uuid
+import pytest
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import PyMongoError
+from app.check_indexes import explain_hot_queries, is_covered
+from app.config import settings
+from app.database import DOCUMENT_MODELS
+
+
+async def _explain_on_scratch_database() -> dict[str, list[str]] | None:
+    """Plans of the hot queries on a throwaway database; None when MongoDB is unreachable."""
+    client = AsyncIOMotorClient(settings.MONGODB_URL, serverSelectionTimeoutMS=1000)
+    try:
+        await client.admin.command("ping")
+    except PyMongoError:
+        client.close()
+        return None
+    name = f"test_indexes_{uuid.uuid4().hex[:8]}"
+    try:
+        await init_beanie(database=client[name], document_models=DOCUMENT_MODELS)
+        return await explain_hot_queries()
+    finally:
+        await client.drop_database(name)
+        client.close()
+
+
+def test_hot_queries_are_served_by_indexes():
+    # Needs a real server: mongomock has no query planner to explain
+    plans = asyncio.run(_explain_on_scratch_database())
+    if plans is None:
+        pytest.skip(f"no MongoDB at {settings.MONGODB_URL}")
+    uncovered = {label: stages for label, stages in plans.items() if not is_covered(stages)}
+    assert not uncovered
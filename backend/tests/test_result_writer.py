@@ -0,0 +1,76 @@
+import asyncio
+import pytest
+from pymongo.errors import AutoReconnect, BulkWriteError
+from app.config import settings
+from app.models.proxy import Proxy
+from app.services.result_writer import ResultWriter
+
+
+class _FlakyWriter(ResultWriter):
+    """Fails its first `failures` writes with whatever `error(ops)` returns."""
+
+    def __init__(self, failures: int, error=lambda ops: AutoReconnect("down")):
+        super().__init__(batch_size=100)
+        self.failures = failures
+        self.error = error
+        self.calls: list[list] = []
+
+    async def _write(self, ops) -> None:
+        self.calls.append(ops)
+        if len(self.calls) <= self.failures:
+            raise self.error(ops)
+
+
+@pytest.fixture(autouse=True)
+def _no_backoff(monkeypatch):
+    monkeypatch.setattr(settings, "CHECKER_FLUSH_BACKOFF", 0)
+
+
+def _write(writer: ResultWriter, proxies: list[Proxy]) -> None:
+    async def run():
+        for proxy in proxies:
+            await writer.add(proxy, {"status": "live"}, {"check_count": 1})
+        await writer.flush()
+    asyncio.run(run())
+
+
+def test_flush_retries_a_failed_write(make_proxy):
+    writer = _FlakyWriter(failures=2)
+    _write(writer, [make_proxy(i) for i in range(3)])
+    assert len(writer.calls) == 3
+    assert writer.written == 3 and writer.dropped == 0
+
+
+def test_flush_drops_and_counts_results_after_the_last_retry(make_proxy):
+    writer = _FlakyWriter(failures=settings.CHECKER_FLUSH_RETRIES + 1)
+    _write(writer, [make_proxy(i) for i in range(3)])
+    assert len(writer.calls) == settings.CHECKER_FLUSH_RETRIES + 1
+    assert writer.written == 0 and writer.dropped == 3
+
+
+def test_flush_retries_only_the_failed_operations_of_a_batch(make_proxy):
+    error = lambda ops: BulkWriteError({"writeErrors": [{"index": 1, "code": 91, "errmsg": "shutdown"}]})  # noqa: E731
+    writer = _FlakyWriter(failures=1, error=error)
+    _write(writer, [make_proxy(i) for i in range(3)])
+    assert writer.calls[1] == [writer.calls[0][1]]
+    assert writer.written == 3 and writer.dropped == 0
+
+
+def test_guarded_update_keeps_the_claim_fence(make_proxy):
+    from app.services.claim_worker import _ClaimWriter
+    from app.services.result_writer import Guarded
+
+    class _Capture(_ClaimWriter):
+        async def _write(self, ops) -> None:
+            self.ops = ops
+
+    writer = _Capture("node-1")
+    proxy = make_proxy()
+
+    async def run():
+        await writer.add(proxy, {"status": "live"}, guarded=Guarded({"health": None}, {"health": {"samples": 1}}))
+        await writer.flush()
+    asyncio.run(run())
+    main, guarded = (op._filter for op in writer.ops)
+    assert main == {"_id": proxy.id, "claimed_by": "node-1"}
+    assert guarded == {"_id": proxy.id, "claimed_by": {"$in": ["node-1", None]}, "health": None}
@@ -0,0 +1,105 @@
+import asyncio
+from collections import Counter
+import pytest
+from app.config import settings
+from app.models.proxy import Proxy, ProxyQuality, ProxyStatus
+from app.services import rotation
+from app.services.rotation import PoolEntry, RotationMode, RotationService
+
+OWNER = "alice"
+
+
+@pytest.fixture
+def pool_proxy(make_proxy):
+    """A usable proxy of OWNER; higher `i` is slower."""
+
+    def make(i: int, **fields) -> Proxy:
+        values = dict(
+            owner=OWNER, country="US", latency=100.0 + i, status=ProxyStatus.LIVE, quality=ProxyQuality.GOOD,
+        )
+        values.update(fields)
+        return make_proxy(i, **values)
+
+    return make
+
+
+@pytest.fixture
+def make_service(monkeypatch):
+    """A RotationService whose pool loads `proxies` (on the first allocation) instead of querying Mongo."""
+
+    def make(proxies: list[Proxy]) -> RotationService:
+        async def load_entries(query: dict) -> list[PoolEntry]:
+            return [
+                PoolEntry({"_id": p.id, "owner": p.owner, "ip": p.ip, "port": p.port, "latency": p.latency})
+                for p in proxies
+            ]
+
+        monkeypatch.setattr(rotation, "load_entries", load_entries)
+        return RotationService()
+
+    return make
+
+
+def _allocate(service: RotationService, mode: RotationMode, **kwargs) -> PoolEntry:
+    return asyncio.run(service.next(OWNER, mode, **kwargs))
+
+
+def test_round_robin_stays_fair_across_result_flushes(pool_proxy, make_service):
+    proxies = [pool_proxy(i) for i in range(10)]
+    service = make_service(proxies)
+    counts = Counter()
+    for n in range(35):
+        counts[_allocate(service, RotationMode.ROUND_ROBIN).id] += 1
+        # A result flush re-checks some proxies after every allocation
+        service.apply_results([pool_proxy(0, id=proxies[0].id, latency=50.0 + n), proxies[n % 10]])
+    assert len(counts) == 10
+    assert max(counts.values()) - min(counts.values()) <= 1
+
+
+def test_round_robin_keeps_its_place_when_a_proxy_drops_out(pool_proxy, make_service):
+    proxies = [pool_proxy(i) for i in range(5)]
+    service = make_service(proxies)
+    first = [_allocate(service, RotationMode.ROUND_ROBIN).id for _ in range(3)]
+    service.apply_results([pool_proxy(0, id=proxies[0].id, status=ProxyStatus.DIE)])
+    rest = [_allocate(service, RotationMode.ROUND_ROBIN).id for _ in range(2)]
+    assert first == [p.id for p in proxies[:3]]
+    assert rest == [p.id for p in proxies[3:5]]
+
+
+def test_lru_hands_out_the_least_recently_used_proxy(pool_proxy, make_service):
+    proxies = [pool_proxy(i) for i in range(4)]
+    service = make_service(proxies)
+    for p in (proxies[2], proxies[0], proxies[3]):
+        _allocate(service, RotationMode.ROUND_ROBIN, exclude={q.id for q in proxies if q is not p})
+    assert _allocate(service, RotationMode.LEAST_RECENTLY_USED).id == proxies[1].id
+    assert _allocate(service, RotationMode.LEAST_RECENTLY_USED).id == proxies[2].id
+    # A result for an already pooled proxy keeps its place in the LRU order
+    service.apply_results([pool_proxy(0, id=proxies[0].id, latency=10.0)])
+    assert _allocate(service, RotationMode.LEAST_RECENTLY_USED).id == proxies[0].id
+
+
+def test_upsert_updates_the_pooled_entry_in_place(pool_proxy, make_service):
+    proxies = [pool_proxy(i) for i in range(2)]
+    service = make_service(proxies)
+    entry = _allocate(service, RotationMode.ROUND_ROBIN)
+    used = entry.last_used
+    service.apply_results([pool_proxy(0, id=entry.id, latency=1.0)])
+    assert entry.latency == 1.0 and entry.last_used == used
+    assert _allocate(service, RotationMode.LOWEST_LATENCY) is entry
+
+
+def test_latency_order_follows_result_flushes(monkeypatch, pool_proxy, make_service):
+    monkeypatch.setattr(settings, "ROTATION_LATENCY_TOP_K", 2)
+    proxies = [pool_proxy(i) for i in range(6)]
+    service = make_service(proxies)
+    _allocate(service, RotationMode.ROUND_ROBIN)  # loads the pool
+    added = pool_proxy(9, latency=2.0)
+    service.apply_results([
+        pool_proxy(5, id=proxies[5].id, latency=1.0),
+        pool_proxy(0, id=proxies[0].id, status=ProxyStatus.DIE),
+        added,
+    ])
+    fastest = [_allocate(service, RotationMode.LOWEST_LATENCY).id for _ in range(4)]
+    assert fastest == [proxies[5].id, added.id] * 2
+    weighted = {_allocate(service, RotationMode.WEIGHTED).id for _ in range(200)}
+    assert proxies[0].id not in weighted and added.id in weighted
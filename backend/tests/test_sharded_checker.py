@@ -0,0 +1,30 @@
+import asyncio
+import multiprocessing
+import pytest
+from app.benchmarks.proxy_farm import DiscardWriter, discard_history
+from app.services.sharded_checker import ShardedChecker
+
+
+def test_sweep_fails_when_a_worker_dies(make_proxy):
+    checker = ShardedChecker(1)
+
+    def unreachable(count: int) -> list:
+        return [make_proxy(ip="127.0.0.1", port=9) for _ in range(count)]
+
+    async def chunks():
+        yield unreachable(10)
+        for process in multiprocessing.active_children():
+            process.kill()
+        for _ in range(20):  # far more batches than the worker's bounded inbox holds
+            yield unreachable(200)
+
+    async def sweep():
+        async with DiscardWriter() as writer:
+            try:
+                await checker.check(chunks(), writer=writer, real_ip="198.51.100.1")
+            finally:
+                await checker.close()
+
+    with discard_history(), pytest.raises(RuntimeError, match="Checker worker exited"):
+        asyncio.run(asyncio.wait_for(sweep(), 60))
+    assert not multiprocessing.active_children()
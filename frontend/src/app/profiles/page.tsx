@@ -406,6 +406,7 @@ export default function ProfilesPage() {
                                         <SelectContent className="bg-[#0d1426] border-white/10">
                                             <SelectItem value="http">HTTP</SelectItem>
                                             <SelectItem value="https">HTTPS</SelectItem>
+                                            <SelectItem value="socks4">SOCKS4</SelectItem>
                                             <SelectItem value="socks5">SOCKS5</SelectItem>
                                         </SelectContent>
                                     </Select>
@@ -150,6 +150,7 @@ function AddProxyDialog({ onSuccess }: { onSuccess: () => void }) {
                                 <SelectContent className="bg-[#0d1426] border-white/10">
                                     <SelectItem value="http">HTTP</SelectItem>
                                     <SelectItem value="https">HTTPS</SelectItem>
+                                    <SelectItem value="socks4">SOCKS4</SelectItem>
                                     <SelectItem value="socks5">SOCKS5</SelectItem>
                                 </SelectContent>
                             </Select>
@@ -233,6 +234,7 @@ function EditProxyDialog({ proxy, onClose, onSuccess }: { proxy: Proxy | null; o
                                 <SelectContent className="bg-[#0d1426] border-white/10">
                                     <SelectItem value="http">HTTP</SelectItem>
                                     <SelectItem value="https">HTTPS</SelectItem>
+                                    <SelectItem value="socks4">SOCKS4</SelectItem>
                                     <SelectItem value="socks5">SOCKS5</SelectItem>
                                 </SelectContent>
                             </Select>
@@ -310,8 +312,10 @@ function ImportDialog({ onSuccess }: { onSuccess: () => void }) {
                             <Select value={protocol} onValueChange={setProtocol}>
                                 <SelectTrigger className="mt-1 bg-white/5 border-white/10"><SelectValue /></SelectTrigger>
                                 <SelectContent className="bg-[#0d1426] border-white/10">
+                                    <SelectItem value="auto">Auto-detect</SelectItem>
                                     <SelectItem value="http">HTTP</SelectItem>
                                     <SelectItem value="https">HTTPS</SelectItem>
+                                    <SelectItem value="socks4">SOCKS4</SelectItem>
                                     <SelectItem value="socks5">SOCKS5</SelectItem>
                                 </SelectContent>
                             </Select>
@@ -328,7 +332,13 @@ function ImportDialog({ onSuccess }: { onSuccess: () => void }) {
                     <div className="flex justify-end gap-2">
                         <Button variant="ghost" onClick={() => setOpen(false)}>Cancel</Button>
                         <Button className="bg-violet-600 hover:bg-violet-700" disabled={!text.trim() || mutation.isPending}
-                            onClick={() => mutation.mutate({ text, protocol, provider_name: provider || undefined, cost: cost ? parseFloat(cost) : undefined })}>
+                            onClick={() => mutation.mutate({
+                                text,
+                                protocol: protocol === "auto" ? "http" : protocol,
+                                detect_protocol: protocol === "auto",
+                                provider_name: provider || undefined,
+                                cost: cost ? parseFloat(cost) : undefined,
+                            })}>
                             {mutation.isPending ? "Importing..." : `Import ${text.trim().split("\n").filter(Boolean).length} proxies`}
                         </Button>
                     </div>
@@ -14,6 +14,9 @@ Cách dùng:
     # Test với timeout tùy chỉnh (giây)
     python test_proxy.py proxies.txt --timeout 15
 
+    # Tra geo bằng database local thay vì gọi ip-api.com
+    python test_proxy.py proxies.txt --geo-db backend/app/data/geoip-sample.bin
+
 Yêu cầu:
     pip install httpx rich
 """
@@ -48,6 +51,7 @@ CHECK_TARGETS = [
 ]
 
 GEO_URL = "http://ip-api.com/json/{ip}?fields=country,countryCode,city,isp,query"
+GEO_DB = None  # GeoIPDatabase khi chạy với --geo-db (tra cứu local, không gọi GEO_URL)
 
 TIMEOUT = 12.0
 CONCURRENCY = 30
@@ -138,7 +142,8 @@ async def check_proxy(proxy: dict, timeout: float = TIMEOUT) -> dict:
                 timeout=httpx.Timeout(timeout),
                 follow_redirects=True,
             ) as client:
-                resp = await client.get(target["url"])
+                # httpx không áp timeout cho bắt tay SOCKS: giới hạn cả request
+                resp = await asyncio.wait_for(client.get(target["url"]), timeout)
                 elapsed = round((time.monotonic() - start) * 1000, 1)
 
                 if resp.status_code == 200:
@@ -161,14 +166,19 @@ async def check_proxy(proxy: dict, timeout: float = TIMEOUT) -> dict:
         except httpx.ProxyError:
             result["error"] = "auth_failed"
             result["status"] = "auth_failed"
-        except httpx.TimeoutException:
+        except (httpx.TimeoutException, asyncio.TimeoutError):
             result["error"] = "timeout"
             result["status"] = "timeout"
         except Exception as e:
             result["error"] = str(e)[:60]
 
     # Nếu live, tra cứu geo
-    if result["status"] == "live" and result["exit_ip"]:
+    if result["status"] == "live" and result["exit_ip"] and GEO_DB is not None:
+        geo = GEO_DB.lookup(result["exit_ip"].split(",")[0].strip())
+        if geo:
+            result["country"] = geo["country"] or geo["country_code"]
+            result["city"] = geo["city"]
+    elif result["status"] == "live" and result["exit_ip"]:
         try:
             async with httpx.AsyncClient(timeout=httpx.Timeout(5.0)) as client:
                 geo = await client.get(GEO_URL.format(ip=result["exit_ip"]))
@@ -357,8 +367,20 @@ def main():
     parser.add_argument("--limit", type=int, default=0, help="Giới hạn số proxy test (0 = tất cả)")
     parser.add_argument("--timeout", type=float, default=TIMEOUT, help=f"Timeout mỗi proxy (giây, mặc định {TIMEOUT})")
     parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help=f"Số proxy test song song (mặc định {CONCURRENCY})")
+    parser.add_argument("--geo-db", help="File geo-IP local (python -m app.build_geoip) thay cho ip-api.com")
     args = parser.parse_args()
 
+    if args.geo_db:
+        global GEO_DB
+        sys.path.insert(0, str(Path(__file__).resolve().parent / "backend"))
+        try:
+            from app.services.geoip import GeoIPDatabase
+        except ImportError as e:
+            print(f"❌ Không load được module geo-IP ({e}) — cài backend/requirements.txt")
+            sys.exit(1)
+        GEO_DB = GeoIPDatabase(args.geo_db)
+        print(f"🌍 Geo-IP local: {args.geo_db} ({GEO_DB.range_count} dải IP)")
+
     concurrency = args.concurrency
 
     # Kiểm tra target là file hay proxy URL